@@ -0,0 +1,332 @@
+"""
+Latency, throughput and queries per request for the main backend endpoints.
+
+By default everything runs in-process: a throwaway test database is created
+and seeded, the stub validator is started on localhost, and requests go
+through Django's test client, which lets the suite count queries:
+
+    python -m benchmarks.api_suite --rows 100000 --save benchmarks/baseline.json
+    python -m benchmarks.api_suite --rows 100000 --compare benchmarks/baseline.json
+
+With --base-url the same scenarios run over HTTP against a running server
+(already pointed at a stub validator) with --concurrency clients. Queries
+per request are then read from the Server-Timing header, when the server
+sends it (REQUEST_TIMING_HEADER=true).
+"""
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+EXPECTED_STATUS = {
+    "loan-requests": 201,
+    "admin-loans-list": 200,
+    "admin-loans-filter": 200,
+    "admin-loans-approve": 204,
+    "admin-loans-reject": 204,
+    "token": 200,
+    "me": 200,
+}
+
+# Password hashing makes every token request slow on purpose
+SLOW_SCENARIOS = {"token"}
+
+
+def loan_payload(n: int) -> dict:
+    return {
+        "id_number": f"27{n:09d}",
+        "full_name": "Bench User",
+        "gender": "F",
+        "email": f"bench{n}@example.com",
+        "amount": 15000,
+    }
+
+
+def build_request(name: str, n: int, context: dict) -> tuple[str, str, dict | None, bool]:
+    """Returns (method, path, json body, authenticated) for the n-th request of a scenario."""
+    if name == "loan-requests":
+        return "post", "/api/loan-requests/", loan_payload(n), False
+    if name == "admin-loans-list":
+        return "get", "/api/admin/loans/", None, True
+    if name == "admin-loans-filter":
+        return "get", "/api/admin/loans/?status=PEN", None, True
+    if name in ("admin-loans-approve", "admin-loans-reject"):
+        loan_id = context["loan_ids"][n % len(context["loan_ids"])]
+        return "post", f"/api/admin/loans/{loan_id}/{name.rsplit('-', 1)[1]}/", None, True
+    if name == "token":
+        return "post", "/api/token/", context["credentials"], False
+    if name == "me":
+        return "get", "/api/me/", None, True
+
+    raise ValueError(f"Unknown scenario {name}")
+
+
+def server_timing_queries(header: str | None) -> int | None:
+    """Reads the query count from a `db;dur=...;desc="3"` Server-Timing entry."""
+    for part in (header or "").split(","):
+        name, *params = part.strip().split(";")
+        if name == "db":
+            return next((int(param[6:-1]) for param in params if param.startswith("desc=")), None)
+
+    return 0 if header else None
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+
+    return values[max(0, min(len(values) - 1, round(fraction * len(values)) - 1))]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int, queries: list[int] | None) -> dict:
+    latencies = sorted(latencies)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def run_in_process(args) -> tuple[dict, dict]:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+    from rest_framework.test import APIClient
+
+    from benchmarks.stub_validator import StubValidator
+    from loan.models import LoanRequest
+    from loan.services import LoanValidationService
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb)
+
+    try:
+        with override_settings(ENVIRONMENT="local", DEBUG=True):
+            call_command("seed_loans", count=args.rows, status="APR=49,REJ=49,PEN=2",
+                         days=365, seed=42, append=True, stdout=io.StringIO())
+
+        client = APIClient()
+        credentials = {"username": args.username, "password": args.password}
+        token = client.post("/api/token/", credentials, format="json").data["access"]
+
+        context = {
+            "credentials": credentials,
+            "loan_ids": list(
+                LoanRequest.objects.filter(status=LoanRequest.StatusChoices.PENDING)
+                .order_by("-id").values_list("id", flat=True)[:1000]
+            ),
+        }
+
+        results = {}
+
+        with StubValidator(latency=args.validator_latency) as validator:
+            LoanValidationService.API_URL = validator.url
+            LoanValidationService.API_KEY = "benchmark"
+
+            for name in args.scenarios:
+                iterations = args.iterations // 10 if name in SLOW_SCENARIOS else args.iterations
+                latencies, queries = [], []
+                errors = 0
+                deadline = time.perf_counter() + args.max_seconds
+                started = time.perf_counter()
+
+                for n in range(args.warmup + iterations):
+                    method, path, body, authenticated = build_request(name, n, context)
+                    client.credentials(**({"HTTP_AUTHORIZATION": f"Bearer {token}"} if authenticated else {}))
+
+                    with CaptureQueriesContext(connection) as captured:
+                        request_started = time.perf_counter()
+                        if method == "get":
+                            response = client.get(path)
+                        else:
+                            response = client.post(path, body, format="json")
+                        latency = time.perf_counter() - request_started
+
+                    if n < args.warmup:
+                        started = time.perf_counter()
+                        continue
+
+                    latencies.append(latency)
+                    queries.append(len(captured))
+                    errors += response.status_code != EXPECTED_STATUS[name]
+
+                    if time.perf_counter() > deadline:
+                        break
+
+                results[name] = summarize(latencies, time.perf_counter() - started, errors, queries)
+                print_row(name, results[name])
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    return results, {"mode": "in-process", "rows": args.rows}
+
+
+async def run_http(args) -> tuple[dict, dict]:
+    import aiohttp
+
+    base_url = args.base_url.rstrip("/")
+    credentials = {"username": args.username, "password": args.password}
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        async with session.post(f"{base_url}/api/token/", json=credentials) as response:
+            token = (await response.json())["access"]
+        auth = {"Authorization": f"Bearer {token}"}
+
+        async with session.get(f"{base_url}/api/admin/loans/?status=PEN", headers=auth) as response:
+            loan_ids = [loan["id"] for loan in (await response.json())["results"]]
+
+        context = {"credentials": credentials, "loan_ids": loan_ids or [0]}
+        counter = itertools.count(int(time.time()) % 10 ** 6 * 1000)
+        results = {}
+
+        for name in args.scenarios:
+            duration = args.max_seconds
+            latencies, queries = [], []
+            errors = 0
+
+            async def worker(deadline):
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    method, path, body, authenticated = build_request(name, next(counter), context)
+                    request_started = time.perf_counter()
+                    try:
+                        async with session.request(method, base_url + path, json=body,
+                                                   headers=auth if authenticated else None) as response:
+                            await response.read()
+                            errors += response.status != EXPECTED_STATUS[name]
+                            count = server_timing_queries(response.headers.get("Server-Timing"))
+                            if count is not None:
+                                queries.append(count)
+                    except (aiohttp.ClientError, TimeoutError):
+                        errors += 1
+                    latencies.append(time.perf_counter() - request_started)
+
+            await asyncio.gather(*(worker(time.perf_counter() + 1) for _ in range(args.concurrency)))
+            latencies.clear()
+            queries.clear()
+            errors = 0
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(started + duration) for _ in range(args.concurrency)))
+
+            results[name] = summarize(latencies, time.perf_counter() - started, errors, queries)
+            print_row(name, results[name])
+
+    return results, {"mode": "http", "base_url": base_url, "concurrency": args.concurrency}
+
+
+def print_row(name: str, result: dict):
+    queries = result["queries_per_request"]
+    print(
+        f"{name:<20} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8.1f} "
+        f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+        f"{'-' if queries is None else queries:>8}"
+    )
+
+
+def compare(results: dict, baseline: dict, max_regression: float, min_delta_ms: float) -> list[str]:
+    """Lists scenarios that run more queries, or whose p95 grew by more than both
+    `max_regression` and `min_delta_ms` (a few ms of jitter is noise on fast endpoints)."""
+    regressions = []
+
+    for name, result in results.items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+
+        if (result["p95_ms"] > before["p95_ms"] * (1 + max_regression)
+                and result["p95_ms"] - before["p95_ms"] > min_delta_ms):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+
+        if (result["queries_per_request"] or 0) > (before["queries_per_request"] or 0):
+            regressions.append(
+                f"{name}: queries/request {before['queries_per_request']} -> {result['queries_per_request']}"
+            )
+
+    return regressions
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(EXPECTED_STATUS), choices=list(EXPECTED_STATUS))
+    parser.add_argument("--rows", type=int, default=100000, help="Loans seeded in-process")
+    parser.add_argument("--iterations", type=int, default=300, help="Requests per scenario (token gets a tenth)")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per scenario")
+    parser.add_argument("--max-seconds", type=float, default=15, help="Time limit per scenario")
+    parser.add_argument("--validator-latency", type=float, default=0.0, help="Stub validator delay in seconds")
+    parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs")
+    parser.add_argument("--base-url", help="Benchmark a running server over HTTP instead")
+    parser.add_argument("--concurrency", type=int, default=10, help="HTTP clients with --base-url")
+    parser.add_argument("--username", default="Admin")
+    parser.add_argument("--password", default="Admin1234")
+    parser.add_argument("--save", type=Path, help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="Baseline to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed p95 growth over the baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5,
+                        help="p95 growth in ms ignored as noise")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<20} {'requests':>8} {'errors':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+
+    if args.base_url:
+        results, meta = asyncio.run(run_http(args))
+    else:
+        results, meta = run_in_process(args)
+
+    report = {
+        "meta": {
+            **meta,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenarios": results,
+    }
+
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()),
+                              args.max_regression, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
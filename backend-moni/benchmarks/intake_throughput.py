@@ -0,0 +1,103 @@
+"""
+Requests/sec of the sync and async loan intake endpoints under concurrency.
+
+Start the stub validator and both servers first, pointing the backend at
+the stub (LOAN_VALIDATION_API_URL=http://127.0.0.1:9000/):
+
+    python -m benchmarks.stub_validator --port 9000 --latency 0.2
+    gunicorn main.wsgi:application -w 4 -b 127.0.0.1:8001
+    uvicorn main.asgi:application --workers 4 --port 8002
+
+Then run:
+
+    python -m benchmarks.intake_throughput \\
+        --sync-url http://127.0.0.1:8001/api/loan-requests/ \\
+        --async-url http://127.0.0.1:8002/api/loan-requests/async/
+"""
+
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+import aiohttp
+
+
+def loan_payload(n: int) -> dict:
+    return {
+        "id_number": f"20{n:09d}",
+        "full_name": "Bench User",
+        "gender": "O",
+        "email": f"bench{n}@example.com",
+        "amount": 15000,
+    }
+
+
+async def run_level(url: str, concurrency: int, duration: float) -> dict:
+    """Keeps `concurrency` clients posting loans to `url` for `duration` seconds."""
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=loan_payload(next(counter))) as response:
+                        await response.read()
+                        if response.status != 201:
+                            errors += 1
+                except (aiohttp.ClientError, TimeoutError):
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+    }
+
+
+async def main(args):
+    targets = [("sync", args.sync_url), ("async", args.async_url)]
+
+    print(f"{'mode':<6} {'clients':>7} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+
+    for concurrency in args.concurrency:
+        for mode, url in targets:
+            if not url:
+                continue
+
+            result = await run_level(url, concurrency, args.duration)
+
+            print(
+                f"{mode:<6} {result['concurrency']:>7} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sync-url")
+    parser.add_argument("--async-url")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Time to turn loan rows into the admin list JSON: ModelSerializer vs values() rows.
+
+Runs in-process without a database. Rows are built the way the ORM hands
+them over (tuples for instances, dicts for values()), so model
+instantiation is part of the serializer side, as it is in a real request:
+
+    python -m benchmarks.list_serialization --rows 10000 --repeat 7
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+
+def make_rows(count: int) -> list[tuple]:
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    return [
+        (
+            i,
+            f"20{i:09d}",
+            f"Bench Usuario Ñandú {i}",
+            "MFO"[i % 3],
+            f"bench{i}@example.com",
+            Decimal(f"{1000 + i * 7 % 90000}.{i % 100:02d}"),
+            ("PEN", "APR", "REJ")[i % 3],
+            started + timedelta(seconds=i, microseconds=i % 1000000),
+            started + timedelta(seconds=i * 2),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def timed(fn, repeat: int) -> tuple[float, bytes]:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        content = fn()
+        durations.append(time.perf_counter() - started)
+
+    return statistics.median(durations), content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7, help="Runs per side; the median is reported")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+    import django
+    django.setup()
+
+    from rest_framework.renderers import JSONRenderer
+    from loan.models import LoanRequest
+    from loan.serializers import LoanRequestSerializer, ValuesRepresentation
+
+    representation = ValuesRepresentation(LoanRequestSerializer)
+    field_names = representation.field_names
+    rows = make_rows(args.rows)
+    renderer = JSONRenderer()
+
+    def serializer():
+        loans = [LoanRequest.from_db("default", field_names, row) for row in rows]
+        return renderer.render(LoanRequestSerializer(loans, many=True).data)
+
+    def values():
+        return renderer.render(representation.to_representation(dict(zip(field_names, row)) for row in rows))
+
+    serializer_time, serializer_content = timed(serializer, args.repeat)
+    values_time, values_content = timed(values, args.repeat)
+
+    if serializer_content != values_content:
+        raise SystemExit("values() output differs from the serializer's")
+
+    print(f"{'path':<12} {'ms':>9} {'rows/s':>12}")
+    for name, duration in (("serializer", serializer_time), ("values", values_time)):
+        print(f"{name:<12} {duration * 1000:>9.1f} {args.rows / duration:>12,.0f}")
+    print(f"{args.rows} rows, identical output ({len(values_content):,} bytes), "
+          f"{serializer_time / values_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
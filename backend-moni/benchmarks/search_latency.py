@@ -0,0 +1,141 @@
+"""
+Latency of `?search=` on the admin loan list over a large seeded table.
+
+Runs in-process against a throwaway test database, like api_suite, seeded
+with --rows loans drawn from --pool-size distinct names and emails. Each
+request searches for a different applicant, taken from the seeded rows:
+
+    python -m benchmarks.search_latency --rows 3000000 --keepdb
+    python -m benchmarks.search_latency --rows 3000000 --keepdb --explain
+
+Seeding a few million rows takes minutes; --keepdb keeps them for the next run.
+"""
+
+import argparse
+import io
+import os
+import random
+import time
+
+SCENARIOS = {
+    # name: (query string builder, taking a sampled (full_name, email, id_number) row)
+    "full-name": lambda row: {"search": row[0]},
+    "surname": lambda row: {"search": row[0].split()[-1]},
+    "name-fragment": lambda row: {"search": max(row[0].split(), key=len)[1:5]},
+    "email": lambda row: {"search": row[1]},
+    "email-user": lambda row: {"search": row[1].split("@")[0]},
+    "id-prefix": lambda row: {"search": row[2][:5]},
+    "status+surname": lambda row: {"search": row[0].split()[-1], "status": "PEN"},
+    "cursor+surname": lambda row: {"search": row[0].split()[-1], "pagination": "cursor"},
+    "no-match": lambda row: {"search": "qzxw"},
+}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    return values[max(0, min(len(values) - 1, round(fraction * len(values)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--rows", type=int, default=3000000, help="Loans in the table")
+    parser.add_argument("--pool-size", type=int, default=100000, help="Distinct names and emails seeded")
+    parser.add_argument("--iterations", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per scenario")
+    parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs")
+    parser.add_argument("--explain", action="store_true", help="Print the plans of one request per scenario")
+    parser.add_argument("--username", default="Admin")
+    parser.add_argument("--password", default="Admin1234")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+    from rest_framework.test import APIClient
+
+    from loan.models import LoanRequest
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb)
+
+    try:
+        missing = args.rows - LoanRequest.objects.count()
+        if missing > 0:
+            print(f"Seeding {missing} loans...")
+            with override_settings(ENVIRONMENT="local", DEBUG=True):
+                call_command("seed_loans", count=missing, status="APR=49,REJ=49,PEN=2", days=365,
+                             pool_size=args.pool_size, seed=42, append=True, stdout=io.StringIO())
+            with connection.cursor() as cursor:
+                # Flushes the GIN pending lists and refreshes the planner's statistics
+                cursor.execute(f"VACUUM ANALYZE {LoanRequest._meta.db_table}")
+
+        rng = random.Random(42)
+        max_id = LoanRequest.objects.order_by("-id").values_list("id", flat=True).first()
+        samples = []
+        while len(samples) < 500:
+            row = LoanRequest.objects.filter(id__gte=rng.randint(1, max_id)).order_by("id").values_list(
+                "full_name", "email", "id_number"
+            ).first()
+            if row:
+                samples.append(row)
+
+        client = APIClient()
+        credentials = {"username": args.username, "password": args.password}
+        token = client.post("/api/token/", credentials, format="json").data["access"]
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        print(f"{LoanRequest.objects.count():,} loans")
+        print(f"{'scenario':<16} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'matches':>9} {'db ms':>7}")
+
+        for name in args.scenarios:
+            latencies, matches, db_times = [], [], []
+            errors = 0
+
+            for n in range(args.warmup + args.iterations):
+                params = SCENARIOS[name](samples[n % len(samples)])
+
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get("/api/admin/loans/", params)
+                    latency = time.perf_counter() - started
+
+                if n < args.warmup:
+                    continue
+
+                latencies.append(latency)
+                db_times.append(sum(float(query["time"]) for query in captured))
+                errors += response.status_code != 200
+                if response.status_code == 200:
+                    matches.append(response.data.get("count", len(response.data["results"])))
+
+            latencies.sort()
+            print(f"{name:<16} {len(latencies):>8} {errors:>6} "
+                  f"{percentile(latencies, 0.50) * 1000:>8.2f} {percentile(latencies, 0.95) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f} {sum(matches) / max(len(matches), 1):>9.0f} "
+                  f"{sum(db_times) / len(db_times) * 1000:>7.2f}")
+
+        if args.explain:
+            for name in args.scenarios:
+                params = SCENARIOS[name](samples[0])
+                with CaptureQueriesContext(connection) as captured:
+                    client.get("/api/admin/loans/", params)
+
+                print(f"\n{name} {params}")
+                with connection.cursor() as cursor:
+                    for query in captured:
+                        if "LIKE" in query["sql"]:
+                            cursor.execute(f"EXPLAIN ANALYZE {query['sql']}")
+                            print("\n".join(line for line, in cursor.fetchall()))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in for the external loan validation API.
+
+Answers every POST with {"status": "approved"} or {"status": "rejected"}
+after an artificial latency, so the backend can be load tested without
+paying for (or hammering) the real validator. It runs on a single asyncio
+loop, so thousands of concurrent keep-alive connections cost no threads.
+
+With --batch it also serves POST /batch, taking {"cuils": [...]} and
+answering {"results": [{"cuil": ..., "status": ...}, ...]}; without it
+/batch answers 404, like a validator that only checks one CUIL per call.
+
+    python -m benchmarks.stub_validator --port 9000 --latency 0.2 --batch
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+
+from http import HTTPStatus
+
+
+def verdict_for(cuil: str) -> str:
+    """Deterministic verdict: CUILs ending in an even digit are approved."""
+    return "approved" if cuil and cuil[-1] in "02468" else "rejected"
+
+
+class StubValidator:
+    """Minimal HTTP/1.1 keep-alive server; use as a context manager to run it in the background."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, batch=False, failing=()):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.batch = batch
+        # CUILs answered with an error, to emulate partial failures
+        self.failing = set(failing)
+        self.request_count = 0
+        self.batch_request_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._connections = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    @property
+    def batch_url(self) -> str:
+        return f"{self.url}batch"
+
+    def handle_payload(self, path: str, payload: dict) -> tuple[int, dict]:
+        """Returns the (status code, body) answering a POST."""
+        if path.rstrip("/").endswith("/batch"):
+            if not self.batch:
+                return 404, {"detail": "Not found"}
+
+            self.batch_request_count += 1
+            return 200, {"results": [
+                {"cuil": cuil, "error": "unavailable"} if cuil in self.failing else
+                {"cuil": cuil, "status": verdict_for(cuil)}
+                for cuil in payload.get("cuils", [])
+            ]}
+
+        cuil = payload.get("cuil", "")
+        if cuil in self.failing:
+            return 503, {"detail": "unavailable"}
+
+        return 200, {"status": verdict_for(cuil)}
+
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                path = request_line.split()[1].decode()
+
+                self.request_count += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+                try:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                finally:
+                    self.in_flight -= 1
+
+                status_code, payload = self.handle_payload(path, json.loads(body or b"{}"))
+                content = json.dumps(payload).encode()
+
+                writer.write(
+                    f"HTTP/1.1 {status_code} {HTTPStatus(status_code).phrase}\r\n".encode()
+                    + b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(content)}\r\n\r\n".encode()
+                    + content
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(task)
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port, backlog=4096
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def __enter__(self):
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            self._started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    async def stop(self):
+        self._server.close()
+
+        connections = list(self._connections)
+        for task in connections:
+            task.cancel()
+
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+async def serve(args):
+    server = StubValidator(args.host, args.port, args.latency, batch=args.batch)
+    await server.start()
+    print(f"Stub validator listening on {server.url} (latency {args.latency}s, batch {args.batch})")
+
+    async with server._server:
+        await server._server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds to wait before answering")
+    parser.add_argument("--batch", action="store_true", help="Serve the /batch endpoint")
+
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class EligibilityCache(ABC):
+    """Base class for caches of validator verdicts keyed by CUIL."""
+
+    def __init__(self, approved_ttl: int, rejected_ttl: int):
+        self.approved_ttl = approved_ttl
+        self.rejected_ttl = rejected_ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, cuil: str) -> bool | None:
+        """Returns the cached verdict, or None when there is none."""
+        verdict = self._get(cuil)
+        self._count(verdict)
+        return verdict
+
+    def set(self, cuil: str, is_approved: bool):
+        ttl = self.approved_ttl if is_approved else self.rejected_ttl
+        if ttl > 0:
+            self._set(cuil, is_approved, ttl)
+
+    async def aget(self, cuil: str) -> bool | None:
+        verdict = await self._aget(cuil)
+        self._count(verdict)
+        return verdict
+
+    async def aset(self, cuil: str, is_approved: bool):
+        ttl = self.approved_ttl if is_approved else self.rejected_ttl
+        if ttl > 0:
+            await self._aset(cuil, is_approved, ttl)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._stats_lock:
+            self.hits = self.misses = 0
+
+    def _count(self, verdict):
+        with self._stats_lock:
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    @abstractmethod
+    def _get(self, cuil):
+        """The stored verdict, or None."""
+
+    @abstractmethod
+    def _set(self, cuil, is_approved, ttl):
+        """Stores a verdict for `ttl` seconds."""
+
+    async def _aget(self, cuil):
+        return self._get(cuil)
+
+    async def _aset(self, cuil, is_approved, ttl):
+        self._set(cuil, is_approved, ttl)
+
+
+class LRUEligibilityCache(EligibilityCache):
+    """In-process cache; evicts the least recently used CUIL past max_entries.
+
+    Expiry times are read from `clock`, which tests can replace.
+    """
+
+    def __init__(self, approved_ttl: int, rejected_ttl: int, max_entries: int, clock=time.monotonic):
+        super().__init__(approved_ttl, rejected_ttl)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, cuil):
+        with self._lock:
+            entry = self._entries.get(cuil)
+            if entry is None:
+                return None
+
+            is_approved, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[cuil]
+                return None
+
+            self._entries.move_to_end(cuil)
+            return is_approved
+
+    def _set(self, cuil, is_approved, ttl):
+        with self._lock:
+            self._entries[cuil] = (is_approved, self.clock() + ttl)
+            self._entries.move_to_end(cuil)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "size": len(self._entries)}
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoEligibilityCache(EligibilityCache):
+    """Cache shared between workers through a Django cache alias.
+
+    Entry limits and eviction are those of the configured backend
+    (e.g. OPTIONS["MAX_ENTRIES"] for locmem and database caches).
+    """
+
+    KEY_PREFIX = "loan-eligibility"
+
+    def __init__(self, approved_ttl: int, rejected_ttl: int, alias: str):
+        super().__init__(approved_ttl, rejected_ttl)
+        self.cache = caches[alias]
+
+    def key(self, cuil):
+        return f"{self.KEY_PREFIX}:{cuil}"
+
+    def _get(self, cuil):
+        return self.cache.get(self.key(cuil))
+
+    def _set(self, cuil, is_approved, ttl):
+        self.cache.set(self.key(cuil), is_approved, ttl)
+
+    async def _aget(self, cuil):
+        return await self.cache.aget(self.key(cuil))
+
+    async def _aset(self, cuil, is_approved, ttl):
+        await self.cache.aset(self.key(cuil), is_approved, ttl)
+
+
+class NullEligibilityCache(EligibilityCache):
+    """Cache used when caching is disabled; every lookup is a miss."""
+
+    def _get(self, cuil):
+        return None
+
+    def _set(self, cuil, is_approved, ttl):
+        pass
+
+
+_eligibility_cache = None
+_eligibility_cache_lock = threading.Lock()
+
+
+def build_eligibility_cache() -> EligibilityCache:
+    """Builds the cache selected by LOAN_VALIDATION_CACHE_BACKEND."""
+    backend = settings.LOAN_VALIDATION_CACHE_BACKEND
+    approved_ttl = settings.LOAN_VALIDATION_CACHE_APPROVED_TTL
+    rejected_ttl = settings.LOAN_VALIDATION_CACHE_REJECTED_TTL
+
+    if backend == "lru":
+        return LRUEligibilityCache(
+            approved_ttl, rejected_ttl, settings.LOAN_VALIDATION_CACHE_MAX_ENTRIES
+        )
+
+    if backend == "django":
+        return DjangoEligibilityCache(
+            approved_ttl, rejected_ttl, settings.LOAN_VALIDATION_CACHE_ALIAS
+        )
+
+    return NullEligibilityCache(0, 0)
+
+
+def get_eligibility_cache() -> EligibilityCache:
+    """Returns the process-wide eligibility cache."""
+    global _eligibility_cache
+
+    if _eligibility_cache is None:
+        with _eligibility_cache_lock:
+            if _eligibility_cache is None:
+                _eligibility_cache = build_eligibility_cache()
+
+    return _eligibility_cache
+
+
+def reset_eligibility_cache():
+    """Drops the process-wide cache so the next lookup rebuilds it from settings."""
+    global _eligibility_cache
+
+    with _eligibility_cache_lock:
+        _eligibility_cache = None
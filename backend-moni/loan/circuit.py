@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the validator while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of recent calls.
+
+    The circuit opens when, over at least `min_calls` of the last `window`
+    calls, the share of failures or of calls slower than `slow_call_duration`
+    reaches its threshold. After `cooldown` seconds it lets `half_open_calls`
+    trial calls through: a success closes it again, a failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        error_rate: float,
+        slow_call_duration: float,
+        slow_call_rate: float,
+        cooldown: float,
+        half_open_calls: int = 1,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+
+        self._state = self.CLOSED
+        self._calls = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._rejected_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError when the call must not reach the validator."""
+        with self._lock:
+            self._refresh_state()
+
+            if self._state == self.CLOSED:
+                return
+
+            if self._state == self.HALF_OPEN and self._trial_calls < self.half_open_calls:
+                self._trial_calls += 1
+                return
+
+            self._rejected_calls += 1
+
+        raise CircuitOpenError("Loan validation circuit is open")
+
+    def release(self):
+        """Gives back the trial slot of a call that ended without an outcome, e.g. a cancelled one."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    def record_success(self, duration: float):
+        self._record(failed=False, slow=duration >= self.slow_call_duration)
+
+    def record_failure(self, duration: float = 0.0):
+        self._record(failed=True, slow=duration >= self.slow_call_duration)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh_state()
+            return {
+                "state": self._state,
+                "recent_calls": len(self._calls),
+                "recent_failures": sum(failed for failed, _ in self._calls),
+                "recent_slow_calls": sum(slow for _, slow in self._calls),
+                "rejected_calls": self._rejected_calls,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._close()
+            self._rejected_calls = 0
+
+    def _record(self, failed: bool, slow: bool):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._close()
+                return
+
+            if self._state == self.OPEN:
+                return
+
+            self._calls.append((failed, slow))
+
+            if len(self._calls) < self.min_calls:
+                return
+
+            failures = sum(failed for failed, _ in self._calls)
+            slow_calls = sum(slow for _, slow in self._calls)
+
+            if (
+                failures / len(self._calls) >= self.error_rate
+                or slow_calls / len(self._calls) >= self.slow_call_rate
+            ):
+                self._open()
+
+    def _refresh_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._trial_calls = 0
+
+    def _open(self):
+        logger.warning("Loan validation circuit opened")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+
+    def _close(self):
+        if self._state != self.CLOSED:
+            logger.info("Loan validation circuit closed")
+        self._state = self.CLOSED
+        self._calls.clear()
+
+
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Returns the process-wide breaker guarding the validator."""
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker(
+                    window=settings.LOAN_VALIDATION_BREAKER_WINDOW,
+                    min_calls=settings.LOAN_VALIDATION_BREAKER_MIN_CALLS,
+                    error_rate=settings.LOAN_VALIDATION_BREAKER_ERROR_RATE,
+                    slow_call_duration=settings.LOAN_VALIDATION_BREAKER_SLOW_CALL,
+                    slow_call_rate=settings.LOAN_VALIDATION_BREAKER_SLOW_RATE,
+                    cooldown=settings.LOAN_VALIDATION_BREAKER_COOLDOWN,
+                    half_open_calls=settings.LOAN_VALIDATION_BREAKER_HALF_OPEN_CALLS,
+                )
+
+    return _circuit_breaker
+
+
+def reset_circuit_breaker():
+    """Drops the process-wide breaker so the next call rebuilds it from settings."""
+    global _circuit_breaker
+
+    with _circuit_breaker_lock:
+        _circuit_breaker = None
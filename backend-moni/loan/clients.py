@@ -0,0 +1,144 @@
+import asyncio
+import atexit
+import logging
+import threading
+
+from http.cookiejar import DefaultCookiePolicy
+
+import aiohttp
+import requests
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+_async_session = None
+_async_session_loop = None
+_async_stats = {"connections_opened": 0, "connections_reused": 0}
+
+
+def get_timeout() -> tuple[float, float]:
+    """Returns the (connect, read) timeout for calls to the validator."""
+    return (
+        settings.LOAN_VALIDATION_CONNECT_TIMEOUT,
+        settings.LOAN_VALIDATION_READ_TIMEOUT,
+    )
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide session, shared by every thread of the worker."""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+
+    return _session
+
+
+def _build_session() -> requests.Session:
+    adapter = HTTPAdapter(
+        pool_connections=settings.LOAN_VALIDATION_POOL_SIZE,
+        pool_maxsize=settings.LOAN_VALIDATION_POOL_PER_HOST,
+        # A blocking pool would wait for a free connection with no timeout at all;
+        # past pool_maxsize, extra connections are opened and closed after use instead.
+        pool_block=False,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Cookies are the only per-call state a Session keeps; the validator doesn't need them.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    logger.info("Opened pooled HTTP session")
+
+    return session
+
+
+def close_session():
+    """Closes the pooled session and its keep-alive sockets."""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# Workers exit through sys.exit on graceful shutdown, which runs atexit hooks.
+atexit.register(close_session)
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Returns the process-wide async session, keeping connections alive between calls."""
+    global _async_session, _async_session_loop
+
+    loop = asyncio.get_running_loop()
+
+    # aiohttp connectors are tied to the event loop that opened them.
+    if _async_session is None or _async_session.closed or _async_session_loop is not loop:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(_on_async_connection_created)
+        trace_config.on_connection_reuseconn.append(_on_async_connection_reused)
+
+        _async_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.LOAN_VALIDATION_POOL_SIZE,
+                limit_per_host=settings.LOAN_VALIDATION_POOL_PER_HOST,
+                keepalive_timeout=30,
+            ),
+            trace_configs=[trace_config],
+        )
+        _async_session_loop = loop
+
+        logger.info("Opened pooled async HTTP session")
+
+    return _async_session
+
+
+async def _on_async_connection_created(session, context, params):
+    _async_stats["connections_opened"] += 1
+
+
+async def _on_async_connection_reused(session, context, params):
+    _async_stats["connections_reused"] += 1
+
+
+async def aclose_async_session():
+    """Closes the pooled async session and its keep-alive connections."""
+    global _async_session, _async_session_loop
+
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+
+    _async_session = None
+    _async_session_loop = None
+
+
+def pool_stats() -> dict:
+    """Returns how many connections each pool opened and how many requests reused one."""
+    opened = requests_sent = 0
+
+    session = _session
+    if session is not None:
+        pools = session.get_adapter("https://").poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+
+    return {
+        "sync": {
+            "connections_opened": opened,
+            "connections_reused": max(requests_sent - opened, 0),
+        },
+        "async": dict(_async_stats),
+    }
@@ -0,0 +1,384 @@
+import asyncio
+import logging
+import select
+import threading
+import time
+
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from .models import LoanEvent
+
+logger = logging.getLogger(__name__)
+
+# Notified by the loan_event_notify trigger (migration 0008) when events are committed
+CHANNEL = "loan_events"
+
+# The writing transaction last, to tell which events a stream has seen
+EVENT_FIELDS = ["id", "loan_id", "kind", "status", "previous_status", "created_at", "txid"]
+
+# Milliseconds clients wait before reconnecting after the stream ends
+RETRY_MS = 3000
+
+# Seconds between attempts to reconnect the listener
+RECONNECT_DELAY = 1
+
+# Seconds a new stream waits for the listener to start listening
+LISTEN_TIMEOUT = 5
+
+
+def publish_created(loans):
+    """Records a `created` event per loan. Call it in the transaction that writes the loans."""
+    publish([
+        LoanEvent(loan_id=loan.pk, kind=LoanEvent.KindChoices.CREATED, status=loan.status)
+        for loan in loans
+    ])
+
+
+def publish_status_changes(changes):
+    """Records a `status_changed` event per (loan id, previous status, new status) that changed."""
+    publish([
+        LoanEvent(
+            loan_id=loan_id,
+            kind=LoanEvent.KindChoices.STATUS_CHANGED,
+            status=new_status,
+            previous_status=previous_status
+        )
+        for loan_id, previous_status, new_status in changes
+        if new_status != previous_status
+    ])
+
+
+def publish(events: list[LoanEvent]):
+    # The insert fires one NOTIFY per transaction, delivered when it commits
+    if events and settings.LOAN_EVENTS_ENABLED:
+        LoanEvent.objects.bulk_create(events)
+
+
+class Snapshot:
+    """A Postgres snapshot (`txid_current_snapshot()`): which writing transactions a read saw.
+
+    A transaction is seen when it committed before the snapshot was taken:
+    it is older than `xmin`, or older than `xmax` and not in progress (`xip`).
+    """
+
+    def __init__(self, text: str, taken_at: float):
+        xmin, xmax, xip = text.split(":")
+        self.xmin = int(xmin)
+        self.xmax = int(xmax)
+        self.xip = frozenset(int(txid) for txid in xip.split(",") if txid)
+        self.taken_at = taken_at
+
+    def sees(self, txid: int) -> bool:
+        return txid < self.xmin or (txid < self.xmax and txid not in self.xip)
+
+    def order(self) -> tuple:
+        # Snapshots taken later never see less, and sort after the earlier ones
+        return self.xmax, self.xmin, -len(self.xip)
+
+    def __str__(self):
+        return f"{self.xmin}:{self.xmax}:{','.join(map(str, sorted(self.xip)))}"
+
+
+def render_cursor(snapshot: Snapshot) -> bytes:
+    """The SSE id of a stream position: when its snapshot was taken, and the snapshot."""
+    return b"%d-%s" % (snapshot.taken_at, str(snapshot).encode())
+
+
+def parse_cursor(value: str | None) -> Snapshot | None:
+    """The position in a Last-Event-ID, or None when there is none or it isn't ours."""
+    try:
+        taken_at, snapshot = value.split("-", 1)
+        return Snapshot(snapshot, int(taken_at))
+    except (AttributeError, ValueError):
+        return None
+
+
+def render_event(row, cursor: bytes | None = None) -> bytes:
+    """The SSE frame of an event read as EVENT_FIELDS, with the stream position once it is sent."""
+    event_id, loan_id, kind, status, previous_status, created_at, _ = row
+    data = api_settings.DEFAULT_RENDERER_CLASSES[0]().render({
+        "id": event_id,
+        "loan": loan_id,
+        "status": status,
+        "previous_status": previous_status or None,
+        "created_at": created_at,
+    })
+    frame = b"event: loan.%s\ndata: %s\n\n" % (kind.encode(), data)
+
+    return b"id: %s\n%s" % (cursor, frame) if cursor else frame
+
+
+def render_reset(cursor: bytes) -> bytes:
+    """Tells the client it missed too much to catch up, and to reload what it shows."""
+    return b"id: %s\nevent: reset\ndata: {}\n\n" % cursor
+
+
+def read_unseen(cursor, seen: Snapshot | None, limit: int | None = None) -> tuple[Snapshot, list]:
+    """The snapshot of one read and, unless `seen` is None, the events it sees that `seen` didn't."""
+    taken_at = time.time()
+
+    if seen is None:
+        cursor.execute("SELECT txid_current_snapshot()::text")
+        return Snapshot(cursor.fetchone()[0], taken_at), []
+
+    # One statement, so the rows are exactly those its snapshot sees
+    cursor.execute(
+        f"SELECT snapshot::text, {', '.join(EVENT_FIELDS)} FROM txid_current_snapshot() AS snapshot "
+        f"LEFT JOIN {LoanEvent._meta.db_table} ON txid >= %s "
+        "AND NOT txid_visible_in_snapshot(txid, %s::txid_snapshot) "
+        f"ORDER BY id {'LIMIT %d' % limit if limit is not None else ''}",
+        [seen.xmin, str(seen)]
+    )
+    rows = cursor.fetchall()
+
+    return Snapshot(rows[0][0], taken_at), [row[1:] for row in rows if row[1] is not None]
+
+
+def catch_up(seen: Snapshot | None) -> tuple[list[bytes], Snapshot]:
+    """Frames for a new stream, and the snapshot of what they leave the client having seen.
+
+    Event ids are taken when an event is written, not when it commits, so
+    resuming "after" an id would miss smaller ones committed later. The stream
+    position instead holds the snapshot of what the client has seen, and the
+    events replayed are exactly those committed since. Without a position, the
+    current one is sent (as a frame that is no event), so a client that
+    reconnects resumes from there.
+    """
+    try:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            if seen is None:
+                snapshot, _ = read_unseen(cursor, None)
+                return [b"id: %s\n\n" % render_cursor(snapshot)], snapshot
+
+            snapshot, rows = read_unseen(cursor, seen, settings.LOAN_EVENTS_REPLAY_LIMIT + 1)
+
+        # Events the client missed may be purged, or there are too many to replay
+        if seen.taken_at < time.time() - settings.LOAN_EVENTS_TTL or len(rows) > settings.LOAN_EVENTS_REPLAY_LIMIT:
+            return [render_reset(render_cursor(snapshot))], snapshot
+
+        frames = [render_event(row) for row in rows[:-1]]
+        if rows:
+            frames.append(render_event(rows[-1], render_cursor(snapshot)))
+
+        return frames, snapshot
+    finally:
+        # Streams may stay open for hours; they shouldn't hold a connection each
+        connections.close_all()
+
+
+async def stream(position: Snapshot | None, until: float):
+    """SSE frames: missed events (see catch_up), then live ones until `until` (a timestamp).
+
+    Only the last frame of each batch carries the stream position, so a client
+    cut off halfway through a batch gets all of it again when it resumes.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe()
+
+    try:
+        yield b"retry: %d\n\n" % RETRY_MS
+
+        # Listening before reading the table, so nothing committed in between is lost
+        if not await asyncio.to_thread(broker.listening.wait, LISTEN_TIMEOUT):
+            return
+
+        frames, seen = await sync_to_async(catch_up)(position)
+        for frame in frames:
+            yield frame
+
+        while True:
+            timeout = min(settings.LOAN_EVENTS_HEARTBEAT, until - time.time())
+            if timeout <= 0:
+                return
+
+            try:
+                batch = await asyncio.wait_for(subscription.get(), timeout)
+            except TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield b": keep-alive\n\n"
+                continue
+
+            if batch is None:
+                return
+
+            snapshot, rows = batch
+            # Rows committed before the catch-up read were replayed already
+            rows = [row for row in rows if not seen.sees(row[-1])]
+            if snapshot.order() > seen.order():
+                seen = snapshot
+
+            if rows:
+                for row in rows[:-1]:
+                    yield render_event(row)
+                yield render_event(rows[-1], render_cursor(seen))
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class Subscription:
+    """Batches of events for one stream, queued on the stream's event loop."""
+
+    def __init__(self, loop, max_pending: int):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.max_pending = max_pending
+        self.pending = 0
+        self.closed = False
+
+    def push(self, batch):
+        """Queues a (snapshot, rows) batch, or ends the stream with None. Safe from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._offer, batch)
+        except RuntimeError:
+            # The loop is closed, and the stream with it
+            pass
+
+    async def get(self):
+        batch = await self.queue.get()
+        if batch is not None:
+            self.pending -= len(batch[1])
+
+        return batch
+
+    def _offer(self, batch):
+        if self.closed:
+            return
+
+        if batch is None or self.pending + len(batch[1]) > self.max_pending:
+            # The client reconnects and resumes from the table
+            self.closed = True
+            self.queue.put_nowait(None)
+            return
+
+        self.pending += len(batch[1])
+        self.queue.put_nowait(batch)
+
+
+class LoanEventBroker:
+    """Fans out loan events from one LISTEN connection per process to all of its streams.
+
+    The listener thread starts with the first stream. Notifications wake it
+    up to read the events committed since its previous read, once for every
+    stream. Streams that fall LOAN_EVENTS_MAX_PENDING events behind, and all of
+    them when the connection is lost, are ended; their clients reconnect and
+    resume from the table with Last-Event-ID.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        # What the listener has read; streams get only events committed after it
+        self._snapshot = None
+        self.listening = threading.Event()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), settings.LOAN_EVENTS_MAX_PENDING)
+
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="loan-events", daemon=True)
+                self._thread.start()
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stop(self):
+        """Stops the listener and ends every stream."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                self._listen(connection)
+            except Exception:
+                logger.exception("Loan event listener lost its database connection")
+            finally:
+                self.listening.clear()
+                self._end_streams()
+                connection.close()
+
+            self._stopping.wait(RECONNECT_DELAY)
+
+    def _listen(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+            # Streams read the table after this, so they replay whatever it saw
+            self._snapshot, _ = read_unseen(cursor, None)
+        self.listening.set()
+
+        raw = connection.connection
+        while not self._stopping.is_set():
+            # Wakes up every second to notice stop()
+            if select.select([raw], [], [], 1)[0]:
+                raw.poll()
+
+            if raw.notifies:
+                raw.notifies.clear()
+                self._dispatch(connection)
+
+    def _dispatch(self, connection):
+        with connection.cursor() as cursor:
+            snapshot, rows = read_unseen(cursor, self._snapshot)
+        self._snapshot = snapshot
+
+        # Taken after the read: a stream subscribing meanwhile may have caught up from an
+        # older snapshot, and skips the rows it replayed already
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        if rows:
+            for subscription in subscriptions:
+                subscription.push((snapshot, rows))
+
+    def _end_streams(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            self._subscriptions.clear()
+
+        for subscription in subscriptions:
+            subscription.push(None)
+
+
+_broker = LoanEventBroker()
+
+
+def get_broker() -> LoanEventBroker:
+    """Returns the process-wide loan event broker."""
+    return _broker
+
+
+def purge_events(batch_size: int = 10000) -> int:
+    """Deletes events older than LOAN_EVENTS_TTL in batches and returns how many.
+
+    Clients that far behind get a reset.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.LOAN_EVENTS_TTL)
+    deleted = 0
+
+    while True:
+        ids = list(
+            LoanEvent.objects.filter(created_at__lt=cutoff)
+            .order_by("created_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+
+        deleted += LoanEvent.objects.filter(pk__in=ids).delete()[0]
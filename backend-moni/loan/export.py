@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+
+from datetime import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+# Rows fetched per server-side cursor round-trip and written per streamed block
+CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    "id",
+    "id_number",
+    "full_name",
+    "gender",
+    "email",
+    "amount",
+    "status",
+    "created_at",
+    "updated_at",
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def format_value(value):
+    """Formats values the way LoanRequestSerializer does: decimals as strings, UTC as Z."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    if isinstance(value, Decimal):
+        return str(value)
+
+    return value
+
+
+def csv_chunks(rows, chunk_size: int):
+    """Yields the header and then one encoded block of CSV per `chunk_size` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([format_value(value) for value in row])
+
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(rows, chunk_size: int):
+    """Yields one encoded block of JSON lines per `chunk_size` rows."""
+    lines = []
+
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_FIELDS, map(format_value, row))), ensure_ascii=False))
+
+        if len(lines) == chunk_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def async_chunks(chunks):
+    """Pulls blocks from a sync generator one at a time.
+
+    Under ASGI, Django buffers a sync iterator into a list before sending it,
+    which would hold the whole export in memory.
+    """
+    next_chunk = sync_to_async(next)
+
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
@@ -0,0 +1,92 @@
+import operator
+
+from functools import reduce
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import BooleanField, Func, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import SearchFilter
+
+
+class EqualsAny(Func):
+    """`value = ANY(array)`: whether the value is one of the array's elements."""
+
+    arg_joiner = " = ANY("
+    template = "%(expressions)s)"
+    output_field = BooleanField()
+
+
+class LoanSearchFilter(SearchFilter):
+    """`?search=` over the view's `search_fields`, shaped for their indexes.
+
+    A loan matches when one field contains every term, case-insensitively, so
+    each field's index answers for the whole search in one scan. A term with an
+    @ past its first character can only be an email address: it is matched
+    against the start of the email, because the domain's trigrams are shared by
+    nearly every loan and would make the trigram index read most of itself.
+    Terms shorter than three characters have no trigrams: they narrow a search
+    with a longer term, but alone only match the start of prefix fields (`^`)
+    and of the email.
+
+    The matching ids are collected first, as `pk = ANY(ARRAY(...))`, and only
+    then ordered and paginated. pg_trgm can't estimate how many loans a LIKE
+    matches, so with the search inline the planner often read the -id index
+    backwards, testing loans one by one until a page was full: quick when many
+    match, but most of the table when few do. The array is computed once,
+    through the search indexes, at a cost that follows the number of matches.
+    """
+
+    MIN_TERM_LENGTH = 3
+    # A shorter prefix would match most of the table
+    MIN_PREFIX_LENGTH = 2
+    EMAIL_FIELD = "email"
+
+    def get_search_terms(self, request):
+        terms = super().get_search_terms(request)
+
+        if terms and max(map(len, terms)) < self.MIN_PREFIX_LENGTH:
+            raise ValidationError({
+                self.search_param: [f"Search for at least {self.MIN_PREFIX_LENGTH} characters."]
+            })
+
+        return terms
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        if not search_fields or not terms:
+            return queryset
+
+        emails = {term for term in terms if "@" in term[1:]}
+        # The trigram indexes can only find a loan by a term with trigrams
+        prefix_only = max(map(len, terms)) < self.MIN_TERM_LENGTH
+        matches = []
+        for search_field in search_fields:
+            lookup = self.construct_search(str(search_field), queryset)
+            if lookup.startswith(f"{self.EMAIL_FIELD}__"):
+                lookups = [
+                    f"{self.EMAIL_FIELD}__istartswith" if prefix_only or term in emails else lookup
+                    for term in terms
+                ]
+            elif emails:
+                # Nothing but an email has an @
+                continue
+            elif prefix_only and not lookup.endswith("__istartswith"):
+                continue
+            else:
+                lookups = [lookup] * len(terms)
+
+            matches.append(reduce(operator.and_, (Q(**{lookup: term}) for lookup, term in zip(lookups, terms))))
+
+        if prefix_only and not matches:
+            raise ValidationError({
+                self.search_param: [f"Search terms must be at least {self.MIN_TERM_LENGTH} characters long."]
+            })
+
+        if not matches:
+            return queryset.none()
+
+        # The array also takes the other filters (status), so it only holds the loans to show
+        return queryset.filter(EqualsAny(
+            "pk", ArraySubquery(queryset.filter(reduce(operator.or_, matches)).order_by().values("pk"))
+        ))
@@ -0,0 +1,77 @@
+import hashlib
+import json
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used with a different request body."""
+
+
+def fingerprint(data) -> str:
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+
+def run_once(key: str, data, handler) -> tuple[int, object, bool]:
+    """Runs `handler()` once per key and returns (status code, data, replayed).
+
+    The key row is inserted and locked in the transaction that runs the
+    handler. A request with the same key that arrives meanwhile waits on that
+    row, then replays the stored response instead of validating again. If the
+    handler raises, the row is rolled back and the key can be retried.
+    """
+    request_fingerprint = fingerprint(data)
+
+    with transaction.atomic():
+        # Blocks behind an uncommitted insert of the same key
+        IdempotencyKey.objects.bulk_create(
+            [IdempotencyKey(key=key, fingerprint=request_fingerprint)], ignore_conflicts=True
+        )
+        record = IdempotencyKey.objects.select_for_update().get(key=key)
+
+        expired = record.created_at < timezone.now() - timedelta(seconds=settings.LOAN_IDEMPOTENCY_TTL)
+
+        if record.status_code is not None and not expired:
+            if record.fingerprint != request_fingerprint:
+                raise IdempotencyKeyReused(key)
+
+            return record.status_code, record.response, True
+
+        response = handler()
+
+        record.fingerprint = request_fingerprint
+        record.status_code = response.status_code
+        record.response = response.data
+        record.loan_id = response.data.get("id") if response.status_code < 300 else None
+        record.created_at = timezone.now()
+        record.save()
+
+    return response.status_code, response.data, False
+
+
+def purge_expired(batch_size: int = 10000) -> int:
+    """Deletes keys older than LOAN_IDEMPOTENCY_TTL in batches and returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.LOAN_IDEMPOTENCY_TTL)
+    deleted = 0
+
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff)
+            .order_by("created_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+
+        deleted += IdempotencyKey.objects.filter(pk__in=ids, created_at__lt=cutoff).delete()[0]
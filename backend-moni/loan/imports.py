@@ -0,0 +1,138 @@
+import csv
+import io
+import itertools
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import events, stats
+from .models import LoanRequest, LoanValidationTask
+from .serializers import LoanRequestSerializer
+from .services import LoanValidationService
+
+IMPORT_FORMATS = ["csv", "ndjson"]
+
+# What the decoder puts in place of bytes that aren't UTF-8
+UNDECODABLE = "\ufffd"
+NOT_UTF8 = "Line is not valid UTF-8."
+
+
+def detect_format(filename: str) -> str | None:
+    """Guesses the import format from the file extension."""
+    extension = filename.rpartition(".")[2].lower()
+    if extension == "jsonl":
+        return "ndjson"
+
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def read_rows(stream, import_format: str):
+    """Yields (line number, row) for each record of a binary stream.
+
+    Lines are decoded as they are read, so the file is never held in memory.
+    A row that can't be parsed is yielded as the error message instead of a dict.
+    """
+    # Bytes that aren't UTF-8 (e.g. a Latin-1 export) would raise halfway through
+    # an import whose earlier chunks are already saved; replace them and reject
+    # their row instead
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+
+    if import_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, "Row has more columns than the header."
+            elif any(UNDECODABLE in value for value in row.values() if value):
+                yield reader.line_num, NOT_UTF8
+            else:
+                yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        if UNDECODABLE in line:
+            yield line_number, NOT_UTF8
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, "Invalid JSON."
+            continue
+
+        yield line_number, row if isinstance(row, dict) else "Expected a JSON object."
+
+
+def import_loans(rows, chunk_size: int | None = None, on_error=None) -> dict:
+    """Validates, checks and inserts loans from `read_rows`, one transaction per chunk.
+
+    Each chunk is validated with the LoanRequestSerializer rules, its CUILs are
+    checked at once with `check_loan_eligibility_batch`, and the loans are
+    written with a single bulk_create. Loans without a verdict (validator down,
+    or LOAN_VALIDATION_MODE=deferred) are stored as PEN and queued for the worker.
+    `on_error(line_number, errors)` is called for every rejected row.
+    """
+    chunk_size = chunk_size or settings.LOAN_IMPORT_CHUNK_SIZE
+    # One serializer validates every row, so its fields are only built once
+    validator = LoanRequestSerializer()
+    totals = {"rows": 0, "created": 0, "invalid": 0, **{value: 0 for value in LoanRequest.StatusChoices.values}}
+
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        totals["rows"] += len(chunk)
+
+        valid = []
+        for line_number, row in chunk:
+            try:
+                if isinstance(row, str):
+                    raise ValidationError({"non_field_errors": [row]})
+                valid.append(validator.run_validation(row))
+            except ValidationError as e:
+                totals["invalid"] += 1
+                if on_error is not None:
+                    on_error(line_number, e.detail)
+
+        for loan in save_chunk(valid):
+            totals["created"] += 1
+            totals[loan.status] += 1
+
+    return totals
+
+
+def save_chunk(validated_rows: list[dict]) -> list[LoanRequest]:
+    if not validated_rows:
+        return []
+
+    if settings.LOAN_VALIDATION_MODE == "deferred":
+        verdicts = {}
+    else:
+        verdicts = LoanValidationService.check_loan_eligibility_batch(
+            [row["id_number"] for row in validated_rows]
+        )
+
+    loans = [
+        LoanRequest(**row, status=loan_status(verdicts.get(row["id_number"])))
+        for row in validated_rows
+    ]
+
+    with transaction.atomic():
+        loans = LoanRequest.objects.bulk_create(loans)
+        LoanValidationTask.objects.bulk_create([
+            LoanValidationTask(loan=loan) for loan in loans
+            if loan.status == LoanRequest.StatusChoices.PENDING
+        ])
+        stats.track(added=[stats.loan_key(loan) for loan in loans])
+        events.publish_created(loans)
+
+    return loans
+
+
+def loan_status(is_approved: bool | None) -> str:
+    if is_approved is None:
+        return LoanRequest.StatusChoices.PENDING
+
+    return LoanRequest.StatusChoices.APPROVED if is_approved else LoanRequest.StatusChoices.REJECTED
@@ -0,0 +1,44 @@
+import json
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from loan.imports import IMPORT_FORMATS, detect_format, import_loans, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import loan requests from a CSV or NDJSON file, validating and checking them in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="File to import")
+        parser.add_argument("--format", choices=IMPORT_FORMATS,
+                            help="File format (default: from the extension)")
+        parser.add_argument("--chunk-size", type=int,
+                            help="Rows per transaction (default: LOAN_IMPORT_CHUNK_SIZE)")
+        parser.add_argument("--report", type=Path,
+                            help="NDJSON file listing every invalid row (default: stderr)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        import_format = options["format"] or detect_format(path.name)
+        if import_format is None:
+            raise CommandError("Can't tell the format from the extension; pass --format")
+
+        report = options["report"].open("w") if options["report"] else self.stderr
+
+        def write_error(line_number, errors):
+            report.write(json.dumps({"line": line_number, "errors": errors}, cls=DjangoJSONEncoder) + "\n")
+
+        try:
+            with path.open("rb") as stream:
+                totals = import_loans(read_rows(stream, import_format), options["chunk_size"], write_error)
+        finally:
+            if options["report"]:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully imported {totals['created']} of {totals['rows']} loans "
+            f"({totals['APR']} approved, {totals['REJ']} rejected, {totals['PEN']} pending, "
+            f"{totals['invalid']} invalid)."))
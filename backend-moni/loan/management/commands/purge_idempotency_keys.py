@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loan.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than LOAN_IDEMPOTENCY_TTL (run it from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000,
+                            help="Keys deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully purged {deleted} idempotency keys older than {settings.LOAN_IDEMPOTENCY_TTL}s."))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loan.events import purge_events
+
+
+class Command(BaseCommand):
+    help = "Delete loan events older than LOAN_EVENTS_TTL (run it from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000,
+                            help="Events deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = purge_events(options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully purged {deleted} loan events older than {settings.LOAN_EVENTS_TTL}s."))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loan.singleflight import purge_flights
+
+
+class Command(BaseCommand):
+    help = "Delete validator verdicts shared between processes older than LOAN_VALIDATION_FLIGHT_TTL (run it from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000,
+                            help="Verdicts deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = purge_flights(options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully purged {deleted} validator verdicts older than {settings.LOAN_VALIDATION_FLIGHT_TTL}s."))
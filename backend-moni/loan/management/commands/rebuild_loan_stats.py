@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from loan import stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily loan stats behind the admin summary from the loan table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true",
+                            help="Only compare the stats with a full GROUP BY and fail on differences")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            differences = stats.differences()
+            for row in differences:
+                self.stdout.write(
+                    f"{row['day']} {row['status']}: expected {row['expected']}, found {row['actual']}"
+                )
+
+            if differences:
+                raise CommandError(f"{len(differences)} daily stats rows differ from the loans.")
+
+            self.stdout.write(self.style.SUCCESS("Daily loan stats match the loans."))
+            return
+
+        rows = stats.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully rebuilt {rows} daily loan stats rows."))
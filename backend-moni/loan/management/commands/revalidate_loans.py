@@ -0,0 +1,215 @@
+import itertools
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+import requests
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from loan import events, stats
+from loan.circuit import CircuitOpenError
+from loan.models import LoanRequest, LoanValidationTask
+from loan.services import LoanValidationService
+
+
+class RateLimiter:
+    """Spaces calls evenly so that all threads together stay under `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(self.next_call, now)
+            self.next_call = call_at + self.interval
+
+        time.sleep(call_at - now)
+
+
+class Command(BaseCommand):
+    help = "Re-check loans against the external API concurrently and store the new verdicts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", nargs="+", default=[LoanRequest.StatusChoices.PENDING],
+                            choices=LoanRequest.StatusChoices.values,
+                            help="Statuses to re-validate (default: PEN)")
+        parser.add_argument("--stale-days", type=int,
+                            help="Only loans not updated in this many days")
+        parser.add_argument("--concurrency", type=int, default=8,
+                            help="Validator calls in flight at once")
+        parser.add_argument("--rate", type=float, default=20,
+                            help="Max validator calls per second, 0 for unlimited")
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Loans written back per bulk_update")
+        parser.add_argument("--checkpoint", type=Path,
+                            help="File recording the last written loan id and the loans whose check failed")
+        parser.add_argument("--resume", action="store_true",
+                            help="Retry the failed loans in --checkpoint, then continue after its id")
+
+    def handle(self, *args, **options):
+        queryset = LoanRequest.objects.filter(status__in=options["status"])
+
+        if options["stale_days"] is not None:
+            queryset = queryset.filter(
+                updated_at__lt=timezone.now() - timedelta(days=options["stale_days"])
+            )
+
+        checkpoint = options["checkpoint"]
+        last_id = 0
+        # Loans whose check failed, before the checkpoint's id; a resumed run retries them
+        failed_ids = set()
+        if options["resume"]:
+            if not checkpoint:
+                raise CommandError("--resume requires --checkpoint")
+            if checkpoint.exists():
+                state = json.loads(checkpoint.read_text())
+                last_id = state["last_id"]
+                # Kept until checked, in case this run stops before reaching them too
+                failed_ids = set(queryset.filter(pk__in=state.get("failed_ids", [])).values_list("pk", flat=True))
+                queryset = queryset.filter(Q(pk__gt=last_id) | Q(pk__in=failed_ids))
+                self.stdout.write(f"Resuming after loan {last_id}, retrying {len(failed_ids)} failed loans")
+
+        total = queryset.count()
+        rows = (
+            queryset
+            .order_by("pk")
+            .only("pk", "id_number", "status")
+            .iterator(chunk_size=options["chunk_size"])
+        )
+
+        self.limiter = RateLimiter(options["rate"])
+        self.thread_connections = set()
+        self.thread_connections_lock = threading.Lock()
+        processed = changed = failed = 0
+        started = time.monotonic()
+
+        try:
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                while chunk := list(itertools.islice(rows, options["chunk_size"])):
+                    verdicts = list(executor.map(self.validate, chunk))
+
+                    done = []
+                    for loan, verdict in zip(chunk, verdicts):
+                        if isinstance(verdict, CircuitOpenError):
+                            break
+                        done.append((loan, verdict))
+
+                    changed += self.write_back(done)
+                    failed += sum(verdict is None for _, verdict in done)
+                    processed += len(done)
+
+                    for loan, verdict in done:
+                        if verdict is None:
+                            failed_ids.add(loan.pk)
+                        else:
+                            failed_ids.discard(loan.pk)
+
+                    if done:
+                        # Retried loans come first, below the last id
+                        last_id = max(last_id, done[-1][0].pk)
+                        if checkpoint:
+                            checkpoint.write_text(json.dumps({"last_id": last_id, "failed_ids": sorted(failed_ids)}))
+
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{processed}/{total} loans, {changed} changed, {failed} failed, "
+                        f"{processed / elapsed:.1f} loans/s"
+                    )
+
+                    if len(done) < len(chunk):
+                        raise CommandError(
+                            "Validator circuit is open; stopped early. Re-run with --resume to continue."
+                        )
+        finally:
+            self.close_thread_connections()
+
+        if failed_ids:
+            self.stdout.write(self.style.WARNING(
+                f"{len(failed_ids)} loans could not be checked; re-run with --resume to retry them."))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully re-validated {processed} loans ({changed} changed)."))
+
+    def validate(self, loan):
+        """Returns the new status, None when the call failed, or the CircuitOpenError."""
+        self.limiter.wait()
+        self.track_thread_connection()
+
+        try:
+            is_approved = LoanValidationService.check_loan_eligibility(
+                loan.id_number, use_cache=False, raise_errors=True
+            )
+        except (requests.RequestException, ValueError):
+            return None
+        except CircuitOpenError as e:
+            return e
+
+        return (
+            LoanRequest.StatusChoices.APPROVED
+            if is_approved else
+            LoanRequest.StatusChoices.REJECTED
+        )
+
+    def track_thread_connection(self):
+        # Each pool thread gets its own connection (the validator calls take
+        # advisory locks on it); let the main thread close them at the end
+        connection = connections[DEFAULT_DB_ALIAS]
+        with self.thread_connections_lock:
+            if connection not in self.thread_connections:
+                connection.inc_thread_sharing()
+                self.thread_connections.add(connection)
+
+    def close_thread_connections(self):
+        with self.thread_connections_lock:
+            for connection in self.thread_connections:
+                connection.close()
+                connection.dec_thread_sharing()
+            self.thread_connections.clear()
+
+    def write_back(self, results) -> int:
+        now = timezone.now()
+        new_statuses = {loan.pk: new_status for loan, new_status in results if new_status is not None}
+
+        with transaction.atomic():
+            # Statuses may have changed since the chunk was read (an admin decision,
+            # the deferred worker), so compare against the locked rows
+            current = list(
+                LoanRequest.objects.select_for_update()
+                .filter(pk__in=new_statuses)
+                .order_by("pk")
+                .only("pk", "status", "created_at", "amount")
+            )
+
+            removed = []
+            updated = []
+            changes = []
+            for loan in current:
+                if new_statuses[loan.pk] != loan.status:
+                    removed.append(stats.loan_key(loan))
+                    changes.append((loan.pk, loan.status, new_statuses[loan.pk]))
+                    loan.status = new_statuses[loan.pk]
+                    loan.updated_at = now
+                    updated.append(loan)
+
+            LoanRequest.objects.bulk_update(updated, ["status", "updated_at"])
+            stats.track(added=[stats.loan_key(loan) for loan in updated], removed=removed)
+            events.publish_status_changes(changes)
+
+            # Loans decided here no longer need the deferred validation worker
+            LoanValidationTask.objects.filter(loan__in=updated).delete()
+
+        return len(updated)
@@ -1,39 +1,137 @@
-from django.core.management.base import BaseCommand
-from loan.models import LoanRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from loan import stats
+from loan.models import LoanRequest, LoanValidationTask
 from django.utils import timezone
+from datetime import timedelta
+import csv
+import io
 import random
 import faker
 
 fake = faker.Faker()
 
 
+def parse_weights(value: str, choices) -> dict:
+    """Parses "APR=49,REJ=49,PEN=2" into {"APR": 49.0, ...}, checking keys against `choices`."""
+    weights = {}
+
+    for part in value.split(","):
+        key, _, weight = part.partition("=")
+        key = key.strip().upper()
+
+        if key not in choices:
+            raise CommandError(f"Unknown value '{key}', expected one of: {', '.join(choices)}")
+
+        try:
+            weights[key] = float(weight) if weight else 1.0
+        except ValueError:
+            raise CommandError(f"Invalid weight '{weight}' for '{key}'")
+
+    if not any(weights.values()):
+        raise CommandError(f"At least one weight in '{value}' must be positive")
+
+    return weights
+
+
 class Command(BaseCommand):
-    help = "Seed 5 fake loan requests (only in local environment)"
+    help = "Seed fake loan requests, 5 by default (only in local environment)"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=5,
+                            help="Loans to create")
+        parser.add_argument("--status", default="APR=1,REJ=1",
+                            help="Status weights, e.g. APR=49,REJ=49,PEN=2")
+        parser.add_argument("--gender", default="F=1,M=1,O=1",
+                            help="Gender weights, e.g. F=45,M=45,O=10")
+        parser.add_argument("--days", type=float, default=0,
+                            help="Spread created_at uniformly over this many past days")
+        parser.add_argument("--seed", type=int,
+                            help="Random seed for a reproducible dataset")
+        parser.add_argument("--batch-size", type=int, default=10000,
+                            help="Rows sent per COPY statement")
+        parser.add_argument("--pool-size", type=int, default=1000,
+                            help="Distinct fake names and emails to pick from")
+        parser.add_argument("--append", action="store_true",
+                            help="Seed even if loans already exist")
+
+    def handle(self, *args, **options):
         if not self.is_local():
             self.stdout.write(self.style.WARNING(
                 "Not in local environment. Skipping seeding."))
             return
 
-        if LoanRequest.objects.count():
+        if not options["append"] and LoanRequest.objects.exists():
             self.stdout.write(self.style.SUCCESS(
                 "Loans already exist. Skipping seeding."))
             return
 
-        for _ in range(5):
-            LoanRequest.objects.create(
-                full_name=fake.name(),
-                id_number="".join([str(random.randint(0, 9)) for _ in range(8)]),
-                amount=random.randint(1000, 10000),
-                status=random.choice(["REJ", "APR"]),
-                created_at=timezone.now(),
-                email=fake.email(),
-                gender=random.choice(["F", "M", "O"])
+        statuses = parse_weights(options["status"], LoanRequest.StatusChoices.values)
+        genders = parse_weights(options["gender"], LoanRequest.GenderChoices.values)
+
+        rng = random.Random(options["seed"])
+        if options["seed"] is not None:
+            fake.seed_instance(options["seed"])
+
+        pool_size = min(options["pool_size"], options["count"]) or 1
+        names = [fake.name() for _ in range(pool_size)]
+        emails = [fake.email() for _ in range(pool_size)]
+
+        now = timezone.now()
+        spread = options["days"] * 86400
+        count = options["count"]
+        batch_size = options["batch_size"]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            last_id = LoanRequest.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+            for start in range(0, count, batch_size):
+                size = min(batch_size, count - start)
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+
+                for status, gender, name, email in zip(
+                    rng.choices(list(statuses), list(statuses.values()), k=size),
+                    rng.choices(list(genders), list(genders.values()), k=size),
+                    rng.choices(names, k=size),
+                    rng.choices(emails, k=size),
+                ):
+                    created_at = (now - timedelta(seconds=rng.random() * spread)).isoformat()
+                    writer.writerow([
+                        f"{rng.randrange(10 ** 8):08d}",
+                        name,
+                        gender,
+                        email,
+                        rng.randint(1000, 10000),
+                        status,
+                        created_at,
+                        created_at,
+                    ])
+
+                buffer.seek(0)
+                # COPY instead of bulk_create: much faster, and it keeps our created_at,
+                # which auto_now_add would overwrite
+                cursor.cursor.copy_expert(
+                    f"COPY {LoanRequest._meta.db_table} "
+                    "(id_number, full_name, gender, email, amount, status, created_at, updated_at) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+
+                self.stdout.write(f"{start + size}/{count} loans")
+
+            # Seeded PEN loans wait for the validation worker, like those from intake
+            cursor.execute(
+                f"INSERT INTO {LoanValidationTask._meta.db_table} (loan_id, attempts, available_at, created_at) "
+                f"SELECT id, 0, now(), now() FROM {LoanRequest._meta.db_table} WHERE id > %s AND status = %s",
+                [last_id, LoanRequest.StatusChoices.PENDING]
             )
 
+            # COPY skips the code that keeps the daily stats current
+            stats.rebuild()
+
         self.stdout.write(self.style.SUCCESS(
-            "Successfully seeded 5 loan requests."))
+            f"Successfully seeded {count} loan requests."))
 
     def is_local(self):
         from django.conf import settings
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from loan.queue import process_validation_batch
+
+
+class Command(BaseCommand):
+    help = "Validate queued pending loans against the external API in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Loans claimed and updated per transaction")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit instead of polling")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        validated = 0
+
+        while True:
+            result = process_validation_batch(batch_size)
+            validated += result["validated"]
+
+            if result["validated"]:
+                self.stdout.write(f"Validated {result['validated']} loans")
+
+            if result["validated"] < batch_size or result["deferred"]:
+                if options["once"]:
+                    break
+
+                time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully validated {validated} loans."))
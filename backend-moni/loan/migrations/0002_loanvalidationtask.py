@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanValidationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='validation_task', to='loan.loanrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['available_at', 'id'], name='loan_task_available_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY, so intake keeps writing loans while the list indexes build;
+    # it can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('loan', '0002_loanvalidationtask'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=models.Index(fields=['status', '-id'], name='loan_status_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=models.Index(fields=['created_at'], name='loan_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=models.Index(fields=['id_number'], name='loan_id_number_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_stats(apps, schema_editor):
+    LoanRequest = apps.get_model("loan", "LoanRequest")
+    LoanDailyStats = apps.get_model("loan", "LoanDailyStats")
+
+    rows = (
+        LoanRequest.objects
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(count=Count("id"), amount=Sum("amount"))
+        .order_by()
+    )
+    LoanDailyStats.objects.bulk_create([LoanDailyStats(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0003_loanrequest_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('PEN', 'Pending'), ('APR', 'Approved'), ('REJ', 'Rejected')], max_length=10)),
+                ('count', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=38)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status'), name='loan_daily_stats_day_status_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0006_validationflight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loandailystats',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0007_loandailystats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('status_changed', 'Status changed')], max_length=20)),
+                ('status', models.CharField(choices=[('PEN', 'Pending'), ('APR', 'Approved'), ('REJ', 'Rejected')], max_length=10)),
+                ('previous_status', models.CharField(blank=True, choices=[('PEN', 'Pending'), ('APR', 'Approved'), ('REJ', 'Rejected')], max_length=10)),
+                ('txid', models.BigIntegerField(db_default=models.Func(function='txid_current', output_field=models.BigIntegerField()))),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['txid'], name='loan_event_txid_idx'), models.Index(fields=['created_at'], name='loan_event_created_idx')],
+            },
+        ),
+        # One notification per writing transaction (Postgres folds identical ones) naming
+        # the transaction, sent on commit to the listeners of loan.events
+        migrations.RunSQL(
+            """
+            CREATE FUNCTION loan_event_notify() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('loan_events', txid_current()::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER loan_event_notify AFTER INSERT ON loan_loanevent
+            FOR EACH STATEMENT EXECUTE FUNCTION loan_event_notify();
+            """,
+            """
+            DROP TRIGGER loan_event_notify ON loan_loanevent;
+            DROP FUNCTION loan_event_notify();
+            """,
+        ),
+    ]
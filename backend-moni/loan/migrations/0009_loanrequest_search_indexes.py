@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:45
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Trigram GIN indexes take far longer to build than btrees; concurrently, intake
+    # isn't blocked for the whole build
+    atomic = False
+
+    dependencies = [
+        ('loan', '0008_loanevent'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('full_name'), name='gin_trgm_ops'), name='loan_full_name_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='loan_email_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('id_number'), name='text_pattern_ops'), name='loan_id_number_prefix_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loanrequest',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='text_pattern_ops'), name='loan_email_prefix_idx'),
+        ),
+    ]
@@ -1,4 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Func
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 
@@ -28,3 +33,106 @@ class LoanRequest(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Admin list filtered by status, newest first
+            models.Index(fields=["status", "-id"], name="loan_status_id_idx"),
+            models.Index(fields=["created_at"], name="loan_created_at_idx"),
+            models.Index(fields=["id_number"], name="loan_id_number_idx"),
+            # Admin search (loan.filters), which matches on UPPER(): trigrams for
+            # substrings of names and emails, pattern ops for id number and email prefixes
+            GinIndex(OpClass(Upper("full_name"), name="gin_trgm_ops"), name="loan_full_name_trgm_idx"),
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="loan_email_trgm_idx"),
+            models.Index(OpClass(Upper("id_number"), name="text_pattern_ops"), name="loan_id_number_prefix_idx"),
+            models.Index(OpClass(Upper("email"), name="text_pattern_ops"), name="loan_email_prefix_idx"),
+        ]
+
+
+class LoanValidationTask(models.Model):
+    """Queue entry for a pending loan waiting for the external validator."""
+
+    loan = models.OneToOneField(
+        LoanRequest,
+        on_delete=models.CASCADE,
+        related_name="validation_task"
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["available_at", "id"], name="loan_task_available_idx"),
+        ]
+
+
+class LoanDailyStats(models.Model):
+    """Loan count and amount per creation day and current status, kept up to date by loan.stats."""
+
+    day = models.DateField()
+    status = models.CharField(max_length=10, choices=LoanRequest.StatusChoices.choices)
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=38, decimal_places=2, default=0)
+    # Bumped by every tracked write to the row, even one that leaves the totals unchanged
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status"], name="loan_daily_stats_day_status_uniq"),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """First response to a loan request sent with an Idempotency-Key header, replayed on retries."""
+
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    loan = models.ForeignKey(LoanRequest, null=True, on_delete=models.SET_NULL, related_name="+")
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="loan_idempotency_created_idx"),
+        ]
+
+
+class ValidationFlight(models.Model):
+    """Latest validator verdict per CUIL, read by workers that waited on the same call."""
+
+    id_number = models.CharField(max_length=16, primary_key=True)
+    is_approved = models.BooleanField()
+    completed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["completed_at"], name="loan_flight_completed_idx"),
+        ]
+
+
+class LoanEvent(models.Model):
+    """A loan created or changing status, streamed to analysts and replayed to clients that reconnect."""
+
+    class KindChoices(models.TextChoices):
+        CREATED = 'created', 'Created'
+        STATUS_CHANGED = 'status_changed', 'Status changed'
+
+    # Not a foreign key: events outlive deleted loans and don't lock them
+    loan_id = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=KindChoices.choices)
+    status = models.CharField(max_length=10, choices=LoanRequest.StatusChoices.choices)
+    previous_status = models.CharField(max_length=10, choices=LoanRequest.StatusChoices.choices, blank=True)
+    # Writing transaction; its NOTIFY carries it so listeners read only that transaction's events
+    txid = models.BigIntegerField(db_default=Func(function="txid_current", output_field=models.BigIntegerField()))
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["txid"], name="loan_event_txid_idx"),
+            models.Index(fields=["created_at"], name="loan_event_created_idx"),
+        ]
@@ -0,0 +1,61 @@
+import json
+
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+# Below this many estimated rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimate_count(queryset) -> int:
+    """Returns the planner's row estimate for the queryset, or the exact count on small results."""
+    plan = json.loads(queryset.order_by().explain(format="json"))[0]["Plan"]
+    estimate = plan["Plan Rows"]
+
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+
+    return estimate
+
+
+class ApproximateCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class LoanPageNumberPagination(PageNumberPagination):
+    """Page number pagination; `?count=approximate` replaces COUNT(*) with the planner's estimate."""
+
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.approximate = request.query_params.get(self.count_query_param) == "approximate"
+        if self.approximate:
+            self.django_paginator_class = ApproximateCountPaginator
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.approximate:
+            response.data["count_is_approximate"] = True
+
+        return response
+
+
+class LoanCursorPagination(CursorPagination):
+    """Keyset pagination: every page is an index range scan, however deep, and no count is run."""
+
+    ordering = "-id"
+    ordering_query_param = "ordering"
+    allowed_orderings = ["-id", "-created_at"]
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.allowed_orderings:
+            return (ordering,)
+
+        return (self.ordering,)
@@ -0,0 +1,197 @@
+import logging
+
+import requests
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .circuit import CircuitOpenError
+from . import events, stats
+from .models import LoanEvent, LoanRequest, LoanValidationTask
+from .services import LoanValidationService
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 300
+
+
+def save_pending_loan(serializer) -> LoanRequest:
+    """Saves the loan as pending and queues it for the validation worker."""
+    with transaction.atomic():
+        loan_request = serializer.save(status=LoanRequest.StatusChoices.PENDING)
+        LoanValidationTask.objects.create(loan=loan_request)
+        stats.track(added=[stats.loan_key(loan_request)])
+        events.publish_created([loan_request])
+
+    return loan_request
+
+
+def save_decided_loan(serializer, status: str) -> LoanRequest:
+    """Saves a loan the validator already decided on."""
+    with transaction.atomic():
+        loan_request = serializer.save(status=status)
+        stats.track(added=[stats.loan_key(loan_request)])
+        events.publish_created([loan_request])
+
+    return loan_request
+
+
+def process_validation_batch(batch_size: int) -> dict:
+    """Validates up to `batch_size` queued loans and applies the verdicts.
+
+    Tasks are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers can drain the queue in parallel without picking the same loan.
+    Claiming hides the tasks from other workers for as long as the batch can
+    take, instead of keeping them locked, so no transaction stays open while
+    the validator is called; a worker that dies mid-batch leaves its tasks to
+    be claimed again once that time is up.
+    """
+    tasks = claim_tasks(batch_size)
+
+    verdicts = {}
+    deferred = []
+    circuit_open = False
+
+    for task in tasks:
+        if circuit_open:
+            deferred.append(task)
+            continue
+
+        try:
+            verdicts[task.loan_id] = LoanValidationService.check_loan_eligibility(
+                task.loan.id_number, raise_errors=True
+            )
+        except CircuitOpenError:
+            # The validator is unavailable; retry the rest of the batch later
+            circuit_open = True
+            deferred.append(task)
+        except (requests.RequestException, ValueError):
+            # Retries are used up, but a failed call is no verdict; try this loan again later
+            deferred.append(task)
+
+    if verdicts:
+        apply_verdicts(verdicts)
+
+    if deferred:
+        attempts = max(task.attempts for task in deferred) + 1
+        delay = min(2 ** attempts, MAX_RETRY_DELAY)
+
+        LoanValidationTask.objects.filter(pk__in=[task.pk for task in deferred]).update(
+            attempts=F("attempts") + 1,
+            available_at=timezone.now() + timedelta(seconds=delay)
+        )
+
+        logger.warning(f"Validator unavailable, deferred {len(deferred)} loans for {delay}s")
+
+    return {"validated": len(verdicts), "deferred": len(deferred)}
+
+
+def claim_tasks(batch_size: int) -> list[LoanValidationTask]:
+    """Takes up to `batch_size` due tasks, due again once the batch should be long done."""
+    # Every call gives up by the retry deadline
+    claim_timeout = batch_size * settings.LOAN_VALIDATION_RETRY_DEADLINE
+
+    with transaction.atomic():
+        tasks = list(
+            LoanValidationTask.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("loan")
+            .filter(available_at__lte=timezone.now())
+            .order_by("available_at", "id")[:batch_size]
+        )
+
+        if tasks:
+            LoanValidationTask.objects.filter(pk__in=[task.pk for task in tasks]).update(
+                available_at=timezone.now() + timedelta(seconds=claim_timeout)
+            )
+
+    return tasks
+
+
+def apply_verdicts(verdicts: dict):
+    """Moves the loans in {loan id: is approved} that are still pending to their verdict."""
+    new_statuses = {
+        loan_id: (
+            LoanRequest.StatusChoices.APPROVED
+            if is_approved else
+            LoanRequest.StatusChoices.REJECTED
+        )
+        for loan_id, is_approved in verdicts.items()
+    }
+
+    with transaction.atomic():
+        # Loans decided or deleted while the validator was being called are left alone
+        decided = list(
+            LoanRequest.objects
+            .select_for_update()
+            .filter(pk__in=new_statuses, status=LoanRequest.StatusChoices.PENDING)
+            .only("pk", "status", "amount", "created_at")
+        )
+
+        if decided:
+            LoanRequest.objects.filter(pk__in=[loan.pk for loan in decided]).update(
+                status=Case(
+                    *[When(pk=loan.pk, then=Value(new_statuses[loan.pk])) for loan in decided],
+                    default=F("status")
+                ),
+                updated_at=timezone.now()
+            )
+
+            stats.track(
+                added=[(loan.created_at, new_statuses[loan.pk], loan.amount) for loan in decided],
+                removed=[stats.loan_key(loan) for loan in decided]
+            )
+            events.publish_status_changes(
+                [(loan.pk, loan.status, new_statuses[loan.pk]) for loan in decided]
+            )
+
+        LoanValidationTask.objects.filter(loan_id__in=new_statuses).delete()
+
+
+def decide_all_pending(new_status: str) -> int:
+    """Moves every pending loan to `new_status` in one statement and returns how many moved.
+
+    The UPDATE ... RETURNING feeds the queue cleanup, the events and the
+    stats in the same statement, so no loan is read into Python however many
+    are pending.
+    """
+    now = timezone.now()
+    params = {
+        "pending": LoanRequest.StatusChoices.PENDING,
+        "new_status": new_status,
+        "now": now,
+        "time_zone": timezone.get_current_timezone_name(),
+        "kind": LoanEvent.KindChoices.STATUS_CHANGED,
+    }
+
+    # Optional CTEs: Postgres runs data-modifying ones even when nothing reads them
+    publish = (
+        f", published AS (INSERT INTO {LoanEvent._meta.db_table} (loan_id, kind, status, previous_status, created_at) "
+        "SELECT id, %(kind)s, %(new_status)s, %(pending)s, %(now)s FROM decided)"
+    ) if settings.LOAN_EVENTS_ENABLED else ""
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH decided AS ("
+            f"UPDATE {LoanRequest._meta.db_table} SET status = %(new_status)s, updated_at = %(now)s "
+            "WHERE status = %(pending)s RETURNING id, created_at, amount"
+            f"), dequeued AS (DELETE FROM {LoanValidationTask._meta.db_table} "
+            "WHERE loan_id IN (SELECT id FROM decided))"
+            f"{publish} "
+            "SELECT (created_at AT TIME ZONE %(time_zone)s)::date, count(*), sum(amount) "
+            "FROM decided GROUP BY 1",
+            params
+        )
+        days = cursor.fetchall()
+
+        deltas = {}
+        for day, count, amount in days:
+            deltas[(day, new_status)] = (count, amount)
+            deltas[(day, LoanRequest.StatusChoices.PENDING)] = (-count, -amount)
+        stats.apply_deltas(deltas)
+
+    return sum(count for _, count, _ in days)
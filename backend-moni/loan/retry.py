@@ -0,0 +1,316 @@
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import aiohttp
+import requests
+
+from django.conf import settings
+
+from .clients import get_timeout
+
+logger = logging.getLogger(__name__)
+
+# Answers meaning the validator is briefly overloaded or restarting
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures, timeouts and overload answers; not bad requests, bad payloads or an open circuit."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUSES
+
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRYABLE_STATUSES
+
+    return isinstance(error, (
+        requests.ConnectionError,
+        requests.Timeout,
+        aiohttp.ClientConnectionError,
+        TimeoutError,
+    ))
+
+
+class RetryPolicy:
+    """Retries transient validator failures within a deadline, optionally hedging slow calls.
+
+    After failed attempt n (from 0) the next one waits a random delay in
+    [0, min(max_delay, base_delay * 2**n)], the "full jitter" backoff. No
+    attempt starts once the wait would cross the deadline, and each request's
+    timeouts are cut to the time left. With `hedge` on, an attempt that hasn't
+    answered after the `hedge_quantile` of recent latencies gets a second
+    request in parallel; the first answer wins. No hedge is sent while all
+    `max_workers` hedging threads are busy.
+    """
+
+    COUNTERS = ("calls", "attempts", "retries", "hedges", "hedges_won", "hedges_skipped", "deadline_exhausted", "failures")
+
+    def __init__(
+        self,
+        attempts: int,
+        base_delay: float,
+        max_delay: float,
+        deadline: float,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        latency_window: int = 500,
+        max_workers: int = 20,
+    ):
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_workers = max_workers
+
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging, or None while hedging is off or latencies are too few."""
+        if not self.hedge:
+            return None
+
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self._latencies)
+
+        return latencies[min(int(len(latencies) * self.hedge_quantile), len(latencies) - 1)]
+
+    def call(self, fn):
+        """Returns `fn(timeout)`, retrying transient errors; re-raises the last error when giving up.
+
+        `timeout` is the (connect, read) timeout left for that request.
+        """
+        deadline = time.monotonic() + self.deadline
+        self._count("calls")
+
+        for attempt in range(self.attempts):
+            try:
+                return self._attempt(fn, deadline)
+            except Exception as e:
+                error = e
+
+            delay = self._next_delay(error, attempt, deadline)
+            if delay is None:
+                break
+            time.sleep(delay)
+
+        self._count("failures")
+        raise error
+
+    async def acall(self, fn):
+        """Async version of `call`; `fn(timeout)` returns an awaitable."""
+        deadline = time.monotonic() + self.deadline
+        self._count("calls")
+
+        for attempt in range(self.attempts):
+            try:
+                return await self._aattempt(fn, deadline)
+            except Exception as e:
+                error = e
+
+            delay = self._next_delay(error, attempt, deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+
+        self._count("failures")
+        raise error
+
+    def _next_delay(self, error, attempt: int, deadline: float) -> float | None:
+        """The wait before retrying after `error`, or None to give up."""
+        if not is_retryable(error) or attempt + 1 >= self.attempts:
+            return None
+
+        delay = self.backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            self._count("deadline_exhausted")
+            logger.warning(f"Loan validation retry deadline of {self.deadline}s exhausted: {error}")
+            return None
+
+        self._count("retries")
+        logger.info(f"Retrying loan validation in {delay:.3f}s after: {error}")
+
+        return delay
+
+    def _attempt(self, fn, deadline: float):
+        hedge_delay = self.hedge_delay()
+        primary = self._submit(fn, deadline) if hedge_delay is not None else None
+        if primary is None:
+            return self._timed(fn, deadline)
+
+        if not wait([primary], timeout=hedge_delay).done:
+            hedge = self._submit(fn, deadline)
+            if hedge is None:
+                # Every worker is busy, so a hedge would only queue behind them
+                self._count("hedges_skipped")
+                return primary.result()
+
+            self._count("hedges")
+            pending = {primary, hedge}
+
+            # The loser is left to finish in the background; its timeout bounds it
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            self._count("hedges_won")
+                        return future.result()
+
+        return primary.result()
+
+    def _submit(self, fn, deadline: float):
+        """Starts an attempt on the hedging pool, or returns None when all its workers are busy."""
+        with self._lock:
+            if self._in_flight >= self.max_workers:
+                return None
+            self._in_flight += 1
+
+        # Copy the context so the request timings still reach this request's Server-Timing
+        future = self._get_executor().submit(contextvars.copy_context().run, self._timed, fn, deadline)
+        future.add_done_callback(self._finished)
+
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _aattempt(self, fn, deadline: float):
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is None:
+            return await self._atimed(fn, deadline)
+
+        primary = asyncio.ensure_future(self._atimed(fn, deadline))
+        pending = {primary}
+
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count("hedges")
+                hedge = asyncio.ensure_future(self._atimed(fn, deadline))
+                pending = {primary, hedge}
+
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is hedge:
+                                self._count("hedges_won")
+                            return task.result()
+
+            return primary.result()
+        finally:
+            # Unlike threads, the losing request can be cancelled; it gives its
+            # circuit breaker trial slot back (see afetch_with_breaker)
+            for task in pending:
+                task.cancel()
+
+    def _timed(self, fn, deadline: float):
+        self._count("attempts")
+        # Timed from here: a pooled attempt may have waited for a worker
+        timeout = self._timeout(deadline)
+        started = time.monotonic()
+        result = fn(timeout)
+        self._observe(time.monotonic() - started)
+
+        return result
+
+    async def _atimed(self, fn, deadline: float):
+        self._count("attempts")
+        timeout = self._timeout(deadline)
+        started = time.monotonic()
+        result = await fn(timeout)
+        self._observe(time.monotonic() - started)
+
+        return result
+
+    def _timeout(self, deadline: float) -> tuple[float, float]:
+        left = max(deadline - time.monotonic(), 0.001)
+        connect_timeout, read_timeout = get_timeout()
+
+        return min(connect_timeout, left), min(read_timeout, left)
+
+    def _observe(self, duration: float):
+        with self._lock:
+            self._latencies.append(duration)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="loan-validation-hedge"
+                )
+
+            return self._executor
+
+    def stats(self) -> dict:
+        hedge_delay = self.hedge_delay()
+
+        with self._lock:
+            return {
+                **self._counters,
+                "latency_samples": len(self._latencies),
+                "hedge_delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(self.COUNTERS, 0)
+            self._latencies.clear()
+
+
+_retry_policy = None
+_retry_policy_lock = threading.Lock()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Returns the process-wide retry policy for validator calls."""
+    global _retry_policy
+
+    if _retry_policy is None:
+        with _retry_policy_lock:
+            if _retry_policy is None:
+                _retry_policy = RetryPolicy(
+                    attempts=settings.LOAN_VALIDATION_RETRY_ATTEMPTS,
+                    base_delay=settings.LOAN_VALIDATION_RETRY_BASE_DELAY,
+                    max_delay=settings.LOAN_VALIDATION_RETRY_MAX_DELAY,
+                    deadline=settings.LOAN_VALIDATION_RETRY_DEADLINE,
+                    hedge=settings.LOAN_VALIDATION_HEDGE,
+                    hedge_quantile=settings.LOAN_VALIDATION_HEDGE_QUANTILE,
+                    hedge_min_samples=settings.LOAN_VALIDATION_HEDGE_MIN_SAMPLES,
+                    # Hedges double the requests in flight at most
+                    max_workers=2 * settings.LOAN_VALIDATION_POOL_PER_HOST,
+                )
+
+    return _retry_policy
+
+
+def reset_retry_policy():
+    """Drops the process-wide policy so the next call rebuilds it from settings."""
+    global _retry_policy
+
+    with _retry_policy_lock:
+        _retry_policy = None
@@ -1,4 +1,8 @@
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import LoanRequest
 
 
@@ -22,3 +26,92 @@ class LoanRequestSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         ]
+
+
+class ValuesRepresentation:
+    """Read-only output of a serializer, built from `values()` rows instead of instances.
+
+    The conversion for each field is picked once from the serializer's field
+    types; fields whose database value is already their JSON value are passed
+    through. Rows skip model instantiation and DRF's per-field calls, and the
+    output renders to the same bytes as the serializer's. Only fields that are
+    plain strings, numbers, ISO datetimes or string decimals are supported.
+    """
+
+    def __init__(self, serializer_class):
+        fields = serializer_class().fields
+        self.field_names = tuple(fields)
+        self.datetime_fields = tuple(
+            name for name, field in fields.items() if isinstance(field, serializers.DateTimeField)
+        )
+        self.decimal_fields = tuple(
+            name for name, field in fields.items() if isinstance(field, serializers.DecimalField)
+        )
+
+        for name, field in fields.items():
+            if isinstance(field, serializers.DateTimeField) and getattr(field, "format", api_settings.DATETIME_FORMAT) != "iso-8601":
+                raise ValueError(f"{name}: only ISO 8601 datetimes are supported")
+            if isinstance(field, serializers.DecimalField) and (
+                not getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+                or field.localize or field.normalize_output
+            ):
+                raise ValueError(f"{name}: only decimals rendered as plain strings are supported")
+            if isinstance(field, (serializers.SerializerMethodField, serializers.Serializer)):
+                raise ValueError(f"{name}: computed and nested fields are not supported")
+
+    def to_representation(self, rows) -> list[dict]:
+        """Converts `values(*field_names)` rows in place and returns them."""
+        current_timezone = timezone.get_current_timezone()
+        # The database hands back UTC datetimes; converting them to UTC again is the costliest step
+        current_is_utc = getattr(current_timezone, "key", None) == "UTC"
+        rows = list(rows)
+
+        for row in rows:
+            for name in self.datetime_fields:
+                value = row[name]
+                if value is not None:
+                    # DateTimeField: current time zone, ISO 8601, UTC as Z
+                    if not (current_is_utc and value.tzinfo is dt_timezone.utc):
+                        value = value.astimezone(current_timezone)
+                    value = value.isoformat()
+                    row[name] = value[:-6] + "Z" if value.endswith("+00:00") else value
+
+            for name in self.decimal_fields:
+                value = row[name]
+                # Postgres returns numeric columns at their scale, as DecimalField renders them
+                row[name] = format(value, "f") if value is not None else ""
+
+        return rows
+
+
+class BulkLoanDecisionSerializer(serializers.Serializer):
+    """Loans to approve or reject at once, chosen by id, by status, or both."""
+
+    MAX_IDS = 10000
+
+    decision = serializers.ChoiceField(choices=["approve", "reject"])
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=MAX_IDS,
+        required=False
+    )
+    status = serializers.ChoiceField(choices=LoanRequest.StatusChoices.choices, required=False)
+
+    def validate(self, attrs):
+        if "ids" not in attrs and "status" not in attrs:
+            raise serializers.ValidationError("Provide ids, status or both.")
+
+        return attrs
+
+
+class LoanSummaryQuerySerializer(serializers.Serializer):
+    """Optional creation day range for the loan summary."""
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "date_from" in attrs and "date_to" in attrs and attrs["date_from"] > attrs["date_to"]:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+
+        return attrs
@@ -1,7 +1,18 @@
+import aiohttp
 import requests
 import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
+from main.timing import record
+
+from .cache import get_eligibility_cache
+from .circuit import CircuitOpenError, get_circuit_breaker
+from .clients import get_async_session, get_session, get_timeout
+from .retry import get_retry_policy
+from .singleflight import get_database_flight, get_single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -10,30 +21,330 @@ class LoanValidationService:
 
     API_URL = settings.LOAN_VALIDATION_API_URL
     API_KEY = settings.LOAN_VALIDATION_API_KEY
+    # Empty when the validator has no batch endpoint
+    BATCH_API_URL = settings.LOAN_VALIDATION_BATCH_API_URL
+    BATCH_SIZE = settings.LOAN_VALIDATION_BATCH_SIZE
+    BATCH_CONCURRENCY = settings.LOAN_VALIDATION_BATCH_CONCURRENCY
+
+    # Statuses meaning the batch endpoint doesn't exist; fan out from then on
+    BATCH_UNSUPPORTED_STATUSES = {404, 405, 501}
+    _batch_unsupported_url = None
 
     @classmethod
-    def check_loan_eligibility(cls, user_id_number: str) -> bool:
-        """Checks if the loan request is approved or rejected."""
+    def check_loan_eligibility(
+        cls,
+        user_id_number: str,
+        use_cache: bool = True,
+        raise_errors: bool = False
+    ) -> bool:
+        """Checks if the loan request is approved or rejected.
+
+        Raises CircuitOpenError without calling the API while the circuit is open.
+        Network errors and malformed answers count as a rejection unless `raise_errors` is set.
+        Concurrent checks of the same CUIL share one call (see loan.singleflight).
+        """
+        cache = get_eligibility_cache()
+
+        is_approved = cache.get(user_id_number) if use_cache else None
+        if is_approved is not None:
+            return is_approved
+
+        try:
+            is_approved = get_single_flight().do(
+                user_id_number, lambda: cls.call_validator(user_id_number)
+            )
+
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Loan validation request failed: {e}")
+
+            if raise_errors:
+                raise
+
+            return False
+
+        cache.set(user_id_number, is_approved)
+
+        return is_approved
+
+    @classmethod
+    def call_validator(cls, user_id_number: str) -> bool:
+        """Calls the API through the circuit breaker, once across processes when enabled."""
+        database_flight = get_database_flight()
+        if database_flight is not None:
+            return database_flight.do(user_id_number, lambda: cls.fetch_with_retry(user_id_number))
+
+        return cls.fetch_with_retry(user_id_number)
+
+    @classmethod
+    def fetch_with_retry(cls, user_id_number: str) -> bool:
+        """Calls the API, retrying and hedging as configured (see loan.retry)."""
+        return get_retry_policy().call(
+            lambda timeout: cls.fetch_with_breaker(user_id_number, timeout)
+        )
+
+    @classmethod
+    def fetch_with_breaker(cls, user_id_number: str, timeout=None) -> bool:
+        breaker = get_circuit_breaker()
+        breaker.before_call()
+        started = time.monotonic()
+
+        try:
+            is_approved = cls.fetch_loan_eligibility(user_id_number, timeout=timeout)
+
+        except (requests.RequestException, ValueError):
+            duration = time.monotonic() - started
+            breaker.record_failure(duration)
+            record("upstream", duration)
+            raise
+
+        except BaseException:
+            # No outcome to record, but a half-open circuit needs its trial slot back
+            breaker.release()
+            raise
+
+        duration = time.monotonic() - started
+        breaker.record_success(duration)
+        record("upstream", duration)
+
+        return is_approved
+
+    @classmethod
+    def fetch_loan_eligibility(cls, user_id_number: str, timeout=None) -> bool:
+        """Asks the external API for a verdict, raising on network errors.
+
+        `timeout` overrides the configured (connect, read) timeout.
+        """
         headers = {"x-api-key": cls.API_KEY}
         payload = {"cuil": user_id_number}
 
+        response = get_session().post(
+            cls.API_URL,
+            json=payload,
+            headers=headers,
+            timeout=timeout or get_timeout()
+        )
+
+        response.raise_for_status()
+
+        data = response.json()
+        if not isinstance(data, dict):
+            raise ValueError(f"Unexpected loan validation response: {data!r}")
+
+        logger.info(f"Loan validation request successful: {data}")
+
+        return data.get("status") == "approved"
+
+    @classmethod
+    def check_loan_eligibility_batch(cls, user_id_numbers, use_cache: bool = True) -> dict:
+        """Checks many CUILs and returns {cuil: True/False}, or None for CUILs that failed.
+
+        Sends BATCH_SIZE CUILs per request to the batch endpoint when the
+        validator has one. CUILs the batch could not answer, and every CUIL
+        when there is no batch endpoint, are checked one by one with at most
+        BATCH_CONCURRENCY calls in flight.
+        """
+        cache = get_eligibility_cache()
+        cuils = list(dict.fromkeys(user_id_numbers))
+        verdicts = {}
+
+        if use_cache:
+            for cuil in cuils:
+                is_approved = cache.get(cuil)
+                if is_approved is not None:
+                    verdicts[cuil] = is_approved
+
+        missing = [cuil for cuil in cuils if cuil not in verdicts]
+
+        if missing and cls.BATCH_API_URL and cls._batch_unsupported_url != cls.BATCH_API_URL:
+            chunks = [missing[i:i + cls.BATCH_SIZE] for i in range(0, len(missing), cls.BATCH_SIZE)]
+
+            with ThreadPoolExecutor(max_workers=min(cls.BATCH_CONCURRENCY, len(chunks))) as executor:
+                for chunk_verdicts in executor.map(cls.fetch_batch_or_none, chunks):
+                    verdicts.update(chunk_verdicts)
+
+            for cuil in missing:
+                if cuil in verdicts:
+                    cache.set(cuil, verdicts[cuil])
+
+            missing = [cuil for cuil in missing if cuil not in verdicts]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(cls.BATCH_CONCURRENCY, len(missing))) as executor:
+                for cuil, is_approved in zip(missing, executor.map(cls.check_or_none, missing)):
+                    if is_approved is not None:
+                        verdicts[cuil] = is_approved
+                        cache.set(cuil, is_approved)
+
+        failed = len(cuils) - len(verdicts)
+        if failed:
+            logger.warning(f"Batch validation left {failed} of {len(cuils)} CUILs without a verdict")
+
+        return {cuil: verdicts.get(cuil) for cuil in cuils}
+
+    @classmethod
+    def check_or_none(cls, user_id_number: str) -> bool | None:
+        """One fan-out call; shares an in-flight call for the same CUIL but skips the database."""
         try:
-            response = requests.post(
-                cls.API_URL,
-                json=payload,
-                headers=headers,
-                timeout=5
+            return get_single_flight().do(
+                user_id_number, lambda: cls.fetch_with_retry(user_id_number)
             )
+        except (requests.RequestException, ValueError, CircuitOpenError) as e:
+            logger.error(f"Loan validation request failed for {user_id_number}: {e}")
+            return None
 
-            response.raise_for_status()
+    @classmethod
+    def fetch_batch_or_none(cls, user_id_numbers: list[str]) -> dict:
+        """Verdicts the batch endpoint returned; an empty dict when the whole request failed."""
+        breaker = get_circuit_breaker()
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            return {}
+
+        started = time.monotonic()
+
+        try:
+            verdicts = cls.fetch_loan_eligibility_batch(user_id_numbers)
+
+        except requests.HTTPError as e:
+            duration = time.monotonic() - started
+            record("upstream", duration)
 
-            data = response.json()
+            if e.response is not None and e.response.status_code in cls.BATCH_UNSUPPORTED_STATUSES:
+                # Not the validator failing: it just has no batch endpoint
+                breaker.record_success(duration)
+                logger.info(f"Validator has no batch endpoint ({e.response.status_code}), fanning out")
+                cls._batch_unsupported_url = cls.BATCH_API_URL
+                return {}
 
-            logger.info(f"Loan validation request successful: {data}")
+            breaker.record_failure(duration)
+            logger.error(f"Batch loan validation request failed: {e}")
+            return {}
 
-            return data.get("status") == "approved"
+        except (requests.RequestException, ValueError) as e:
+            duration = time.monotonic() - started
+            breaker.record_failure(duration)
+            record("upstream", duration)
+            logger.error(f"Batch loan validation request failed: {e}")
+            return {}
 
-        except requests.RequestException as e:
+        except BaseException:
+            breaker.release()
+            raise
+
+        duration = time.monotonic() - started
+        breaker.record_success(duration)
+        record("upstream", duration)
+
+        return verdicts
+
+    @classmethod
+    def fetch_loan_eligibility_batch(cls, user_id_numbers: list[str]) -> dict:
+        """Asks the batch endpoint for verdicts, raising on network errors.
+
+        Expects {"results": [{"cuil": ..., "status": "approved" | "rejected"}, ...]};
+        CUILs missing from the results or answered with an error are left out.
+        """
+        headers = {"x-api-key": cls.API_KEY}
+        payload = {"cuils": user_id_numbers}
+
+        response = get_session().post(
+            cls.BATCH_API_URL,
+            json=payload,
+            headers=headers,
+            timeout=get_timeout()
+        )
+
+        response.raise_for_status()
+
+        requested = set(user_id_numbers)
+        verdicts = {}
+
+        for item in response.json().get("results", []):
+            if item.get("cuil") in requested and item.get("status") in ("approved", "rejected"):
+                verdicts[item["cuil"]] = item["status"] == "approved"
+
+        logger.info(f"Batch loan validation request successful: {len(verdicts)}/{len(user_id_numbers)} verdicts")
+
+        return verdicts
+
+    @classmethod
+    async def acheck_loan_eligibility(cls, user_id_number: str) -> bool:
+        """Async version of check_loan_eligibility using the pooled client.
+
+        Concurrent checks of the same CUIL on this event loop share one call.
+        """
+        cache = get_eligibility_cache()
+
+        is_approved = await cache.aget(user_id_number)
+        if is_approved is not None:
+            return is_approved
+
+        try:
+            is_approved = await get_single_flight().ado(
+                user_id_number, lambda: cls.afetch_with_retry(user_id_number)
+            )
+
+        except (aiohttp.ClientError, TimeoutError, ValueError) as e:
             logger.error(f"Loan validation request failed: {e}")
 
             return False
+
+        await cache.aset(user_id_number, is_approved)
+
+        return is_approved
+
+    @classmethod
+    async def afetch_with_retry(cls, user_id_number: str) -> bool:
+        return await get_retry_policy().acall(
+            lambda timeout: cls.afetch_with_breaker(user_id_number, timeout)
+        )
+
+    @classmethod
+    async def afetch_with_breaker(cls, user_id_number: str, timeout=None) -> bool:
+        breaker = get_circuit_breaker()
+        breaker.before_call()
+        started = time.monotonic()
+
+        try:
+            is_approved = await cls.afetch_loan_eligibility(user_id_number, timeout=timeout)
+
+        except (aiohttp.ClientError, TimeoutError, ValueError):
+            duration = time.monotonic() - started
+            breaker.record_failure(duration)
+            record("upstream", duration)
+            raise
+
+        except BaseException:
+            breaker.release()
+            raise
+
+        duration = time.monotonic() - started
+        breaker.record_success(duration)
+        record("upstream", duration)
+
+        return is_approved
+
+    @classmethod
+    async def afetch_loan_eligibility(cls, user_id_number: str, timeout=None) -> bool:
+        """Async version of fetch_loan_eligibility."""
+        headers = {"x-api-key": cls.API_KEY}
+        payload = {"cuil": user_id_number}
+        connect_timeout, read_timeout = timeout or get_timeout()
+
+        async with get_async_session().post(
+            cls.API_URL,
+            json=payload,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        ) as response:
+            response.raise_for_status()
+
+            data = await response.json()
+
+        if not isinstance(data, dict):
+            raise ValueError(f"Unexpected loan validation response: {data!r}")
+
+        logger.info(f"Loan validation request successful: {data}")
+
+        return data.get("status") == "approved"
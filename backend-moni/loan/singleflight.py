@@ -0,0 +1,183 @@
+import asyncio
+import threading
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import ValidationFlight
+
+# First key of the two-key advisory lock, so ours don't collide with other users'
+ADVISORY_LOCK_NAMESPACE = 4242
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one call and its outcome.
+
+    The first caller (the leader) runs the function; callers arriving while it
+    runs wait and get the same result or exception. Works across the threads
+    of a process with `do`, and across the tasks of an event loop with `ado`.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    async def ado(self, key, fn):
+        loop = asyncio.get_running_loop()
+        # Tasks belong to their event loop, so key them by it as well
+        key = (id(loop), key)
+
+        with self._lock:
+            task = self._async_calls.get(key)
+            if task is None:
+                # A task of its own, so a cancelled leader doesn't cancel the waiters
+                task = self._async_calls[key] = loop.create_task(fn())
+                task.add_done_callback(lambda _: self._forget(key, task))
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._async_calls.get(key) is task:
+                del self._async_calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "leaders": self._leaders,
+                "coalesced": self._coalesced,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._leaders = 0
+            self._coalesced = 0
+
+
+class DatabaseFlight:
+    """Extends single-flight across worker processes with a Postgres advisory lock.
+
+    The caller takes an advisory lock on the CUIL before calling the validator
+    and stores the verdict in ValidationFlight before releasing it. A caller in
+    another process that waited on the lock reuses a verdict completed after it
+    started waiting instead of calling again. Inside a transaction the stored
+    verdict only becomes visible when it commits, so the lock is then held
+    until that commit (a transaction-level lock) on the caller's own connection.
+    """
+
+    def do(self, id_number: str, fn):
+        lock_args = [ADVISORY_LOCK_NAMESPACE, id_number]
+        connection = connections[DEFAULT_DB_ALIAS]
+        in_transaction = not connection.get_autocommit()
+        lock = "pg_advisory_xact_lock" if in_transaction else "pg_advisory_lock"
+
+        with connection.cursor() as cursor:
+            # statement_timestamp() is when we started waiting, not when we got the lock.
+            # The wait is bounded: the holder is itself bounded by the validator timeouts,
+            # and Postgres drops the lock if its process dies.
+            cursor.execute(f"SELECT statement_timestamp(), {lock}(%s, hashtext(%s))", lock_args)
+            asked_at = cursor.fetchone()[0]
+
+            try:
+                cursor.execute(
+                    f"SELECT is_approved FROM {ValidationFlight._meta.db_table} "
+                    "WHERE id_number = %s AND completed_at >= %s",
+                    [id_number, asked_at]
+                )
+                row = cursor.fetchone()
+                if row is not None:
+                    return row[0]
+
+                is_approved = fn()
+
+                cursor.execute(
+                    f"INSERT INTO {ValidationFlight._meta.db_table} (id_number, is_approved, completed_at) "
+                    "VALUES (%s, %s, clock_timestamp()) ON CONFLICT (id_number) DO UPDATE "
+                    "SET is_approved = EXCLUDED.is_approved, completed_at = EXCLUDED.completed_at",
+                    [id_number, is_approved]
+                )
+
+                return is_approved
+            finally:
+                if not in_transaction:
+                    cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", lock_args)
+
+
+_single_flight = SingleFlight()
+_database_flight = DatabaseFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """Returns the process-wide single-flight group for validator calls."""
+    return _single_flight
+
+
+def get_database_flight() -> DatabaseFlight | None:
+    """Returns the cross-process flight, or None unless LOAN_VALIDATION_SINGLE_FLIGHT is "database"."""
+    if settings.LOAN_VALIDATION_SINGLE_FLIGHT != "database":
+        return None
+
+    return _database_flight
+
+
+def purge_flights(batch_size: int = 10000) -> int:
+    """Deletes verdicts older than LOAN_VALIDATION_FLIGHT_TTL in batches and returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.LOAN_VALIDATION_FLIGHT_TTL)
+    deleted = 0
+
+    while True:
+        ids = list(
+            ValidationFlight.objects.filter(completed_at__lt=cutoff)
+            .order_by("completed_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+
+        deleted += ValidationFlight.objects.filter(pk__in=ids, completed_at__lt=cutoff).delete()[0]
@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import LoanDailyStats, LoanRequest
+
+
+def loan_key(loan: LoanRequest) -> tuple:
+    """The fields of a loan that LoanDailyStats aggregates: (created_at, status, amount)."""
+    return loan.created_at, loan.status, loan.amount
+
+
+def track(added=(), removed=()):
+    """Applies loans entering (`added`) and leaving (`removed`) the daily stats.
+
+    Items are (created_at, status, amount) tuples; a status change is the old
+    tuple removed and the new one added. Call it in the transaction that writes
+    the loans, after the write, so `rebuild` never misses nor counts a loan twice.
+    Every row touched gets its version bumped, even when the changes cancel out.
+    """
+    deltas = {}
+    for sign, loans in ((1, added), (-1, removed)):
+        for created_at, status, amount in loans:
+            key = (timezone.localdate(created_at), status)
+            count, total = deltas.get(key, (0, Decimal(0)))
+            deltas[key] = (count + sign, total + sign * Decimal(amount))
+
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas: dict):
+    """Adds {(day, status): (count, amount)} to the daily stats, like `track` but pre-aggregated."""
+    # Sorted, so concurrent transactions lock the rows in the same order
+    rows = [
+        (day, status, count, amount)
+        for (day, status), (count, amount) in sorted(deltas.items())
+    ]
+    if not rows:
+        return
+
+    table = LoanDailyStats._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} AS stats (day, status, count, amount, version) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, 1)'] * len(rows))} "
+            "ON CONFLICT (day, status) DO UPDATE SET "
+            "count = stats.count + EXCLUDED.count, amount = stats.amount + EXCLUDED.amount, "
+            "version = stats.version + 1",
+            [value for row in rows for value in row]
+        )
+
+
+def changes(status: str | None = None) -> tuple[int, int]:
+    """A value that changes with every tracked write to loans with `status` (any, if None).
+
+    Versions only grow, so their sum never returns to an earlier value; the
+    highest id changes when `rebuild` recreates the rows with version 0.
+    """
+    queryset = LoanDailyStats.objects.all()
+    if status is not None:
+        queryset = queryset.filter(status=status)
+
+    totals = queryset.aggregate(version=Sum("version"), last_id=Max("id"))
+
+    return totals["version"] or 0, totals["last_id"] or 0
+
+
+def grouped_loans():
+    """The stats computed from scratch with a GROUP BY over every loan."""
+    return (
+        LoanRequest.objects
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(count=Count("id"), amount=Sum("amount"))
+        .order_by("day", "status")
+    )
+
+
+def rebuild() -> int:
+    """Recomputes LoanDailyStats from LoanRequest and returns the number of rows."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Waits for transactions that already tracked changes and blocks new
+            # ones until the rebuilt rows are committed
+            cursor.execute(f"LOCK TABLE {LoanDailyStats._meta.db_table} IN EXCLUSIVE MODE")
+
+        LoanDailyStats.objects.all().delete()
+        created = LoanDailyStats.objects.bulk_create(
+            [LoanDailyStats(**row) for row in grouped_loans()], batch_size=1000
+        )
+
+    return len(created)
+
+
+def differences() -> list[dict]:
+    """Rows where LoanDailyStats disagrees with a full GROUP BY over the loans."""
+    expected = {(row["day"], row["status"]): (row["count"], row["amount"]) for row in grouped_loans()}
+    actual = {
+        (day, status): (count, amount)
+        for day, status, count, amount in
+        LoanDailyStats.objects.exclude(count=0, amount=0).values_list("day", "status", "count", "amount")
+    }
+
+    return [
+        {"day": key[0], "status": key[1], "expected": expected.get(key), "actual": actual.get(key)}
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
+
+
+def summarize(date_from=None, date_to=None) -> dict:
+    """Totals per status, approval rate and daily counts for loans created between two dates."""
+    queryset = LoanDailyStats.objects.filter(count__gt=0)
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+
+    statuses = LoanRequest.StatusChoices.values
+    by_status = {status: {"count": 0, "amount": Decimal("0.00")} for status in statuses}
+    daily = {}
+
+    for day, status, count, amount in queryset.order_by("day", "status").values_list(
+        "day", "status", "count", "amount"
+    ):
+        by_status[status]["count"] += count
+        by_status[status]["amount"] += amount
+        daily.setdefault(day, dict.fromkeys(statuses, 0))[status] = count
+
+    decided = by_status[LoanRequest.StatusChoices.APPROVED]["count"] + \
+        by_status[LoanRequest.StatusChoices.REJECTED]["count"]
+
+    return {
+        "count": sum(totals["count"] for totals in by_status.values()),
+        "amount": str(sum((totals["amount"] for totals in by_status.values()), Decimal("0.00"))),
+        "by_status": {
+            status: {"count": totals["count"], "amount": str(totals["amount"])}
+            for status, totals in by_status.items()
+        },
+        "approval_rate": (
+            round(by_status[LoanRequest.StatusChoices.APPROVED]["count"] / decided, 4)
+            if decided else None
+        ),
+        "daily": [{"day": day.isoformat(), **counts} for day, counts in daily.items()],
+    }
@@ -1,14 +1,30 @@
+import csv
+import io
+import json
+
 from django.contrib.auth.models import User, Group
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from rest_framework_simplejwt.tokens import RefreshToken
-from loan.models import LoanRequest
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from loan import stats
+from loan.models import LoanEvent, LoanRequest, LoanValidationTask
+from loan.pagination import LoanCursorPagination
+from loan.serializers import LoanRequestSerializer, ValuesRepresentation
+from loan.views import AdminLoanRequestAPIView
+from user.roles import get_cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from unittest.mock import patch
 
 
 class AdminLoanRequestAPITest(TestCase):
     def setUp(self):
         self.client = APIClient()
+        get_cache().clear()
 
         self.loan = LoanRequest.objects.create(
             id="20123456789",
@@ -94,6 +110,18 @@ class AdminLoanRequestAPITest(TestCase):
         self.loan.refresh_from_db()
         self.assertEqual(self.loan.status, "APR")
 
+    def test_single_decision_only_writes_status(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse("admin-loans-reject-loan", args=[self.loan.pk])
+        self.client.get(self.list_url)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(url)
+
+        update = next(query["sql"] for query in context.captured_queries if query["sql"].startswith("UPDATE"))
+        self.assertIn('"status"', update)
+        self.assertNotIn('"amount"', update)
+
     def test_admin_can_reject_loan(self):
         self.client.force_authenticate(user=self.admin_user)
 
@@ -115,3 +143,608 @@ class AdminLoanRequestAPITest(TestCase):
 
         self.assertEqual(approve_response.status_code, 403)
         self.assertEqual(reject_response.status_code, 403)
+
+    @patch("user.roles.get_ttl", return_value=60)
+    def test_cached_roles_need_no_permission_queries(self, _):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.analyst_token}")
+        self.client.get(self.list_url)
+
+        # Loading the user, the ETag's stats, the count and the page
+        with self.assertNumQueries(4):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_queries_under_the_default_cache(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.analyst_token}")
+
+        # Loading the user, one group check, the ETag's stats, the count and the page
+        with self.assertNumQueries(5):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, 200)
+
+    @patch("user.roles.get_ttl", return_value=60)
+    def test_removed_admin_loses_access_despite_cached_roles(self, _):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse("admin-loans-approve-loan", args=[self.loan.pk])
+        self.client.get(self.list_url)
+
+        self.admin_user.groups.clear()
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_can_read_validator_stats(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.get(reverse("admin-validator-stats"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("connections_reused", response.data["pool"]["sync"])
+        self.assertIn("coalesced", response.data["single_flight"])
+        self.assertIn("hedges_won", response.data["retry"])
+
+    def test_analyst_cannot_read_validator_stats(self):
+        self.client.force_authenticate(user=self.analyst_user)
+
+        response = self.client.get(reverse("admin-validator-stats"))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class AdminLoanPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        admin_user = User.objects.create_user(username="test_admin", password="pass1234")
+        admin_user.groups.add(Group.objects.get(name="Admin"))
+        self.client.force_authenticate(user=admin_user)
+
+        LoanRequest.objects.bulk_create([
+            LoanRequest(
+                id_number=f"2012345{i:04d}",
+                full_name=f"Test User {i}",
+                gender="F",
+                email=f"test{i}@example.com",
+                amount=10000,
+                status="PEN" if i % 2 else "APR"
+            )
+            for i in range(25)
+        ])
+        self.list_url = reverse("admin-loans-list")
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get(self.list_url, {"page": 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 25)
+        self.assertNotIn("count_is_approximate", response.data)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_cursor_pagination_walks_all_loans_once(self):
+        ids = []
+        params = {"pagination": "cursor"}
+        url = self.list_url
+
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+
+            ids += [loan["id"] for loan in response.data["results"]]
+            url, params = response.data["next"], None
+
+        expected = list(LoanRequest.objects.order_by("-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_cursor_pagination_keeps_status_filter(self):
+        first = self.client.get(self.list_url, {"pagination": "cursor", "status": "PEN"})
+        second = self.client.get(first.data["next"])
+
+        statuses = {loan["status"] for loan in first.data["results"] + second.data["results"]}
+        self.assertEqual(statuses, {"PEN"})
+        self.assertEqual(len(first.data["results"]) + len(second.data["results"]), 12)
+
+    def test_cursor_pagination_orders_by_created_at(self):
+        response = self.client.get(self.list_url, {"pagination": "cursor", "ordering": "-created_at"})
+
+        created = [loan["created_at"] for loan in response.data["results"]]
+        self.assertEqual(created, sorted(created, reverse=True))
+
+    def test_cursor_pagination_ignores_unknown_ordering(self):
+        response = self.client.get(self.list_url, {"pagination": "cursor", "ordering": "email"})
+
+        ids = [loan["id"] for loan in response.data["results"]]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_approximate_count_is_exact_on_small_tables(self):
+        response = self.client.get(self.list_url, {"count": "approximate", "status": "PEN"})
+
+        self.assertEqual(response.data["count"], 12)
+        self.assertTrue(response.data["count_is_approximate"])
+
+    def assertSameJSONAsSerializer(self, response, loans):
+        expected = {key: value for key, value in response.data.items() if key != "results"}
+        expected["results"] = LoanRequestSerializer(loans, many=True).data
+
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_list_renders_the_same_bytes_as_the_serializer(self):
+        LoanRequest.objects.filter(pk__in=LoanRequest.objects.order_by("id")[:5]).update(
+            full_name="José \"Pepe\" Ñandú", amount="0.50"
+        )
+
+        response = self.client.get(self.list_url, {"page": 2, "status": "PEN"})
+
+        self.assertSameJSONAsSerializer(response, LoanRequest.objects.filter(status="PEN").order_by("-id")[10:12])
+
+    def test_cursor_pages_render_the_same_bytes_as_the_serializer(self):
+        first = self.client.get(self.list_url, {"pagination": "cursor", "ordering": "-created_at"})
+        second = self.client.get(first.data["next"])
+
+        self.assertSameJSONAsSerializer(first, LoanRequest.objects.order_by("-created_at")[:10])
+        self.assertSameJSONAsSerializer(second, LoanRequest.objects.order_by("-created_at")[10:20])
+
+    @patch("loan.pagination.EXACT_COUNT_THRESHOLD", 0)
+    def test_approximate_count_skips_count_query(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.list_url, {"count": "approximate"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data["count"], int)
+        self.assertFalse(any("COUNT(*)" in query["sql"] for query in context.captured_queries))
+
+
+class AdminLoanSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        admin_user = User.objects.create_user(username="test_admin", password="pass1234")
+        admin_user.groups.add(Group.objects.get(name="Admin"))
+        self.client.force_authenticate(user=admin_user)
+
+        LoanRequest.objects.bulk_create([
+            LoanRequest(id_number=id_number, full_name=full_name, gender="F", email=email, amount=10000,
+                        status=loan_status)
+            for id_number, full_name, email, loan_status in [
+                ("20123456789", "Maria Gomez", "mgomez@gmail.com", "PEN"),
+                ("27234567890", "Mariana Lopez", "mari.lopez@yahoo.com", "APR"),
+                ("20345678901", "Juan Perez", "juan.perez@gmail.com", "PEN"),
+                ("23456789012", "Ana Maria Torres", "atorres@example.com", "REJ"),
+            ]
+        ])
+        self.list_url = reverse("admin-loans-list")
+
+    def search(self, search, **params):
+        response = self.client.get(self.list_url, {"search": search, **params})
+        self.assertEqual(response.status_code, 200)
+
+        return [loan["full_name"] for loan in response.data["results"]]
+
+    def test_matches_names_and_emails_anywhere_ignoring_case(self):
+        self.assertEqual(self.search("MARIA"), ["Ana Maria Torres", "Mariana Lopez", "Maria Gomez"])
+        self.assertEqual(self.search("@GMAIL."), ["Juan Perez", "Maria Gomez"])
+        self.assertEqual(self.search("ria lop"), ["Mariana Lopez"])
+
+    def test_matches_the_start_of_id_numbers(self):
+        self.assertEqual(self.search("2012"), ["Maria Gomez"])
+        self.assertEqual(self.search("456"), [])
+
+    def test_one_field_must_contain_every_term(self):
+        self.assertEqual(self.search("maria torres"), ["Ana Maria Torres"])
+        self.assertEqual(self.search("\"ana maria\""), ["Ana Maria Torres"])
+        self.assertEqual(self.search("juan gmail"), ["Juan Perez"])
+        self.assertEqual(self.search("maria gmail"), [])
+
+    def test_terms_with_an_at_sign_match_the_start_of_emails(self):
+        self.assertEqual(self.search("MGOMEZ@gmail.com"), ["Maria Gomez"])
+        self.assertEqual(self.search("mari.lopez@"), ["Mariana Lopez"])
+        self.assertEqual(self.search("gomez@gmail.com"), [])
+        self.assertEqual(self.search("@gmail"), ["Juan Perez", "Maria Gomez"])
+
+    def test_combines_with_the_status_filter_and_pagination(self):
+        self.assertEqual(self.search("gmail", status="PEN"), ["Juan Perez", "Maria Gomez"])
+        self.assertEqual(self.search("maria", status="APR"), ["Mariana Lopez"])
+
+        with patch.object(LoanCursorPagination, "page_size", 2):
+            first = self.client.get(self.list_url, {"search": "mari", "pagination": "cursor"})
+            second = self.client.get(first.data["next"])
+        names = [loan["full_name"] for loan in first.data["results"] + second.data["results"]]
+        self.assertEqual(names, ["Ana Maria Torres", "Mariana Lopez", "Maria Gomez"])
+
+    def test_export_keeps_the_search(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("admin-loans-export"), {"export_format": "ndjson", "search": "gomez"})
+            rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+        self.assertEqual([row["full_name"] for row in rows], ["Maria Gomez"])
+        # Collected before ordering, like the list's pages
+        self.assertTrue(any("= ANY(ARRAY(" in query["sql"] for query in context))
+
+    def test_short_terms_narrow_longer_ones(self):
+        self.assertEqual(self.search("maria lo"), ["Mariana Lopez"])
+
+    def test_short_terms_alone_match_the_start_of_id_numbers_and_emails(self):
+        self.assertEqual(self.search("20"), ["Juan Perez", "Maria Gomez"])
+        self.assertEqual(self.search("MA"), ["Mariana Lopez"])
+
+    def test_rejects_single_characters(self):
+        response = self.client.get(self.list_url, {"search": "m"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("search", response.data)
+
+    def test_short_terms_need_a_prefix_field(self):
+        with patch.object(AdminLoanRequestAPIView, "search_fields", ["full_name"]):
+            response = self.client.get(self.list_url, {"search": "wu"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_searches_use_the_indexes(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.list_url, {"search": "gomez"})
+        count_sql = next(query["sql"] for query in context if query["sql"].startswith("SELECT COUNT(*)"))
+
+        with connection.cursor() as cursor:
+            # Too few rows for the planner to pick an index on its own
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {count_sql}")
+            plan = "\n".join(line for line, in cursor.fetchall())
+
+        for index in ["loan_full_name_trgm_idx", "loan_email_trgm_idx", "loan_id_number_prefix_idx"]:
+            self.assertIn(index, plan)
+
+    def test_searched_pages_collect_the_matches_before_ordering(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.list_url, {"search": "maria"})
+        page_sql = next(query["sql"] for query in context if "ORDER BY" in query["sql"])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {page_sql}")
+            plan = "\n".join(line for line, in cursor.fetchall())
+
+        # The page looks its matches up by id instead of walking the -id index
+        self.assertIn("Index Cond: (id = ANY", plan)
+        self.assertIn("loan_full_name_trgm_idx", plan)
+        self.assertFalse(any(query["sql"].startswith("SET") for query in context))
+
+    def test_email_searches_use_the_prefix_index(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.list_url, {"search": "mgomez@gmail.com"})
+        count_sql = next(query["sql"] for query in context if query["sql"].startswith("SELECT COUNT(*)"))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {count_sql}")
+            plan = "\n".join(line for line, in cursor.fetchall())
+
+        self.assertIn("loan_email_prefix_idx", plan)
+        self.assertNotIn("trgm", plan)
+
+
+class AdminBulkDecisionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+
+        self.admin_user = User.objects.create_user(username="test_admin", password="pass1234")
+        self.admin_user.groups.add(Group.objects.get(name="Admin"))
+        self.client.force_authenticate(user=self.admin_user)
+
+        self.loans = LoanRequest.objects.bulk_create([
+            LoanRequest(
+                id_number=f"2012345{i:04d}",
+                full_name=f"Test User {i}",
+                gender="M",
+                email=f"test{i}@example.com",
+                amount=10000,
+                status=status
+            )
+            for i, status in enumerate(["PEN", "PEN", "APR", "REJ", "PEN"])
+        ])
+        self.url = reverse("admin-loans-bulk-decide")
+
+    def test_approves_pending_ids_and_reports_outcomes(self):
+        ids = [self.loans[0].pk, self.loans[2].pk, 999999999]
+
+        response = self.client.post(self.url, {"decision": "approve", "ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(response.data["results"], [
+            {"id": self.loans[0].pk, "outcome": "updated", "status": "APR"},
+            {"id": self.loans[2].pk, "outcome": "skipped", "status": "APR"},
+            {"id": 999999999, "outcome": "not_found"},
+        ])
+        self.assertEqual(
+            list(LoanRequest.objects.order_by("pk").values_list("status", flat=True)),
+            ["APR", "PEN", "APR", "REJ", "PEN"]
+        )
+
+    def test_rejects_all_loans_matching_status(self):
+        LoanValidationTask.objects.create(loan=self.loans[0])
+        stats.rebuild()
+
+        response = self.client.post(self.url, {"decision": "reject", "status": "PEN"}, format="json")
+
+        self.assertEqual(response.data, {"updated": 3, "skipped": 0})
+        self.assertEqual(LoanRequest.objects.filter(status="REJ").count(), 4)
+        self.assertEqual(LoanRequest.objects.filter(status="PEN").count(), 0)
+        self.assertFalse(LoanValidationTask.objects.exists())
+        self.assertEqual(stats.differences(), [])
+        self.assertEqual(
+            sorted(LoanEvent.objects.values_list("loan_id", "previous_status", "status")),
+            [(loan.pk, "PEN", "REJ") for loan in self.loans if loan.status == "PEN"]
+        )
+
+    @patch("user.roles.get_ttl", return_value=60)
+    def test_status_selection_is_one_statement(self, _):
+        self.client.post(self.url, {"decision": "approve", "status": "PEN"}, format="json")
+        LoanRequest.objects.filter(pk=self.loans[0].pk).update(status="PEN")
+
+        # Savepoint, update with its queue cleanup, events and stats, stats upsert, release
+        with self.assertNumQueries(4):
+            self.client.post(self.url, {"decision": "approve", "status": "PEN"}, format="json")
+
+    def test_status_selection_of_decided_loans_only_counts_them(self):
+        response = self.client.post(self.url, {"decision": "reject", "status": "APR"}, format="json")
+
+        self.assertEqual(response.data, {"updated": 0, "skipped": 1})
+        self.assertEqual(LoanRequest.objects.filter(status="APR").count(), 1)
+
+    def test_ids_with_another_status_are_skipped(self):
+        ids = [self.loans[0].pk, self.loans[2].pk]
+
+        response = self.client.post(self.url, {"decision": "reject", "ids": ids, "status": "APR"}, format="json")
+
+        self.assertEqual(response.data["updated"], 0)
+        self.assertEqual(response.data["results"], [
+            {"id": self.loans[0].pk, "outcome": "skipped", "status": "PEN"},
+            {"id": self.loans[2].pk, "outcome": "skipped", "status": "APR"},
+        ])
+
+    def test_decided_loans_leave_the_validation_queue(self):
+        LoanValidationTask.objects.create(loan=self.loans[0])
+
+        self.client.post(self.url, {"decision": "approve", "ids": [self.loans[0].pk]}, format="json")
+
+        self.assertFalse(LoanValidationTask.objects.exists())
+
+    @patch("user.roles.get_ttl", return_value=60)
+    def test_query_count_does_not_grow_with_ids(self, _):
+        ids = [loan.pk for loan in self.loans]
+        self.client.post(self.url, {"decision": "approve", "ids": ids[:1]}, format="json")
+
+        # Savepoint, lock, update, stats upsert, events, queue cleanup, release
+        with self.assertNumQueries(7):
+            self.client.post(self.url, {"decision": "approve", "ids": ids}, format="json")
+
+    def test_requires_ids_or_status(self):
+        response = self.client.post(self.url, {"decision": "approve"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_analyst_cannot_bulk_decide(self):
+        analyst = User.objects.create_user(username="test_analyst", password="pass1234")
+        analyst.groups.add(Group.objects.get(name="Analyst"))
+        self.client.force_authenticate(user=analyst)
+
+        response = self.client.post(self.url, {"decision": "approve", "status": "PEN"}, format="json")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(LoanRequest.objects.filter(status="PEN").count(), 3)
+
+
+class ValuesRepresentationTest(TestCase):
+
+    def setUp(self):
+        self.representation = ValuesRepresentation(LoanRequestSerializer)
+        for amount in ["0.5", "1500", "12345678901234567890.10"]:
+            LoanRequest.objects.create(
+                id_number="20123456789",
+                full_name="Test User",
+                gender="O",
+                email="test@example.com",
+                amount=amount
+            )
+
+    def represent(self):
+        rows = LoanRequest.objects.order_by("id").values(*self.representation.field_names)
+        return self.representation.to_representation(rows)
+
+    def test_matches_the_serializer(self):
+        expected = LoanRequestSerializer(LoanRequest.objects.order_by("id"), many=True).data
+
+        self.assertEqual(
+            JSONRenderer().render(self.represent()),
+            JSONRenderer().render(expected)
+        )
+        self.assertEqual([row["amount"] for row in self.represent()], ["0.50", "1500.00", "12345678901234567890.10"])
+
+    def test_matches_the_serializer_in_another_time_zone(self):
+        with timezone.override("America/Argentina/Buenos_Aires"):
+            rows = self.represent()
+            expected = LoanRequestSerializer(LoanRequest.objects.order_by("id"), many=True).data
+
+        self.assertEqual(rows, [dict(row) for row in expected])
+        self.assertTrue(rows[0]["created_at"].endswith("-03:00"))
+
+    def test_rejects_fields_it_cannot_render(self):
+        class ComputedSerializer(LoanRequestSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(LoanRequestSerializer.Meta):
+                fields = [*LoanRequestSerializer.Meta.fields, "label"]
+
+        with self.assertRaises(ValueError):
+            ValuesRepresentation(ComputedSerializer)
+
+
+class AdminLoanExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+
+        self.analyst_user = User.objects.create_user(username="test_analyst", password="pass1234")
+        self.analyst_user.groups.add(Group.objects.get(name="Analyst"))
+        self.client.force_authenticate(user=self.analyst_user)
+
+        LoanRequest.objects.bulk_create([
+            LoanRequest(
+                id_number=f"2012345{i:04d}",
+                full_name=f"José, \"Pepe\" {i}",
+                gender="M",
+                email=f"test{i}@example.com",
+                amount="1500.50",
+                status="PEN" if i % 2 else "APR"
+            )
+            for i in range(5)
+        ])
+        self.url = reverse("admin-loans-export")
+
+    def export(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_rows_match_the_serializer(self):
+        body = self.export({"export_format": "ndjson"})
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        expected = LoanRequestSerializer(LoanRequest.objects.order_by("-id"), many=True).data
+        self.assertEqual(rows, [dict(row) for row in expected])
+
+    def test_csv_has_header_and_quoted_rows(self):
+        body = self.export()
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["full_name"], "José, \"Pepe\" 4")
+        self.assertEqual(rows[0]["amount"], "1500.50")
+
+    def test_export_keeps_status_filter(self):
+        body = self.export({"export_format": "ndjson", "status": "PEN"})
+
+        statuses = {json.loads(line)["status"] for line in body.splitlines()}
+        self.assertEqual(statuses, {"PEN"})
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_streams_in_chunks(self):
+        with patch("loan.views.CHUNK_SIZE", 2):
+            response = self.client.get(self.url, {"export_format": "ndjson"})
+            chunks = list(response.streaming_content)
+
+        self.assertEqual(len(chunks), 3)
+
+    def test_rejects_unknown_format(self):
+        response = self.client.get(self.url, {"export_format": "xlsx"})
+
+        self.assertEqual(response.status_code, 400)
+
+    async def test_asgi_streams_without_buffering(self):
+        token = str(AccessToken.for_user(self.analyst_user))
+
+        response = await self.async_client.get(
+            self.url, {"export_format": "ndjson"}, headers={"Authorization": f"Bearer {token}"}
+        )
+
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.splitlines()), 5)
+
+
+class AdminLoanConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        admin_user = User.objects.create_user(username="test_admin", password="pass1234")
+        admin_user.groups.add(Group.objects.get(name="Admin"))
+        self.client.force_authenticate(user=admin_user)
+
+        self.pending, self.approved, self.rejected = [
+            LoanRequest.objects.create(
+                id_number=f"2012345678{i}",
+                full_name=f"Test User {i}",
+                gender="F",
+                email=f"test{i}@example.com",
+                amount=10000,
+                status=loan_status
+            )
+            for i, loan_status in enumerate(["PEN", "APR", "REJ"])
+        ]
+        stats.rebuild()
+
+        self.list_url = reverse("admin-loans-list")
+        self.detail_url = reverse("admin-loans-detail", args=[self.pending.id])
+
+    def etag(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+        return response["ETag"]
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.etag(self.list_url, {"status": "PEN"})
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.list_url, {"status": "PEN"}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertFalse(any("loan_loanrequest" in query["sql"] for query in context.captured_queries))
+
+    def test_unchanged_detail_is_not_modified(self):
+        response = self.client.get(self.detail_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304
+        )
+
+    def test_approve_and_reject_change_the_etags(self):
+        for action in ["approve-loan", "reject-loan"]:
+            with self.subTest(action=action):
+                list_etag = self.etag(self.list_url)
+                detail_etag = self.etag(self.detail_url)
+
+                response = self.client.post(reverse(f"admin-loans-{action}", args=[self.pending.id]))
+                self.assertEqual(response.status_code, 204)
+
+                for url, etag in [(self.list_url, list_etag), (self.detail_url, detail_etag)]:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response["ETag"], etag)
+
+    def test_writes_only_change_the_etags_of_statuses_they_touch(self):
+        etags = {status: self.etag(self.list_url, {"status": status}) for status in ["PEN", "APR", "REJ"]}
+
+        self.client.post(reverse("admin-loans-approve-loan", args=[self.pending.id]))
+
+        self.assertNotEqual(self.etag(self.list_url, {"status": "PEN"}), etags["PEN"])
+        self.assertNotEqual(self.etag(self.list_url, {"status": "APR"}), etags["APR"])
+        self.assertEqual(self.etag(self.list_url, {"status": "REJ"}), etags["REJ"])
+
+    def test_edits_that_keep_the_totals_change_the_etag(self):
+        etag = self.etag(self.list_url)
+
+        self.client.patch(self.detail_url, {"full_name": "Renamed"}, format="json")
+
+        self.assertNotEqual(self.etag(self.list_url), etag)
+
+    def test_delete_and_rebuild_change_the_etag(self):
+        etag = self.etag(self.list_url)
+        self.client.delete(reverse("admin-loans-detail", args=[self.rejected.id]))
+        self.assertNotEqual(self.etag(self.list_url), etag)
+
+        etag = self.etag(self.list_url)
+        stats.rebuild()
+        self.assertNotEqual(self.etag(self.list_url), etag)
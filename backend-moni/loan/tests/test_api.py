@@ -1,6 +1,15 @@
-from django.test import TestCase
+import io
+import threading
+import time
+
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
-from loan.models import LoanRequest
+from loan.models import IdempotencyKey, LoanRequest, LoanValidationTask
 from unittest.mock import patch
 from django.urls import reverse
 
@@ -75,3 +84,209 @@ class LoanRequestAPITest(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("amount", response.data)
         self.assertEqual(LoanRequest.objects.count(), 0)
+
+    @override_settings(LOAN_VALIDATION_MODE="deferred")
+    @patch("loan.services.LoanValidationService.check_loan_eligibility")
+    def test_create_loan_request_deferred(self, mock_check):
+        data = {
+            "id_number": "20123456789",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+
+        response = self.client.post(self.list_url, data, format="json")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "PEN")
+        self.assertTrue(LoanValidationTask.objects.filter(loan_id=response.data["id"]).exists())
+        mock_check.assert_not_called()
+
+
+class AsyncLoanRequestAPITest(TestCase):
+    def setUp(self):
+        self.url = reverse("loan-requests-async")
+        self.data = {
+            "id_number": "20123456789",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+
+    @patch("loan.services.LoanValidationService.acheck_loan_eligibility", return_value=True)
+    async def test_create_loan_request_approved(self, _):
+        response = await self.async_client.post(self.url, self.data, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["status"], "APR")
+        self.assertEqual(await LoanRequest.objects.acount(), 1)
+
+    @patch("loan.services.LoanValidationService.acheck_loan_eligibility", return_value=False)
+    async def test_create_loan_request_rejected(self, _):
+        response = await self.async_client.post(self.url, self.data, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["status"], "REJ")
+        self.assertEqual(await LoanRequest.objects.acount(), 1)
+
+    @patch("loan.services.LoanValidationService.acheck_loan_eligibility", return_value=True)
+    async def test_create_loan_request_invalid_email(self, mock_check):
+        data = {**self.data, "email": "not-an-email"}
+
+        response = await self.async_client.post(self.url, data, content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.json())
+        self.assertEqual(await LoanRequest.objects.acount(), 0)
+        mock_check.assert_not_called()
+
+    @override_settings(LOAN_VALIDATION_MODE="deferred")
+    @patch("loan.services.LoanValidationService.acheck_loan_eligibility")
+    async def test_create_loan_request_deferred(self, mock_check):
+        response = await self.async_client.post(self.url, self.data, content_type="application/json")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "PEN")
+        self.assertEqual(await LoanValidationTask.objects.acount(), 1)
+        mock_check.assert_not_called()
+
+    async def test_create_loan_request_invalid_json(self):
+        response = await self.async_client.post(self.url, "{", content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("loan-requests")
+        self.data = {
+            "id_number": "20123456789",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+
+    def post(self, data, key="retry-1"):
+        return self.client.post(self.url, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_retry_replays_first_response(self, mock_check):
+        first = self.post(self.data)
+        second = self.post(self.data)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(LoanRequest.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().loan_id, first.json()["id"])
+        mock_check.assert_called_once()
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_different_keys_create_different_loans(self, mock_check):
+        self.post(self.data, key="a")
+        self.post(self.data, key="b")
+
+        self.assertEqual(LoanRequest.objects.count(), 2)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_key_reused_with_other_body(self, _):
+        self.post(self.data)
+
+        response = self.post({**self.data, "amount": 20000})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(LoanRequest.objects.count(), 1)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_validation_errors_are_replayed(self, mock_check):
+        data = {**self.data, "email": "not-an-email"}
+
+        self.post(data)
+        response = self.post(data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.json())
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+
+    @override_settings(LOAN_IDEMPOTENCY_TTL=60)
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_expired_key_runs_again(self, mock_check):
+        self.post(self.data)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+
+        response = self.post({**self.data, "amount": 20000})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(LoanRequest.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=RuntimeError("boom"))
+    def test_failed_request_releases_the_key(self, _):
+        client = APIClient(raise_request_exception=False)
+
+        response = client.post(self.url, self.data, format="json", HTTP_IDEMPOTENCY_KEY="retry-1")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_key_too_long(self):
+        response = self.post(self.data, key="x" * 256)
+
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(LOAN_IDEMPOTENCY_TTL=60)
+    def test_purge_command_deletes_expired_keys(self):
+        IdempotencyKey.objects.create(key="old", fingerprint="", created_at=timezone.now() - timedelta(seconds=61))
+        IdempotencyKey.objects.create(key="new", fingerprint="")
+
+        call_command("purge_idempotency_keys", "--batch-size", "1", stdout=io.StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"])
+
+
+class ConcurrentIdempotencyKeyTest(TransactionTestCase):
+    """Requests run in threads with their own connections, so the row lock is real."""
+
+    def test_concurrent_requests_validate_once(self):
+        data = {
+            "id_number": "20123456789",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+        calls = []
+
+        def slow_check(id_number):
+            calls.append(id_number)
+            time.sleep(0.2)
+            return True
+
+        responses = []
+
+        def send():
+            try:
+                responses.append(APIClient().post(
+                    reverse("loan-requests"), data, format="json", HTTP_IDEMPOTENCY_KEY="same"
+                ))
+            finally:
+                connection.close()
+
+        with patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=slow_check):
+            threads = [threading.Thread(target=send) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(LoanRequest.objects.count(), 1)
+        self.assertEqual([response.status_code for response in responses], [201] * 8)
+        self.assertEqual(len({response.json()["id"] for response in responses}), 1)
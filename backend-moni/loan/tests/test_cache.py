@@ -0,0 +1,157 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from unittest.mock import Mock, patch
+
+from benchmarks.stub_validator import StubValidator
+from loan.cache import (
+    DjangoEligibilityCache,
+    LRUEligibilityCache,
+    NullEligibilityCache,
+    get_eligibility_cache,
+    reset_eligibility_cache,
+)
+from loan.circuit import get_circuit_breaker
+from loan.clients import aclose_async_session, close_session
+from loan.models import LoanRequest
+from loan.services import LoanValidationService
+
+
+class LRUEligibilityCacheTest(TestCase):
+
+    def test_returns_none_on_miss(self):
+        cache = LRUEligibilityCache(60, 60, 10)
+
+        self.assertIsNone(cache.get("20123456789"))
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 1, "size": 0})
+
+    def test_returns_cached_verdict(self):
+        cache = LRUEligibilityCache(60, 60, 10)
+        cache.set("20123456789", True)
+
+        self.assertTrue(cache.get("20123456789"))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_verdicts_expire_with_their_own_ttl(self):
+        clock = Mock(return_value=1000)
+        cache = LRUEligibilityCache(approved_ttl=600, rejected_ttl=60, max_entries=10, clock=clock)
+        cache.set("approved", True)
+        cache.set("rejected", False)
+
+        clock.return_value = 1061
+
+        self.assertTrue(cache.get("approved"))
+        self.assertIsNone(cache.get("rejected"))
+
+    def test_zero_ttl_disables_caching(self):
+        cache = LRUEligibilityCache(approved_ttl=60, rejected_ttl=0, max_entries=10)
+        cache.set("20123456789", False)
+
+        self.assertIsNone(cache.get("20123456789"))
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUEligibilityCache(60, 60, max_entries=2)
+        cache.set("a", True)
+        cache.set("b", True)
+        cache.get("a")
+
+        cache.set("c", True)
+
+        self.assertTrue(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertTrue(cache.get("c"))
+
+
+class DjangoEligibilityCacheTest(TestCase):
+
+    def test_round_trips_verdicts(self):
+        cache = DjangoEligibilityCache(60, 60, "default")
+        cache.set("20123456789", False)
+
+        self.assertIs(cache.get("20123456789"), False)
+        self.assertIsNone(cache.get("20123456780"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1})
+
+
+class EligibilityCacheSettingsTest(TestCase):
+
+    def tearDown(self):
+        reset_eligibility_cache()
+
+    @override_settings(LOAN_VALIDATION_CACHE_BACKEND="django")
+    def test_django_backend(self):
+        reset_eligibility_cache()
+
+        self.assertIsInstance(get_eligibility_cache(), DjangoEligibilityCache)
+
+    @override_settings(LOAN_VALIDATION_CACHE_BACKEND="none")
+    def test_disabled(self):
+        reset_eligibility_cache()
+
+        self.assertIsInstance(get_eligibility_cache(), NullEligibilityCache)
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class DuplicateSubmissionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("loan-requests")
+        self.data = {
+            "id_number": "20123456788",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+        self.addCleanup(close_session)
+
+    def test_duplicate_submissions_within_ttl_skip_upstream(self):
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                responses = [
+                    self.client.post(self.url, self.data, format="json")
+                    for _ in range(3)
+                ]
+
+        self.assertEqual(validator.request_count, 1)
+        self.assertEqual([response.data["status"] for response in responses], ["APR"] * 3)
+        self.assertEqual(LoanRequest.objects.count(), 3)
+
+    def test_submission_after_ttl_reaches_upstream(self):
+        cache = get_eligibility_cache()
+        clock = Mock(return_value=1000)
+
+        with StubValidator() as validator, patch.object(cache, "clock", clock):
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                self.client.post(self.url, self.data, format="json")
+                clock.return_value = 1000 + cache.approved_ttl
+                self.client.post(self.url, self.data, format="json")
+
+        self.assertEqual(validator.request_count, 2)
+
+    def test_network_failures_are_not_cached(self):
+        with StubValidator() as validator:
+            unreachable_url = validator.url
+
+        with patch.object(LoanValidationService, "API_URL", unreachable_url):
+            response = self.client.post(self.url, self.data, format="json")
+
+        self.assertEqual(response.data["status"], "REJ")
+
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                response = self.client.post(self.url, self.data, format="json")
+
+        self.assertEqual(validator.request_count, 1)
+        self.assertEqual(response.data["status"], "APR")
+
+    async def test_async_duplicate_submissions_within_ttl_skip_upstream(self):
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                for _ in range(3):
+                    await LoanValidationService.acheck_loan_eligibility("20123456788")
+            await aclose_async_session()
+
+        self.assertEqual(validator.request_count, 1)
@@ -0,0 +1,244 @@
+import asyncio
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from unittest.mock import patch
+
+from requests import RequestException
+
+from loan.cache import get_eligibility_cache
+from loan.circuit import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from loan.models import LoanRequest
+from loan.services import LoanValidationService
+from loan.tests.test_retry import make_policy
+
+
+def make_breaker(**kwargs):
+    options = {
+        "window": 4,
+        "min_calls": 4,
+        "error_rate": 0.5,
+        "slow_call_duration": 1.0,
+        "slow_call_rate": 0.5,
+        "cooldown": 30,
+    }
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+@patch("loan.circuit.time.monotonic", return_value=1000)
+class CircuitBreakerTest(TestCase):
+
+    def test_stays_closed_below_min_calls(self, _):
+        breaker = make_breaker()
+
+        for _ in range(3):
+            breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_opens_on_error_rate(self, _):
+        breaker = make_breaker()
+
+        for _ in range(2):
+            breaker.record_success(0.1)
+            breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+
+    def test_opens_on_slow_call_rate(self, _):
+        breaker = make_breaker()
+
+        for _ in range(2):
+            breaker.record_success(0.1)
+            breaker.record_success(1.5)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_opens_after_cooldown_and_allows_one_trial(self, mock_monotonic):
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+
+        mock_monotonic.return_value = 1030
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.before_call()
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+
+    def test_trial_success_closes_circuit(self, mock_monotonic):
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        mock_monotonic.return_value = 1030
+        breaker.before_call()
+
+        breaker.record_success(0.1)
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_trial_failure_reopens_circuit(self, mock_monotonic):
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        mock_monotonic.return_value = 1030
+        breaker.before_call()
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.stats()["rejected_calls"], 0)
+
+    def test_released_trial_slot_lets_the_next_call_through(self, mock_monotonic):
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        mock_monotonic.return_value = 1030
+        breaker.before_call()
+
+        breaker.release()
+
+        breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+class OpenCircuitTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_eligibility_cache().clear()
+        breaker = get_circuit_breaker()
+        breaker.reset()
+        self.addCleanup(breaker.reset)
+
+        for _ in range(breaker.min_calls):
+            breaker.record_failure()
+
+    @patch("loan.services.LoanValidationService.fetch_loan_eligibility")
+    def test_check_fails_fast_without_calling_upstream(self, mock_fetch):
+        with self.assertRaises(CircuitOpenError):
+            LoanValidationService.check_loan_eligibility("20123456789")
+
+        mock_fetch.assert_not_called()
+
+    @patch("loan.services.LoanValidationService.fetch_loan_eligibility")
+    def test_loan_is_stored_as_pending(self, mock_fetch):
+        data = {
+            "id_number": "20123456789",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+
+        response = self.client.post(reverse("loan-requests"), data, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["status"], "PEN")
+        self.assertEqual(LoanRequest.objects.get().status, "PEN")
+        mock_fetch.assert_not_called()
+
+    @patch("loan.services.LoanValidationService.afetch_loan_eligibility")
+    async def test_async_loan_is_stored_as_pending(self, mock_fetch):
+        data = {
+            "id_number": "20123456789",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+
+        response = await self.async_client.post(
+            reverse("loan-requests-async"), data, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["status"], "PEN")
+        mock_fetch.assert_not_called()
+
+
+class CircuitRecordingTest(TestCase):
+    def setUp(self):
+        get_eligibility_cache().clear()
+        self.breaker = get_circuit_breaker()
+        self.breaker.reset()
+        self.addCleanup(self.breaker.reset)
+
+    @patch("loan.services.LoanValidationService.fetch_loan_eligibility", side_effect=RequestException("down"))
+    def test_failures_open_the_circuit(self, mock_fetch):
+        for _ in range(self.breaker.min_calls):
+            self.assertFalse(LoanValidationService.check_loan_eligibility("20123456789"))
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(mock_fetch.call_count, self.breaker.min_calls)
+
+
+class HalfOpenCircuitTest(TestCase):
+    """The trial call always gives its slot back, however it ends."""
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        self.breaker = make_breaker(cooldown=0)
+        for _ in range(self.breaker.min_calls):
+            self.breaker.record_failure()
+
+        patcher = patch("loan.services.get_circuit_breaker", return_value=self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("loan.services.get_session")
+    def test_malformed_answer_is_a_failure(self, mock_session):
+        mock_session.return_value.post.return_value.json.return_value = ["approved"]
+
+        self.assertFalse(LoanValidationService.check_loan_eligibility("20123456789"))
+
+        # Re-opened, then half-open again at once since the cooldown is 0
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.breaker._trial_calls, 0)
+
+    @patch("loan.services.LoanValidationService.fetch_loan_eligibility", side_effect=KeyError("status"))
+    def test_unexpected_error_releases_the_trial_slot(self, mock_fetch):
+        with self.assertRaises(KeyError):
+            LoanValidationService.check_loan_eligibility("20123456789")
+
+        mock_fetch.side_effect = None
+        mock_fetch.return_value = True
+
+        self.assertTrue(LoanValidationService.check_loan_eligibility("20123456789"))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    @patch("loan.services.LoanValidationService.afetch_loan_eligibility", side_effect=KeyError("status"))
+    async def test_async_unexpected_error_releases_the_trial_slot(self, mock_fetch):
+        with self.assertRaises(KeyError):
+            await LoanValidationService.acheck_loan_eligibility("20123456789")
+
+        mock_fetch.side_effect = None
+        mock_fetch.return_value = True
+
+        self.assertTrue(await LoanValidationService.acheck_loan_eligibility("20123456789"))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    @patch("loan.services.LoanValidationService.afetch_loan_eligibility")
+    async def test_cancelled_hedged_calls_release_their_trial_slots(self, mock_fetch):
+        self.breaker.half_open_calls = 2
+        policy = make_policy(hedge=True, hedge_min_samples=1)
+
+        async def fast(timeout):
+            return True
+
+        await policy.acall(fast)
+
+        async def hang(user_id_number, timeout=None):
+            await asyncio.sleep(5)
+
+        mock_fetch.side_effect = hang
+
+        # The primary and its hedge are both cancelled when the caller gives up
+        with patch("loan.services.get_retry_policy", return_value=policy):
+            with self.assertRaises(TimeoutError):
+                await asyncio.wait_for(LoanValidationService.afetch_with_retry("20123456789"), 0.5)
+
+        self.assertEqual(policy.stats()["hedges"], 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.breaker._trial_calls, 0)
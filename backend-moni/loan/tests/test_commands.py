@@ -1,9 +1,22 @@
+import io
+import json
+import tempfile
+
+from datetime import timedelta
+from pathlib import Path
+
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase, override_settings
 from django.conf import settings
-from loan.models import LoanRequest
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from loan.circuit import CircuitOpenError
+from loan.models import LoanRequest, LoanValidationTask, ValidationFlight
 from unittest.mock import patch
 
+from requests import RequestException
+
 
 class SeedLoansCommandTest(TestCase):
 
@@ -36,3 +49,296 @@ class SeedLoansCommandTest(TestCase):
 
         call_command("seed_loans")
         self.assertEqual(LoanRequest.objects.count(), 0)
+
+    def seed(self, **options):
+        settings.ENVIRONMENT = "local"
+        settings.DEBUG = True
+
+        call_command("seed_loans", stdout=io.StringIO(), **options)
+
+    def test_command_creates_count_loans_in_batches(self):
+        self.seed(count=250, batch_size=100)
+
+        self.assertEqual(LoanRequest.objects.count(), 250)
+
+    def test_command_follows_status_and_gender_weights(self):
+        self.seed(count=1000, status="APR=0,REJ=1,PEN=3", gender="O", seed=1)
+
+        self.assertFalse(LoanRequest.objects.filter(status="APR").exists())
+        self.assertAlmostEqual(LoanRequest.objects.filter(status="PEN").count(), 750, delta=50)
+        self.assertEqual(set(LoanRequest.objects.values_list("gender", flat=True)), {"O"})
+
+    def test_command_queues_pending_loans_for_validation(self):
+        existing = LoanRequest.objects.create(id_number="20123456789", full_name="Test User", gender="M",
+                                              email="test@example.com", amount=10000, status="PEN")
+
+        self.seed(count=100, status="APR=1,PEN=1", seed=1, append=True)
+
+        queued = set(LoanValidationTask.objects.values_list("loan_id", flat=True))
+        pending = set(LoanRequest.objects.filter(status="PEN").exclude(pk=existing.pk).values_list("pk", flat=True))
+        self.assertTrue(pending)
+        self.assertEqual(queued, pending)
+
+    def test_command_spreads_created_at_over_days(self):
+        self.seed(count=200, days=30, seed=1)
+
+        oldest = LoanRequest.objects.order_by("created_at").first().created_at
+        self.assertGreater(timezone.now() - oldest, timedelta(days=20))
+        self.assertLessEqual(timezone.now() - oldest, timedelta(days=30, minutes=1))
+
+    def test_same_seed_gives_same_dataset(self):
+        fields = ["id_number", "full_name", "email", "gender", "amount", "status"]
+
+        self.seed(count=50, seed=7)
+        first = list(LoanRequest.objects.order_by("id").values_list(*fields))
+        LoanRequest.objects.all().delete()
+        self.seed(count=50, seed=7)
+        second = list(LoanRequest.objects.order_by("id").values_list(*fields))
+
+        self.assertEqual(first, second)
+
+    def test_append_seeds_over_existing_loans(self):
+        self.seed(count=5)
+        self.seed(count=5, append=True)
+
+        self.assertEqual(LoanRequest.objects.count(), 10)
+
+    def test_unknown_status_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self.seed(count=5, status="APR=1,XYZ=1")
+
+
+class ValidateLoansCommandTest(TestCase):
+
+    def queue_loan(self, id_number, status="PEN"):
+        loan = LoanRequest.objects.create(
+            id_number=id_number,
+            full_name="Test User",
+            gender="M",
+            email="test@example.com",
+            amount=10000,
+            status=status
+        )
+        LoanValidationTask.objects.create(loan=loan)
+        return loan
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility",
+           side_effect=lambda id_number, **kwargs: id_number.endswith("0"))
+    def test_command_applies_verdicts_and_drains_queue(self, _):
+        approved = self.queue_loan("20123456780")
+        rejected = self.queue_loan("20123456781")
+
+        call_command("validate_loans", "--once")
+
+        approved.refresh_from_db()
+        rejected.refresh_from_db()
+        self.assertEqual(approved.status, "APR")
+        self.assertEqual(rejected.status, "REJ")
+        self.assertFalse(LoanValidationTask.objects.exists())
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_command_updates_each_batch_with_one_statement(self, _):
+        for i in range(20):
+            self.queue_loan(f"2012345678{i}")
+
+        # Claim: SAVEPOINT, SELECT ... FOR UPDATE SKIP LOCKED, UPDATE tasks, RELEASE
+        # Apply: SAVEPOINT, SELECT ... FOR UPDATE, UPDATE loans, stats upsert, events, DELETE tasks, RELEASE
+        with self.assertNumQueries(11):
+            call_command("validate_loans", "--once", "--batch-size", "50")
+
+        self.assertEqual(LoanRequest.objects.filter(status="APR").count(), 20)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_command_keeps_loans_decided_meanwhile(self, _):
+        loan = self.queue_loan("20123456781", status="REJ")
+
+        call_command("validate_loans", "--once")
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, "REJ")
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=CircuitOpenError)
+    def test_command_defers_loans_while_circuit_is_open(self, _):
+        loan = self.queue_loan("20123456780")
+
+        call_command("validate_loans", "--once")
+
+        loan.refresh_from_db()
+        task = LoanValidationTask.objects.get(loan=loan)
+        self.assertEqual(loan.status, "PEN")
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.available_at, task.created_at)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=RequestException("down"))
+    def test_command_defers_loans_when_the_validator_fails(self, mock_check):
+        loans = [self.queue_loan("20123456780"), self.queue_loan("20123456781")]
+
+        call_command("validate_loans", "--once")
+
+        # Each loan gets its own call: one failing CUIL doesn't hold back the rest
+        self.assertEqual(mock_check.call_count, 2)
+        self.assertEqual(mock_check.call_args.kwargs, {"raise_errors": True})
+        for loan in loans:
+            loan.refresh_from_db()
+            self.assertEqual(loan.status, "PEN")
+            self.assertEqual(LoanValidationTask.objects.get(loan=loan).attempts, 1)
+
+    def test_command_validates_claimed_loans_outside_the_claim(self):
+        loan = self.queue_loan("20123456780")
+        due = []
+
+        def check(id_number, **kwargs):
+            # Claimed tasks are no longer due, so other workers skip them
+            due.append(LoanValidationTask.objects.filter(available_at__lte=timezone.now()).count())
+            LoanRequest.objects.filter(pk=loan.pk).update(status="REJ")
+            return True
+
+        with patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=check):
+            call_command("validate_loans", "--once")
+
+        loan.refresh_from_db()
+        self.assertEqual(due, [0])
+        self.assertEqual(loan.status, "REJ")
+        self.assertFalse(LoanValidationTask.objects.exists())
+
+
+class RevalidateLoansCommandTest(TestCase):
+
+    def create_loan(self, id_number, status="PEN"):
+        return LoanRequest.objects.create(
+            id_number=id_number,
+            full_name="Test User",
+            gender="M",
+            email="test@example.com",
+            amount=10000,
+            status=status
+        )
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility",
+           side_effect=lambda id_number, **kwargs: id_number.endswith("0"))
+    def test_command_revalidates_pending_loans(self, mock_check):
+        approved = self.create_loan("20123456780")
+        rejected = self.create_loan("20123456781")
+        untouched = self.create_loan("20123456782", status="REJ")
+
+        call_command("revalidate_loans", "--rate", "0", "--chunk-size", "1")
+
+        for loan in (approved, rejected, untouched):
+            loan.refresh_from_db()
+        self.assertEqual(approved.status, "APR")
+        self.assertEqual(rejected.status, "REJ")
+        self.assertEqual(mock_check.call_count, 2)
+        self.assertEqual(mock_check.call_args.kwargs, {"use_cache": False, "raise_errors": True})
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility",
+           side_effect=RequestException("down"))
+    def test_command_keeps_status_when_validator_fails(self, _):
+        loan = self.create_loan("20123456780", status="APR")
+
+        call_command("revalidate_loans", "--status", "APR", "--rate", "0")
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, "APR")
+
+    def test_command_closes_the_thread_connections(self):
+        self.create_loan("20123456780")
+        used = []
+
+        def check(id_number, **kwargs):
+            connection = connections[DEFAULT_DB_ALIAS]
+            connection.ensure_connection()
+            used.append(connection)
+            return True
+
+        with patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=check):
+            call_command("revalidate_loans", "--rate", "0", "--concurrency", "2", stdout=io.StringIO())
+
+        self.assertEqual(len(used), 1)
+        self.assertIsNot(used[0], connections[DEFAULT_DB_ALIAS])
+        self.assertIsNone(used[0].connection)
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_command_drops_queued_validation_tasks(self, _):
+        loan = self.create_loan("20123456780")
+        LoanValidationTask.objects.create(loan=loan)
+
+        call_command("revalidate_loans", "--rate", "0")
+
+        self.assertFalse(LoanValidationTask.objects.exists())
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_command_resumes_from_checkpoint(self, mock_check):
+        first = self.create_loan("20123456780")
+        second = self.create_loan("20123456781")
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Path(directory) / "checkpoint.json"
+            checkpoint.write_text(json.dumps({"last_id": first.pk}))
+
+            call_command("revalidate_loans", "--rate", "0", "--checkpoint", str(checkpoint), "--resume")
+
+            self.assertEqual(json.loads(checkpoint.read_text()), {"last_id": second.pk, "failed_ids": []})
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, "PEN")
+        self.assertEqual(second.status, "APR")
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility")
+    def test_command_stops_when_circuit_opens(self, mock_check):
+        mock_check.side_effect = [True, CircuitOpenError()]
+        first = self.create_loan("20123456780")
+        self.create_loan("20123456781")
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Path(directory) / "checkpoint.json"
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    "revalidate_loans", "--rate", "0", "--concurrency", "1",
+                    "--checkpoint", str(checkpoint)
+                )
+
+            self.assertEqual(json.loads(checkpoint.read_text()), {"last_id": first.pk, "failed_ids": []})
+
+    def test_command_retries_failed_loans_on_resume(self):
+        failing = self.create_loan("20123456780")
+        passing = self.create_loan("20123456781")
+
+        def check(id_number, **kwargs):
+            if id_number == failing.id_number:
+                raise RequestException("down")
+            return True
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Path(directory) / "checkpoint.json"
+            args = ["revalidate_loans", "--rate", "0", "--checkpoint", str(checkpoint), "--resume"]
+
+            with patch("loan.services.LoanValidationService.check_loan_eligibility", side_effect=check):
+                call_command(*args, stdout=io.StringIO())
+
+            self.assertEqual(json.loads(checkpoint.read_text()), {"last_id": passing.pk, "failed_ids": [failing.pk]})
+
+            with patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=False) as mock_check:
+                call_command(*args, stdout=io.StringIO())
+
+            self.assertEqual([call.args[0] for call in mock_check.call_args_list], [failing.id_number])
+            self.assertEqual(json.loads(checkpoint.read_text()), {"last_id": passing.pk, "failed_ids": []})
+
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, "REJ")
+
+
+class PurgeValidationFlightsCommandTest(TestCase):
+
+    @override_settings(LOAN_VALIDATION_FLIGHT_TTL=60)
+    def test_command_deletes_verdicts_past_the_ttl(self):
+        ValidationFlight.objects.create(id_number="1", is_approved=True,
+                                        completed_at=timezone.now() - timedelta(seconds=61))
+        ValidationFlight.objects.create(id_number="2", is_approved=True,
+                                        completed_at=timezone.now() - timedelta(seconds=61))
+        ValidationFlight.objects.create(id_number="3", is_approved=False, completed_at=timezone.now())
+
+        call_command("purge_validation_flights", "--batch-size", "1", stdout=io.StringIO())
+
+        self.assertEqual(list(ValidationFlight.objects.values_list("id_number", flat=True)), ["3"])
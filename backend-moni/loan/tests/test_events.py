@@ -0,0 +1,423 @@
+import asyncio
+import io
+import json
+import time
+
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from unittest.mock import patch
+
+from loan import events
+from loan.models import LoanEvent, LoanRequest, LoanValidationTask
+from loan.queue import process_validation_batch
+from main.authentication import EventStreamToken
+from user.roles import get_cache
+
+
+def loan_payload(id_number):
+    return {
+        "id_number": id_number,
+        "full_name": "Juan Pérez",
+        "gender": "M",
+        "email": "juan@example.com",
+        "amount": 15000
+    }
+
+
+def create_loan(id_number="20123456789", status="PEN") -> LoanRequest:
+    return LoanRequest.objects.create(
+        id_number=id_number,
+        full_name="Test User",
+        gender="F",
+        email="test@example.com",
+        amount=10000,
+        status=status
+    )
+
+
+def parse_frame(frame: bytes) -> dict:
+    fields = {}
+    for line in frame.decode().splitlines():
+        name, _, value = line.partition(": ")
+        fields[name] = value
+
+    return fields
+
+
+class LoanEventPublishTest(TestCase):
+    """Loan creations and status changes are recorded with the writes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+
+        admin = User.objects.create_user(username="events_admin", password="pass1234")
+        admin.groups.add(Group.objects.get(name="Admin"))
+        self.client.force_authenticate(user=admin)
+
+    def recorded(self):
+        return list(LoanEvent.objects.order_by("id").values_list("loan_id", "kind", "previous_status", "status"))
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True)
+    def test_intake(self, _):
+        response = self.client.post(reverse("loan-requests"), loan_payload("20123456789"), format="json")
+
+        self.assertEqual(self.recorded(), [(response.data["id"], "created", "", "APR")])
+
+    def test_approve_and_reject(self):
+        loan = create_loan()
+
+        self.client.post(reverse("admin-loans-approve-loan", args=[loan.id]))
+        self.client.post(reverse("admin-loans-approve-loan", args=[loan.id]))
+        self.client.post(reverse("admin-loans-reject-loan", args=[loan.id]))
+
+        self.assertEqual(self.recorded(), [
+            (loan.id, "status_changed", "PEN", "APR"),
+            (loan.id, "status_changed", "APR", "REJ"),
+        ])
+
+    def test_bulk_decision_records_only_pending_loans(self):
+        pending, approved = create_loan("20123456780"), create_loan("20123456781", "APR")
+
+        self.client.post(
+            reverse("admin-loans-bulk-decide"), {"decision": "reject", "ids": [pending.id, approved.id]}, format="json"
+        )
+
+        self.assertEqual(self.recorded(), [(pending.id, "status_changed", "PEN", "REJ")])
+
+    def test_updates_keep_the_status(self):
+        loan = create_loan()
+        url = reverse("admin-loans-detail", args=[loan.id])
+
+        # The status is read-only here; approve and reject change it
+        self.client.patch(url, {"full_name": "Renamed"}, format="json")
+        self.client.patch(url, {"status": "APR"}, format="json")
+
+        self.assertEqual(self.recorded(), [])
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=False)
+    def test_deferred_worker(self, _):
+        loan = create_loan()
+        LoanValidationTask.objects.create(loan=loan)
+
+        process_validation_batch(10)
+
+        self.assertEqual(self.recorded(), [(loan.id, "status_changed", "PEN", "REJ")])
+
+    @override_settings(LOAN_EVENTS_ENABLED=False)
+    def test_disabled(self):
+        loan = create_loan()
+
+        self.client.post(reverse("admin-loans-approve-loan", args=[loan.id]))
+
+        self.assertFalse(LoanEvent.objects.exists())
+
+    def test_purge_command_deletes_old_events_in_batches(self):
+        events.publish_created([create_loan(f"2012345678{i}") for i in range(3)])
+        LoanEvent.objects.filter(pk__in=LoanEvent.objects.order_by("id").values("pk")[:2]).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        call_command("purge_loan_events", "--batch-size", "1", stdout=io.StringIO())
+
+        self.assertEqual(LoanEvent.objects.count(), 1)
+
+    def test_events_share_their_transaction_id(self):
+        events.publish_created([create_loan("20123456780")])
+        events.publish_created([create_loan("20123456781")])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT txid_current()")
+            txid = cursor.fetchone()[0]
+
+        self.assertEqual(set(LoanEvent.objects.values_list("txid", flat=True)), {txid})
+
+
+class SnapshotTest(TestCase):
+
+    def test_sees_transactions_committed_before_it(self):
+        snapshot = events.Snapshot("100:105:101,103", 0)
+
+        self.assertEqual([snapshot.sees(txid) for txid in range(99, 106)],
+                         [True, True, False, True, False, True, False])
+        self.assertEqual(str(snapshot), "100:105:101,103")
+
+    def test_later_snapshots_sort_after(self):
+        snapshots = ["100:105:101,103", "100:105:103", "101:105:103", "101:107:103,105"]
+
+        self.assertEqual(
+            sorted(snapshots, key=lambda text: events.Snapshot(text, 0).order()), snapshots
+        )
+
+    def test_cursors_round_trip(self):
+        cursor = events.render_cursor(events.Snapshot("100:100:", 1700000000.5))
+
+        self.assertEqual(cursor, b"1700000000-100:100:")
+        snapshot = events.parse_cursor(cursor.decode())
+        self.assertEqual((snapshot.taken_at, str(snapshot)), (1700000000, "100:100:"))
+        self.assertIsNone(events.parse_cursor("1042"))
+        self.assertIsNone(events.parse_cursor(None))
+
+
+class LoanEventStreamTest(TransactionTestCase):
+    """Notifications are only sent on commit, so these tests commit for real."""
+
+    def setUp(self):
+        self.addCleanup(events.get_broker().stop)
+
+    def publish(self, count=1, status="PEN"):
+        loans = [create_loan(f"2012345678{i}", status) for i in range(count)]
+        events.publish_created(loans)
+
+        return list(LoanEvent.objects.order_by("id").values_list("id", flat=True))
+
+    async def next_frame(self, stream, timeout=5):
+        return await asyncio.wait_for(anext(stream), timeout)
+
+    async def open_stream(self, position=None, until=None):
+        stream = events.stream(events.parse_cursor(position), until or time.time() + 60)
+        self.assertTrue((await self.next_frame(stream)).startswith(b"retry: "))
+
+        return stream
+
+    async def current_position(self) -> str:
+        stream = await self.open_stream()
+        position = parse_frame(await self.next_frame(stream))["id"]
+        await stream.aclose()
+
+        return position
+
+    async def next_events(self, stream, count) -> list[dict]:
+        return [parse_frame(await self.next_frame(stream)) for _ in range(count)]
+
+    async def test_live_events_reach_every_stream(self):
+        first, second = await self.open_stream(), await self.open_stream()
+        self.assertTrue((await self.next_frame(first)).startswith(b"id: "))
+        self.assertTrue((await self.next_frame(second)).startswith(b"id: "))
+
+        event_id, = await sync_to_async(self.publish)()
+
+        for stream in (first, second):
+            frame = parse_frame(await self.next_frame(stream))
+            self.assertIn("id", frame)
+            self.assertEqual(frame["event"], "loan.created")
+            self.assertEqual(json.loads(frame["data"])["id"], event_id)
+            self.assertEqual(json.loads(frame["data"])["status"], "PEN")
+            await stream.aclose()
+
+        self.assertEqual(events.get_broker()._subscriptions, set())
+
+    async def test_status_changes_carry_the_previous_status(self):
+        stream = await self.open_stream()
+        await self.next_frame(stream)
+        loan = await sync_to_async(create_loan)()
+
+        await sync_to_async(events.publish_status_changes)([(loan.id, "PEN", "APR")])
+
+        frame = parse_frame(await self.next_frame(stream))
+        event = await LoanEvent.objects.aget()
+        self.assertEqual(frame["event"], "loan.status_changed")
+        self.assertEqual(
+            {key: value for key, value in json.loads(frame["data"]).items() if key != "created_at"},
+            {"id": event.id, "loan": loan.id, "status": "APR", "previous_status": "PEN"}
+        )
+        await stream.aclose()
+
+    async def test_resumes_from_the_last_position(self):
+        position = await self.current_position()
+        ids = await sync_to_async(self.publish)(3)
+
+        stream = await self.open_stream(position)
+        frames = await self.next_events(stream, 3)
+        await stream.aclose()
+
+        self.assertEqual([json.loads(frame["data"])["id"] for frame in frames], ids)
+        # The batch's position comes with its last event
+        self.assertEqual(["id" in frame for frame in frames], [False, False, True])
+
+        with self.settings(LOAN_EVENTS_HEARTBEAT=0.05):
+            stream = await self.open_stream(frames[-1]["id"])
+            self.assertEqual(await self.next_frame(stream), b": keep-alive\n\n")
+        await stream.aclose()
+
+    async def test_replays_only_events_committed_after_the_position(self):
+        position = await self.current_position()
+
+        # A transaction takes a smaller id than the next one, but commits after it
+        writer = connections.create_connection(DEFAULT_DB_ALIAS)
+        # Used from worker threads
+        writer.inc_thread_sharing()
+        self.addCleanup(writer.close)
+
+        def write_late_event():
+            writer.set_autocommit(False)
+            with writer.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {LoanEvent._meta.db_table} (loan_id, kind, status, previous_status, created_at) "
+                    "VALUES (1, 'created', 'PEN', '', now()) RETURNING id"
+                )
+                return cursor.fetchone()[0]
+
+        late_id = await sync_to_async(write_late_event, thread_sensitive=False)()
+        stream = await self.open_stream(position)
+        early_id, = await sync_to_async(self.publish)()
+        frame = parse_frame(await self.next_frame(stream))
+        await stream.aclose()
+        self.assertEqual(json.loads(frame["data"])["id"], early_id)
+        self.assertLess(late_id, early_id)
+
+        await sync_to_async(writer.commit, thread_sensitive=False)()
+
+        stream = await self.open_stream(frame["id"])
+        replayed = parse_frame(await self.next_frame(stream))
+        await stream.aclose()
+
+        self.assertEqual(json.loads(replayed["data"])["id"], late_id)
+
+    async def test_resets_clients_too_far_behind(self):
+        position = await self.current_position()
+        await sync_to_async(self.publish)(3)
+
+        with self.settings(LOAN_EVENTS_REPLAY_LIMIT=1):
+            stream = await self.open_stream(position)
+            frame = parse_frame(await self.next_frame(stream))
+        await stream.aclose()
+
+        self.assertEqual(frame["event"], "reset")
+        self.assertIsNotNone(events.parse_cursor(frame["id"]))
+
+    async def test_resets_clients_behind_purged_events(self):
+        position = events.parse_cursor(await self.current_position())
+        position.taken_at -= settings.LOAN_EVENTS_TTL + 1
+
+        stream = await self.open_stream(events.render_cursor(position).decode())
+        frame = parse_frame(await self.next_frame(stream))
+        await stream.aclose()
+
+        self.assertEqual(frame["event"], "reset")
+
+    async def test_sends_keep_alives_and_ends_with_the_token(self):
+        with self.settings(LOAN_EVENTS_HEARTBEAT=0.05):
+            stream = await self.open_stream(until=time.time() + 0.3)
+            frames = [frame async for frame in stream]
+
+        self.assertIn(b": keep-alive\n\n", frames)
+
+    async def test_lost_listener_connection_ends_streams_and_reconnects(self):
+        stream = await self.open_stream()
+        await self.next_frame(stream)
+
+        def terminate_listener():
+            with connection.cursor() as cursor:
+                # The listener's last statement read the snapshot it starts from
+                cursor.execute(
+                    "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE query = %s",
+                    ["SELECT txid_current_snapshot()::text"]
+                )
+                return cursor.rowcount
+
+        self.assertEqual(await sync_to_async(terminate_listener)(), 1)
+
+        with self.assertRaises(StopAsyncIteration):
+            await self.next_frame(stream)
+
+        stream = await self.open_stream()
+        await self.next_frame(stream)
+        event_id, = await sync_to_async(self.publish)()
+        self.assertEqual(json.loads(parse_frame(await self.next_frame(stream))["data"])["id"], event_id)
+        await stream.aclose()
+
+    async def test_slow_streams_are_ended(self):
+        subscription = events.Subscription(asyncio.get_running_loop(), max_pending=2)
+
+        subscription._offer(("s1", ["a", "b"]))
+        subscription._offer(("s2", ["c"]))
+        subscription._offer(("s3", ["d"]))
+
+        queued = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        self.assertEqual(queued, [("s1", ["a", "b"]), None])
+
+
+class LoanEventStreamAPITest(TransactionTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.addCleanup(events.get_broker().stop)
+
+        analyst = User.objects.create_user(username="events_analyst", password="pass1234")
+        analyst.groups.add(Group.objects.get(name="Analyst"))
+        self.analyst_token = str(AccessToken.for_user(analyst))
+        self.client_token = str(AccessToken.for_user(
+            User.objects.create_user(username="events_client", password="pass1234")
+        ))
+        self.url = reverse("admin-loans-events")
+
+    async def get(self, token=None, **headers):
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+
+        return await self.async_client.get(self.url, headers=headers)
+
+    async def test_analysts_get_an_event_stream(self):
+        response = await self.get(self.analyst_token, **{"Last-Event-ID": "0"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertTrue((await anext(response.streaming_content)).startswith(b"retry: "))
+
+    async def test_requires_an_analyst_token(self):
+        response = await self.get()
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+        self.assertEqual((await self.get("not-a-token")).status_code, 401)
+        self.assertEqual((await self.get(self.client_token)).status_code, 403)
+
+    async def stream_token(self, token):
+        return await self.async_client.post(
+            reverse("admin-loans-events-token"), headers={"Authorization": f"Bearer {token}"},
+        )
+
+    async def test_browsers_open_the_stream_with_a_stream_token(self):
+        issued = await self.stream_token(self.analyst_token)
+        self.assertEqual(issued.status_code, 200)
+        self.assertEqual(issued.json()["expires_in"], settings.LOAN_EVENTS_TOKEN_LIFETIME)
+
+        # What an EventSource sends: no Authorization header, everything in the URL
+        response = await self.async_client.get(
+            self.url, {"token": issued.json()["token"], "last_event_id": "0"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertTrue((await anext(response.streaming_content)).startswith(b"retry: "))
+
+    async def test_stream_tokens_are_only_for_analysts(self):
+        self.assertEqual((await self.stream_token(self.client_token)).status_code, 403)
+
+    async def test_rejects_other_tokens_in_the_url(self):
+        expired = await sync_to_async(EventStreamToken.for_access_token)(
+            await User.objects.aget(username="events_analyst"), AccessToken(self.analyst_token),
+        )
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+
+        for token in (self.analyst_token, str(expired), "not-a-token"):
+            with self.subTest(token=token):
+                response = await self.async_client.get(self.url, {"token": token})
+                self.assertEqual(response.status_code, 401)
+
+    def test_requires_asgi(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {self.analyst_token}")
+
+        self.assertEqual(response.status_code, 501)
@@ -0,0 +1,271 @@
+import io
+import json
+import tempfile
+
+from pathlib import Path
+
+from django.contrib.auth.models import User, Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from benchmarks.stub_validator import StubValidator
+from loan import stats
+from loan.cache import get_eligibility_cache
+from loan.circuit import get_circuit_breaker
+from loan.clients import close_session
+from loan.imports import import_loans, read_rows
+from loan.models import LoanRequest, LoanValidationTask
+from loan.services import LoanValidationService
+from user.roles import get_cache
+from unittest.mock import patch
+
+CSV_FILE = (
+    "id_number,full_name,gender,email,amount\n"
+    "20123456780,Juan Pérez,M,juan@example.com,15000\n"
+    "20123456781,Ana Gómez,F,ana@example.com,2500.50\n"
+    "20123456782,Sin Monto,O,sin@example.com,\n"
+    "20123456783,Luis Díaz,X,not-an-email,100\n"
+    "20123456784,Eva Ruiz,F,eva@example.com,300\n"
+)
+
+
+def verdicts_by_last_digit(cuils, use_cache=True):
+    """Even CUILs approved, odd ones rejected, those ending in 4 without a verdict."""
+    return {cuil: None if cuil.endswith("4") else int(cuil[-1]) % 2 == 0 for cuil in cuils}
+
+
+@patch("loan.services.LoanValidationService.check_loan_eligibility_batch",
+       side_effect=verdicts_by_last_digit)
+class LoanImportTest(TestCase):
+
+    def import_csv(self, content, **kwargs):
+        errors = []
+        totals = import_loans(
+            read_rows(io.BytesIO(content.encode()), "csv"),
+            on_error=lambda line, detail: errors.append((line, detail)),
+            **kwargs
+        )
+        return totals, errors
+
+    def test_valid_rows_are_checked_and_inserted(self, check_batch):
+        totals, errors = self.import_csv(CSV_FILE)
+
+        self.assertEqual(totals, {"rows": 5, "created": 3, "invalid": 2, "PEN": 1, "APR": 1, "REJ": 1})
+        self.assertEqual(
+            dict(LoanRequest.objects.values_list("id_number", "status")),
+            {"20123456780": "APR", "20123456781": "REJ", "20123456784": "PEN"}
+        )
+        self.assertEqual(LoanRequest.objects.get(id_number="20123456781").full_name, "Ana Gómez")
+        check_batch.assert_called_once_with(["20123456780", "20123456781", "20123456784"])
+
+        # Loans without a verdict wait for the deferred worker
+        self.assertEqual(
+            list(LoanValidationTask.objects.values_list("loan__id_number", flat=True)), ["20123456784"]
+        )
+        self.assertEqual(stats.differences(), [])
+
+    def test_errors_are_reported_with_line_numbers(self, _):
+        _, errors = self.import_csv(CSV_FILE)
+
+        self.assertEqual([line for line, _ in errors], [4, 5])
+        self.assertIn("amount", errors[0][1])
+        self.assertEqual(set(errors[1][1]), {"gender", "email"})
+
+    def test_chunks_are_checked_and_written_separately(self, check_batch):
+        totals, _ = self.import_csv(CSV_FILE, chunk_size=2)
+
+        self.assertEqual(totals["created"], 3)
+        # Chunks of [0, 1], [2, 3] (both invalid, no call) and [4]
+        self.assertEqual(check_batch.call_count, 2)
+
+    def test_short_and_long_csv_rows(self, _):
+        totals, errors = self.import_csv(
+            "id_number,full_name,gender,email,amount\n"
+            "20123456780,Juan Pérez,M\n"
+            "20123456780,Juan Pérez,M,juan@example.com,15000,extra\n"
+        )
+
+        self.assertEqual(totals["invalid"], 2)
+        self.assertIn("email", errors[0][1])
+        self.assertEqual(errors[1], (3, {"non_field_errors": ["Row has more columns than the header."]}))
+
+    def test_ndjson_rows(self, _):
+        content = "\n".join([
+            json.dumps({"id_number": "20123456780", "full_name": "Juan Pérez", "gender": "M",
+                        "email": "juan@example.com", "amount": 15000}),
+            "",
+            "{not json",
+            "[1, 2]",
+        ]).encode()
+        errors = []
+
+        totals = import_loans(
+            read_rows(io.BytesIO(content), "ndjson"),
+            on_error=lambda line, detail: errors.append((line, detail))
+        )
+
+        self.assertEqual((totals["created"], totals["invalid"]), (1, 2))
+        self.assertEqual(errors, [
+            (3, {"non_field_errors": ["Invalid JSON."]}),
+            (4, {"non_field_errors": ["Expected a JSON object."]}),
+        ])
+
+    def test_lines_that_are_not_utf8_are_reported(self, _):
+        content = (
+            "id_number,full_name,gender,email,amount\n"
+            "20123456780,Juan Pérez,M,juan@example.com,15000\n".encode()
+            + "20123456782,Ana Pérez,F,ana@example.com,2500\n".encode("latin-1")
+            + b"20123456784,Eva Ruiz,F,eva@example.com,300\n"
+        )
+        errors = []
+
+        totals = import_loans(
+            read_rows(io.BytesIO(content), "csv"),
+            on_error=lambda line, detail: errors.append((line, detail))
+        )
+
+        self.assertEqual((totals["created"], totals["invalid"]), (2, 1))
+        self.assertEqual(errors, [(3, {"non_field_errors": ["Line is not valid UTF-8."]})])
+
+    def test_ndjson_lines_that_are_not_utf8_are_reported(self, _):
+        row = {"id_number": "20123456780", "full_name": "Juan Pérez", "gender": "M",
+               "email": "juan@example.com", "amount": 15000}
+        content = json.dumps(row, ensure_ascii=False).encode("latin-1") + b"\n"
+        errors = []
+
+        totals = import_loans(
+            read_rows(io.BytesIO(content), "ndjson"),
+            on_error=lambda line, detail: errors.append((line, detail))
+        )
+
+        self.assertEqual(totals["invalid"], 1)
+        self.assertEqual(errors, [(1, {"non_field_errors": ["Line is not valid UTF-8."]})])
+
+    @override_settings(LOAN_VALIDATION_MODE="deferred")
+    def test_deferred_mode_queues_every_loan(self, check_batch):
+        totals, _ = self.import_csv(CSV_FILE)
+
+        self.assertEqual(totals["PEN"], 3)
+        self.assertEqual(LoanValidationTask.objects.count(), 3)
+        check_batch.assert_not_called()
+
+    def test_command_writes_report(self, _):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "loans.csv"
+            report = Path(directory) / "errors.ndjson"
+            path.write_text(CSV_FILE)
+            out = io.StringIO()
+
+            call_command("import_loans", str(path), "--report", str(report), stdout=out)
+
+            lines = [json.loads(line) for line in report.read_text().splitlines()]
+
+        self.assertIn("Successfully imported 3 of 5 loans", out.getvalue())
+        self.assertEqual([line["line"] for line in lines], [4, 5])
+
+    def test_command_needs_a_known_format(self, _):
+        with self.assertRaises(CommandError):
+            call_command("import_loans", "loans.txt", stdout=io.StringIO())
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class LoanImportWithValidatorTest(TestCase):
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+        close_session()
+        self.addCleanup(close_session)
+        self.addCleanup(setattr, LoanValidationService, "_batch_unsupported_url", None)
+
+    def test_import_uses_batch_endpoint(self):
+        rows = "".join(
+            f"20{i:09d},Test User,M,test@example.com,1000\n" for i in range(250)
+        )
+
+        with StubValidator(batch=True) as validator, \
+                patch.object(LoanValidationService, "API_URL", validator.url), \
+                patch.object(LoanValidationService, "BATCH_API_URL", validator.batch_url):
+            totals = import_loans(read_rows(
+                io.BytesIO(("id_number,full_name,gender,email,amount\n" + rows).encode()), "csv"
+            ))
+
+        self.assertEqual((totals["created"], totals["APR"], totals["REJ"]), (250, 125, 125))
+        # One chunk of 250 CUILs, sent as batches of LOAN_VALIDATION_BATCH_SIZE
+        self.assertEqual(validator.request_count, 3)
+
+
+@patch("loan.services.LoanValidationService.check_loan_eligibility_batch",
+       side_effect=verdicts_by_last_digit)
+class LoanImportAPITest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+        self.url = reverse("admin-loans-bulk-import")
+
+        admin = User.objects.create_user(username="import_admin", password="pass1234")
+        admin.groups.add(Group.objects.get(name="Admin"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}")
+
+    def upload(self, name="loans.csv", content=CSV_FILE, **data):
+        return self.client.post(
+            self.url, {"file": SimpleUploadedFile(name, content.encode()), **data}, format="multipart"
+        )
+
+    def test_import_file(self, _):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [4, 5])
+        self.assertFalse(response.data["errors_truncated"])
+        self.assertEqual(LoanRequest.objects.count(), 3)
+
+    def test_reported_errors_are_capped(self, _):
+        with patch("loan.views.AdminLoanRequestAPIView.MAX_REPORTED_ERRORS", 1):
+            response = self.upload()
+
+        self.assertEqual(response.data["invalid"], 2)
+        self.assertEqual(len(response.data["errors"]), 1)
+        self.assertTrue(response.data["errors_truncated"])
+
+    def test_latin1_file_is_reported_not_failed(self, _):
+        # Small chunks so earlier rows are already saved when the bad line comes
+        with override_settings(LOAN_IMPORT_CHUNK_SIZE=1):
+            response = self.client.post(self.url, {
+                "file": SimpleUploadedFile("loans.csv", CSV_FILE.encode("latin-1"))
+            }, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [error for error in response.data["errors"] if error["line"] in (2, 3)],
+            [{"line": line, "errors": {"non_field_errors": ["Line is not valid UTF-8."]}} for line in (2, 3)]
+        )
+        self.assertEqual(response.data["created"], 1)
+
+    def test_format_from_field_or_extension(self, _):
+        response = self.upload(name="loans.txt")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.upload(name="loans.txt", import_format="csv")
+        self.assertEqual(response.status_code, 201)
+
+    def test_file_is_required(self, _):
+        response = self.client.post(self.url, {}, format="multipart")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_analysts_cannot_import(self, _):
+        analyst = User.objects.create_user(username="import_analyst", password="pass1234")
+        analyst.groups.add(Group.objects.get(name="Analyst"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(analyst)}")
+
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(LoanRequest.objects.exists())
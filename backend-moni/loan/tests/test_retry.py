@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from django.test import TestCase, override_settings
+from unittest.mock import Mock, patch
+
+import requests
+
+from loan.cache import get_eligibility_cache
+from loan.circuit import CircuitOpenError, get_circuit_breaker
+from loan.retry import RetryPolicy, get_retry_policy, is_retryable
+from loan.services import LoanValidationService
+
+
+def make_policy(**kwargs):
+    options = {
+        "attempts": 3,
+        "base_delay": 0.01,
+        "max_delay": 0.05,
+        "deadline": 5,
+    }
+    options.update(kwargs)
+    return RetryPolicy(**options)
+
+
+def http_error(status_code):
+    return requests.HTTPError(response=Mock(status_code=status_code))
+
+
+def failing(*errors, result=True):
+    """A call that raises `errors` one per attempt, then returns `result`."""
+    outcomes = iter(errors)
+
+    def fn(timeout):
+        error = next(outcomes, None)
+        if error is not None:
+            raise error
+        return result
+
+    return fn
+
+
+class RetryPolicyTest(TestCase):
+
+    def test_retries_transient_errors(self):
+        policy = make_policy()
+
+        result = policy.call(failing(requests.ConnectionError("reset"), http_error(503)))
+
+        self.assertTrue(result)
+        self.assertEqual(
+            {key: policy.stats()[key] for key in ("calls", "attempts", "retries", "failures")},
+            {"calls": 1, "attempts": 3, "retries": 2, "failures": 0}
+        )
+
+    def test_gives_up_after_the_last_attempt(self):
+        policy = make_policy()
+        errors = [requests.Timeout(str(i)) for i in range(3)]
+
+        with self.assertRaises(requests.Timeout) as raised:
+            policy.call(failing(*errors))
+
+        self.assertIs(raised.exception, errors[-1])
+        self.assertEqual((policy.stats()["attempts"], policy.stats()["failures"]), (3, 1))
+
+    def test_permanent_errors_are_not_retried(self):
+        for error in [http_error(400), requests.RequestException("bad"), CircuitOpenError(), ValueError()]:
+            policy = make_policy()
+
+            with self.assertRaises(type(error)):
+                policy.call(failing(error))
+
+            self.assertEqual(policy.stats()["attempts"], 1)
+
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(http_error(429)))
+        self.assertTrue(is_retryable(requests.ReadTimeout()))
+        self.assertTrue(is_retryable(TimeoutError()))
+        self.assertFalse(is_retryable(http_error(404)))
+        self.assertFalse(is_retryable(requests.HTTPError()))
+
+    @patch("loan.retry.random.uniform", side_effect=lambda low, high: high)
+    def test_backoff_grows_exponentially_up_to_the_cap(self, _):
+        policy = make_policy(base_delay=0.1, max_delay=0.5)
+
+        self.assertEqual([policy.backoff(attempt) for attempt in range(4)], [0.1, 0.2, 0.4, 0.5])
+
+    @patch("loan.retry.random.uniform", side_effect=lambda low, high: high)
+    def test_no_retry_once_the_wait_would_cross_the_deadline(self, _):
+        policy = make_policy(base_delay=1, max_delay=1, deadline=0.2)
+
+        started = time.monotonic()
+        with self.assertRaises(requests.ConnectionError):
+            policy.call(failing(requests.ConnectionError("reset")))
+
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertEqual((policy.stats()["attempts"], policy.stats()["deadline_exhausted"]), (1, 1))
+
+    @override_settings(LOAN_VALIDATION_CONNECT_TIMEOUT=2, LOAN_VALIDATION_READ_TIMEOUT=5)
+    def test_request_timeouts_are_cut_to_the_deadline(self):
+        timeouts = []
+
+        make_policy(deadline=10).call(timeouts.append)
+        make_policy(deadline=0.5).call(timeouts.append)
+
+        self.assertEqual(timeouts[0], (2, 5))
+        self.assertTrue(all(0 < timeout <= 0.5 for timeout in timeouts[1]))
+
+    def test_hedges_a_call_slower_than_the_quantile(self):
+        policy = make_policy(hedge=True, hedge_min_samples=1)
+        policy.call(failing(result="warm-up"))
+        calls = itertools.count()
+        release = threading.Event()
+
+        def fn(timeout):
+            if next(calls) == 0:
+                release.wait(5)
+                return "primary"
+            return "hedge"
+
+        result = policy.call(fn)
+        release.set()
+
+        self.assertEqual(result, "hedge")
+        self.assertEqual((policy.stats()["hedges"], policy.stats()["hedges_won"]), (1, 1))
+
+    def test_hedging_waits_for_enough_samples(self):
+        policy = make_policy(hedge=True, hedge_min_samples=5)
+
+        for _ in range(4):
+            policy.call(failing())
+        self.assertIsNone(policy.stats()["hedge_delay_ms"])
+
+        policy.call(failing())
+        self.assertIsNotNone(policy.stats()["hedge_delay_ms"])
+        self.assertEqual(policy.stats()["hedges"], 0)
+
+    def test_failed_hedge_falls_back_to_the_primary(self):
+        policy = make_policy(attempts=1, hedge=True, hedge_min_samples=1)
+        policy.call(failing())
+        calls = itertools.count()
+
+        def fn(timeout):
+            if next(calls) == 0:
+                time.sleep(0.2)
+                return "primary"
+            raise CircuitOpenError()
+
+        self.assertEqual(policy.call(fn), "primary")
+        self.assertEqual((policy.stats()["hedges"], policy.stats()["hedges_won"]), (1, 0))
+
+    def test_no_hedge_while_every_worker_is_busy(self):
+        policy = make_policy(hedge=True, hedge_min_samples=1, max_workers=1)
+        policy.call(failing())
+
+        def fn(timeout):
+            time.sleep(0.2)
+            return "primary"
+
+        self.assertEqual(policy.call(fn), "primary")
+        self.assertEqual((policy.stats()["hedges"], policy.stats()["hedges_skipped"]), (0, 1))
+
+    @override_settings(LOAN_VALIDATION_CONNECT_TIMEOUT=2, LOAN_VALIDATION_READ_TIMEOUT=5)
+    def test_pooled_attempt_timeout_is_cut_when_it_starts(self):
+        policy = make_policy(deadline=1, hedge=True, hedge_min_samples=1, max_workers=2)
+        policy.call(failing())
+
+        # One thread, taken for a while, so the attempt waits in the queue
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        executor.submit(time.sleep, 0.4)
+        timeouts = []
+
+        with patch.object(policy, "_get_executor", return_value=executor):
+            policy.call(timeouts.append)
+
+        self.assertTrue(all(timeout < 0.8 for timeout in timeouts[0]))
+
+
+class AsyncRetryPolicyTest(TestCase):
+
+    async def test_retries_transient_errors(self):
+        policy = make_policy()
+        outcomes = iter([TimeoutError(), http_error(502)])
+
+        async def fn(timeout):
+            error = next(outcomes, None)
+            if error is not None:
+                raise error
+            return True
+
+        self.assertTrue(await policy.acall(fn))
+        self.assertEqual(policy.stats()["retries"], 2)
+
+    async def test_hedge_wins_and_cancels_the_slow_request(self):
+        policy = make_policy(hedge=True, hedge_min_samples=1)
+        calls = itertools.count()
+        cancelled = asyncio.Event()
+
+        async def fn(timeout):
+            call = next(calls)
+            if call == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+            return call
+
+        await policy.acall(fn)
+        result = await policy.acall(fn)
+
+        self.assertEqual(result, 2)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(policy.stats()["hedges_won"], 1)
+
+
+class RetryingValidationTest(TestCase):
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+        get_retry_policy().reset()
+
+    @patch("loan.services.get_session")
+    def test_transient_blip_is_not_a_rejection(self, mock_session):
+        approved = Mock(status_code=200)
+        approved.json.return_value = {"status": "approved"}
+        mock_session.return_value.post.side_effect = [requests.ConnectionError("reset"), approved]
+
+        self.assertTrue(LoanValidationService.check_loan_eligibility("20123456789"))
+        self.assertEqual(mock_session.return_value.post.call_count, 2)
+        self.assertEqual(get_retry_policy().stats()["retries"], 1)
+        # Each attempt counts for the breaker
+        self.assertEqual(get_circuit_breaker().stats()["recent_failures"], 1)
+
+    @patch("loan.services.get_session")
+    def test_open_circuit_stops_retries(self, mock_session):
+        breaker = get_circuit_breaker()
+        self.addCleanup(breaker.reset)
+        for _ in range(breaker.min_calls):
+            breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            LoanValidationService.check_loan_eligibility("20123456789")
+
+        mock_session.return_value.post.assert_not_called()
+        self.assertEqual(get_retry_policy().stats()["retries"], 0)
@@ -1,13 +1,30 @@
-from django.test import TestCase
+import asyncio
+import threading
+
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase, override_settings
 from unittest.mock import patch
+from benchmarks.stub_validator import StubValidator
+from loan.cache import get_eligibility_cache
+from loan.circuit import CircuitOpenError, get_circuit_breaker
+from loan.clients import aclose_async_session, close_session, get_async_session, get_session, pool_stats
+from loan.models import ValidationFlight
+from loan.retry import get_retry_policy
 from loan.services import LoanValidationService
+from loan.singleflight import DatabaseFlight, SingleFlight, get_single_flight
 
 from requests import RequestException
 
 class LoanValidationServiceTest(TestCase):
 
-    @patch("loan.services.requests.post")
-    def test_check_loan_eligibility_approved(self, mock_post):
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+
+    @patch("loan.services.get_session")
+    def test_check_loan_eligibility_approved(self, mock_session):
+        mock_post = mock_session.return_value.post
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"status": "approved"}
 
@@ -16,8 +33,9 @@ class LoanValidationServiceTest(TestCase):
         self.assertTrue(result)
         mock_post.assert_called_once()
 
-    @patch("loan.services.requests.post")
-    def test_check_loan_eligibility_rejected(self, mock_post):
+    @patch("loan.services.get_session")
+    def test_check_loan_eligibility_rejected(self, mock_session):
+        mock_post = mock_session.return_value.post
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"status": "rejected"}
 
@@ -25,10 +43,426 @@ class LoanValidationServiceTest(TestCase):
 
         self.assertFalse(result)
 
-    @patch("loan.services.requests.post")
-    def test_check_loan_eligibility_request_fails(self, mock_post):
+    @patch("loan.services.get_session")
+    def test_check_loan_eligibility_request_fails(self, mock_session):
+        mock_post = mock_session.return_value.post
         mock_post.side_effect = RequestException("Request failed")
 
         result = LoanValidationService.check_loan_eligibility("20123456789")
 
         self.assertFalse(result)
+
+    @patch("loan.services.get_session")
+    def test_check_loan_eligibility_can_raise_errors(self, mock_session):
+        mock_session.return_value.post.side_effect = RequestException("Request failed")
+
+        with self.assertRaises(RequestException):
+            LoanValidationService.check_loan_eligibility("20123456789", raise_errors=True)
+
+    @patch("loan.services.get_session")
+    def test_check_loan_eligibility_can_bypass_cache(self, mock_session):
+        mock_post = mock_session.return_value.post
+        mock_post.return_value.json.return_value = {"status": "approved"}
+
+        LoanValidationService.check_loan_eligibility("20123456789")
+        LoanValidationService.check_loan_eligibility("20123456789", use_cache=False)
+
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("loan.services.get_session")
+    def test_check_loan_eligibility_uses_configured_timeouts(self, mock_session):
+        mock_post = mock_session.return_value.post
+        mock_post.return_value.json.return_value = {"status": "approved"}
+
+        with self.settings(LOAN_VALIDATION_CONNECT_TIMEOUT=1, LOAN_VALIDATION_READ_TIMEOUT=3):
+            LoanValidationService.check_loan_eligibility("20123456789")
+
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], (1, 3))
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class PooledSessionTest(TestCase):
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+        close_session()
+        self.addCleanup(close_session)
+
+    def test_session_is_shared(self):
+        self.assertIs(get_session(), get_session())
+
+    def test_session_reuses_connections(self):
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                for user_id_number in ["20123456780", "20123456781", "20123456782"]:
+                    LoanValidationService.check_loan_eligibility(user_id_number)
+
+        self.assertEqual(validator.request_count, 3)
+        self.assertEqual(pool_stats()["sync"], {"connections_opened": 1, "connections_reused": 2})
+
+    @override_settings(LOAN_VALIDATION_POOL_PER_HOST=1)
+    def test_calls_past_the_pool_size_do_not_wait_for_a_connection(self):
+        with StubValidator(latency=0.2) as validator:
+            threads = [
+                threading.Thread(target=get_session().post, args=(validator.url,), kwargs={
+                    "json": {"cuil": f"2012345678{i}"}, "timeout": (1, 1)
+                })
+                for i in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(validator.request_count, 3)
+        self.assertEqual(validator.max_in_flight, 3)
+
+    def test_close_session_drops_pool(self):
+        session = get_session()
+
+        close_session()
+
+        self.assertIsNot(get_session(), session)
+        self.assertEqual(pool_stats()["sync"]["connections_opened"], 0)
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class AsyncLoanValidationServiceTest(TestCase):
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+
+    async def check(self, url, user_id_number):
+        with patch.object(LoanValidationService, "API_URL", url):
+            try:
+                return await LoanValidationService.acheck_loan_eligibility(user_id_number)
+            finally:
+                await aclose_async_session()
+
+    async def test_acheck_loan_eligibility_approved(self):
+        with StubValidator() as validator:
+            result = await self.check(validator.url, "20123456788")
+
+        self.assertTrue(result)
+        self.assertEqual(validator.request_count, 1)
+
+    async def test_async_session_reuses_connections(self):
+        opened = pool_stats()["async"]["connections_opened"]
+
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                for user_id_number in ["20123456780", "20123456781", "20123456782"]:
+                    await LoanValidationService.acheck_loan_eligibility(user_id_number)
+            await aclose_async_session()
+
+        self.assertEqual(pool_stats()["async"]["connections_opened"], opened + 1)
+
+    async def test_acheck_loan_eligibility_rejected(self):
+        with StubValidator() as validator:
+            result = await self.check(validator.url, "20123456789")
+
+        self.assertFalse(result)
+
+    async def test_acheck_loan_eligibility_request_fails(self):
+        with StubValidator() as validator:
+            url = validator.url
+
+        result = await self.check(url, "20123456788")
+
+        self.assertFalse(result)
+
+    async def test_async_session_is_reused(self):
+        self.assertIs(get_async_session(), get_async_session())
+        await aclose_async_session()
+
+
+class SingleFlightTest(TestCase):
+
+    def run_in_threads(self, count, target):
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def run(index):
+            barrier.wait()
+            try:
+                results[index] = target()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "verdict"
+
+        threads = [threading.Thread(target=flight.do, args=("cuil", slow)) for _ in range(10)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while flight.stats()["coalesced"] < 9:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {"in_flight": 0, "leaders": 1, "coalesced": 9})
+
+    def test_waiters_get_the_leader_exception(self):
+        flight = SingleFlight()
+
+        def failing():
+            threading.Event().wait(0.1)
+            raise CircuitOpenError("open")
+
+        results = self.run_in_threads(5, lambda: flight.do("cuil", failing))
+
+        self.assertTrue(all(isinstance(result, CircuitOpenError) for result in results))
+
+    def test_different_keys_do_not_wait_for_each_other(self):
+        flight = SingleFlight()
+
+        self.assertEqual(flight.do("a", lambda: 1), 1)
+        self.assertEqual(flight.do("b", lambda: 2), 2)
+        self.assertEqual(flight.stats()["leaders"], 2)
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class CoalescedValidationTest(TransactionTestCase):
+    """Callers run in threads with their own database connections."""
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+        get_single_flight().reset()
+        close_session()
+        self.addCleanup(close_session)
+
+    def check_in_threads(self, count, check):
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def run(index):
+            barrier.wait()
+            try:
+                results[index] = check()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    @override_settings(LOAN_VALIDATION_SINGLE_FLIGHT="database")
+    def test_parallel_checks_make_one_post(self):
+        with StubValidator(latency=0.3) as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                results = self.check_in_threads(
+                    20, lambda: LoanValidationService.check_loan_eligibility("20123456788", use_cache=False)
+                )
+
+        self.assertEqual(results, [True] * 20)
+        self.assertEqual(validator.request_count, 1)
+        self.assertEqual(get_single_flight().stats()["coalesced"], 19)
+
+    def test_default_process_mode_skips_the_database(self):
+        with StubValidator(latency=0.3) as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                results = self.check_in_threads(
+                    10, lambda: LoanValidationService.check_loan_eligibility("20123456788", use_cache=False)
+                )
+
+        self.assertEqual(results, [True] * 10)
+        self.assertEqual(validator.request_count, 1)
+        self.assertFalse(ValidationFlight.objects.exists())
+
+    @patch("loan.services.LoanValidationService.fetch_loan_eligibility", return_value=True)
+    def test_default_check_runs_no_queries(self, _):
+        with self.assertNumQueries(0):
+            self.assertTrue(LoanValidationService.check_loan_eligibility("20123456788"))
+
+    def test_separate_processes_share_one_post(self):
+        # Calling DatabaseFlight directly skips the in-process group, like callers
+        # in different worker processes; each thread has its own Postgres session
+        def check():
+            return DatabaseFlight().do(
+                "20123456788", lambda: LoanValidationService.fetch_with_breaker("20123456788")
+            )
+
+        with StubValidator(latency=0.3) as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                results = self.check_in_threads(5, check)
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(validator.request_count, 1)
+
+    def test_transactions_share_the_verdict_once_they_commit(self):
+        def check():
+            with transaction.atomic():
+                return DatabaseFlight().do(
+                    "20123456788", lambda: LoanValidationService.fetch_with_breaker("20123456788")
+                )
+
+        with StubValidator(latency=0.3) as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                results = self.check_in_threads(5, check)
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(validator.request_count, 1)
+        self.assertTrue(ValidationFlight.objects.get(id_number="20123456788").is_approved)
+
+    def test_transactions_use_their_own_connection(self):
+        opened = []
+
+        def created(sender, connection, **kwargs):
+            opened.append(connection)
+
+        ValidationFlight.objects.exists()
+        connection_created.connect(created)
+        self.addCleanup(connection_created.disconnect, created)
+
+        with StubValidator() as validator, patch.object(LoanValidationService, "API_URL", validator.url):
+            with transaction.atomic():
+                LoanValidationService.check_loan_eligibility("20123456788")
+
+        self.assertEqual(opened, [])
+
+    def test_later_callers_call_again(self):
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                LoanValidationService.check_loan_eligibility("20123456788", use_cache=False)
+                LoanValidationService.check_loan_eligibility("20123456788", use_cache=False)
+
+        self.assertEqual(validator.request_count, 2)
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class AsyncCoalescedValidationTest(TestCase):
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+
+    async def test_parallel_async_checks_make_one_post(self):
+        with StubValidator(latency=0.2) as validator:
+            with patch.object(LoanValidationService, "API_URL", validator.url):
+                results = await asyncio.gather(*(
+                    LoanValidationService.acheck_loan_eligibility("20123456788") for _ in range(20)
+                ))
+            await aclose_async_session()
+
+        self.assertEqual(results, [True] * 20)
+        self.assertEqual(validator.request_count, 1)
+
+
+@patch.object(LoanValidationService, "API_KEY", "test-key")
+class BatchValidationTest(TestCase):
+
+    def setUp(self):
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+        close_session()
+        self.addCleanup(close_session)
+        self.addCleanup(setattr, LoanValidationService, "_batch_unsupported_url", None)
+
+    def check_batch(self, validator, cuils, batch_url=None, **kwargs):
+        with patch.object(LoanValidationService, "API_URL", validator.url), \
+                patch.object(LoanValidationService, "BATCH_API_URL", batch_url or ""), \
+                patch.object(LoanValidationService, "BATCH_SIZE", 100), \
+                patch.object(LoanValidationService, "BATCH_CONCURRENCY", 4):
+            return LoanValidationService.check_loan_eligibility_batch(cuils, **kwargs)
+
+    def cuils(self, count):
+        return [f"20{i:09d}" for i in range(count)]
+
+    def test_batch_endpoint_sends_many_cuils_per_request(self):
+        cuils = self.cuils(250)
+
+        with StubValidator(batch=True) as validator:
+            verdicts = self.check_batch(validator, cuils, validator.batch_url)
+
+        self.assertEqual(verdicts, {cuil: cuil[-1] in "02468" for cuil in cuils})
+        self.assertEqual(validator.batch_request_count, 3)
+        self.assertEqual(validator.request_count, 3)
+
+    def test_falls_back_to_fan_out_without_batch_endpoint(self):
+        cuils = self.cuils(12)
+
+        with StubValidator(latency=0.05) as validator:
+            verdicts = self.check_batch(validator, cuils, validator.batch_url)
+            # The 404 is remembered; the next batch fans out straight away
+            self.check_batch(validator, self.cuils(13)[12:], validator.batch_url)
+
+        self.assertEqual(verdicts, {cuil: cuil[-1] in "02468" for cuil in cuils})
+        self.assertEqual(validator.request_count, 1 + 12 + 1)
+        self.assertEqual(validator.max_in_flight, 4)
+        self.assertEqual(get_circuit_breaker().stats()["recent_failures"], 0)
+
+    def test_fan_out_when_no_batch_endpoint_is_configured(self):
+        cuils = self.cuils(6)
+
+        with StubValidator(latency=0.05) as validator:
+            verdicts = self.check_batch(validator, cuils)
+
+        self.assertEqual(verdicts, {cuil: cuil[-1] in "02468" for cuil in cuils})
+        self.assertEqual(validator.request_count, 6)
+        self.assertLessEqual(validator.max_in_flight, 4)
+
+    def test_partial_batch_failures_are_retried_one_by_one(self):
+        cuils = self.cuils(5)
+
+        with StubValidator(batch=True, failing=cuils[:2]) as validator:
+            verdicts = self.check_batch(validator, cuils, validator.batch_url)
+
+        # The two failures are retried individually (503s with backoff) and still fail
+        self.assertEqual(verdicts, {
+            cuils[0]: None,
+            cuils[1]: None,
+            **{cuil: cuil[-1] in "02468" for cuil in cuils[2:]},
+        })
+        self.assertEqual(validator.batch_request_count, 1)
+        self.assertEqual(validator.request_count, 1 + 2 * get_retry_policy().attempts)
+
+    def test_failed_batch_request_fans_out(self):
+        cuils = self.cuils(3)
+
+        with StubValidator() as validator:
+            with patch.object(LoanValidationService, "fetch_loan_eligibility_batch",
+                              side_effect=RequestException("down")):
+                verdicts = self.check_batch(validator, cuils, validator.batch_url)
+
+        self.assertEqual(verdicts, {cuil: cuil[-1] in "02468" for cuil in cuils})
+        self.assertEqual(validator.request_count, 3)
+
+    def test_cached_and_duplicate_cuils_are_sent_once(self):
+        cuils = self.cuils(3)
+        get_eligibility_cache().set(cuils[0], False)
+
+        with StubValidator(batch=True) as validator:
+            verdicts = self.check_batch(validator, [*cuils, cuils[1]], validator.batch_url)
+
+        self.assertEqual(list(verdicts), cuils)
+        self.assertFalse(verdicts[cuils[0]])
+        self.assertEqual(validator.request_count, 1)
+        self.assertIsNotNone(get_eligibility_cache().get(cuils[2]))
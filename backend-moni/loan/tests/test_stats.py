@@ -0,0 +1,231 @@
+import io
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User, Group
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from loan import stats
+from loan.models import LoanDailyStats, LoanRequest, LoanValidationTask
+from user.roles import get_cache
+from unittest.mock import patch
+
+
+def loan_payload(id_number, amount=15000):
+    return {
+        "id_number": id_number,
+        "full_name": "Juan Pérez",
+        "gender": "M",
+        "email": "juan@example.com",
+        "amount": amount
+    }
+
+
+class LoanStatsTrackingTest(TestCase):
+    """Every write path must leave LoanDailyStats equal to a GROUP BY over the loans."""
+
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+
+        admin = User.objects.create_user(username="stats_admin", password="pass1234")
+        admin.groups.add(Group.objects.get(name="Admin"))
+        self.admin_token = str(AccessToken.for_user(admin))
+
+    def admin_client(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+        return self.client
+
+    def create_loans(self, *statuses):
+        """Loans written straight to the table, then counted by a rebuild."""
+        loans = [
+            LoanRequest.objects.create(
+                id_number=f"2012345678{i}",
+                full_name="Test User",
+                gender="M",
+                email="test@example.com",
+                amount=10000 + i,
+                status=loan_status
+            )
+            for i, loan_status in enumerate(statuses)
+        ]
+        stats.rebuild()
+        return loans
+
+    def assertStatsMatchLoans(self):
+        self.assertEqual(stats.differences(), [])
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility",
+           side_effect=lambda id_number: id_number.endswith("0"))
+    def test_sync_intake(self, _):
+        self.client.post(reverse("loan-requests"), loan_payload("20123456780"), format="json")
+        self.client.post(reverse("loan-requests"), loan_payload("20123456781", 2500.5), format="json")
+
+        self.assertStatsMatchLoans()
+        row = LoanDailyStats.objects.get(status="REJ")
+        self.assertEqual((row.count, row.amount), (1, Decimal("2500.50")))
+
+    @override_settings(LOAN_VALIDATION_MODE="deferred")
+    def test_deferred_intake_and_worker(self):
+        self.client.post(reverse("loan-requests"), loan_payload("20123456780"), format="json")
+        self.client.post(reverse("loan-requests"), loan_payload("20123456781"), format="json")
+        self.assertStatsMatchLoans()
+
+        with patch("loan.services.LoanValidationService.check_loan_eligibility",
+                   side_effect=lambda id_number, **kwargs: id_number.endswith("0")):
+            call_command("validate_loans", "--once", stdout=io.StringIO())
+
+        self.assertStatsMatchLoans()
+        self.assertFalse(LoanDailyStats.objects.filter(status="PEN", count__gt=0).exists())
+
+    def test_worker_ignores_loans_decided_meanwhile(self):
+        loan, = self.create_loans("REJ")
+        LoanValidationTask.objects.create(loan=loan)
+
+        with patch("loan.services.LoanValidationService.check_loan_eligibility", return_value=True):
+            call_command("validate_loans", "--once", stdout=io.StringIO())
+
+        self.assertStatsMatchLoans()
+
+    def test_approve_and_reject(self):
+        first, second = self.create_loans("PEN", "PEN")
+
+        self.admin_client().post(reverse("admin-loans-approve-loan", args=[first.id]))
+        self.admin_client().post(reverse("admin-loans-reject-loan", args=[second.id]))
+        self.admin_client().post(reverse("admin-loans-approve-loan", args=[second.id]))
+
+        self.assertStatsMatchLoans()
+
+    def test_bulk_decision(self):
+        self.create_loans("PEN", "PEN", "APR", "REJ")
+
+        self.admin_client().post(
+            reverse("admin-loans-bulk-decide"), {"decision": "reject", "status": "PEN"}, format="json"
+        )
+
+        self.assertStatsMatchLoans()
+
+    def test_update_and_destroy(self):
+        first, second = self.create_loans("APR", "PEN")
+
+        self.admin_client().patch(
+            reverse("admin-loans-detail", args=[first.id]), {"amount": 99999}, format="json"
+        )
+        self.admin_client().delete(reverse("admin-loans-detail", args=[second.id]))
+
+        self.assertStatsMatchLoans()
+
+    @patch("loan.services.LoanValidationService.check_loan_eligibility",
+           side_effect=lambda id_number, **kwargs: id_number.endswith("0"))
+    def test_revalidate(self, _):
+        self.create_loans("PEN", "PEN", "APR")
+
+        call_command("revalidate_loans", "--status", "PEN", "APR", "--rate", "0", stdout=io.StringIO())
+
+        self.assertStatsMatchLoans()
+
+    def test_track_groups_by_creation_day(self):
+        now = timezone.now()
+        stats.track(added=[
+            (now, "APR", Decimal("100.00")),
+            (now, "APR", Decimal("50.00")),
+            (now - timedelta(days=1), "APR", Decimal("10.00")),
+        ])
+        stats.track(added=[(now, "REJ", Decimal("100.00"))], removed=[(now, "APR", Decimal("100.00"))])
+
+        rows = set(LoanDailyStats.objects.values_list("day", "status", "count", "amount"))
+        today = timezone.localdate(now)
+        self.assertEqual(rows, {
+            (today, "APR", 1, Decimal("50.00")),
+            (today, "REJ", 1, Decimal("100.00")),
+            (today - timedelta(days=1), "APR", 1, Decimal("10.00")),
+        })
+
+    def test_track_bumps_versions_when_changes_cancel_out(self):
+        now = timezone.now()
+        stats.track(added=[(now, "APR", Decimal("100.00"))])
+        before = stats.changes("APR")
+
+        stats.track(added=[(now, "APR", Decimal("100.00"))], removed=[(now, "APR", Decimal("100.00"))])
+
+        self.assertNotEqual(stats.changes("APR"), before)
+        self.assertEqual(stats.changes("REJ"), (0, 0))
+        self.assertEqual(LoanDailyStats.objects.get().count, 1)
+
+    def test_rebuild_command_and_check(self):
+        self.create_loans("PEN", "APR", "APR")
+        LoanDailyStats.objects.filter(status="APR").update(count=5)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_loan_stats", "--check", stdout=io.StringIO())
+
+        call_command("rebuild_loan_stats", stdout=io.StringIO())
+
+        call_command("rebuild_loan_stats", "--check", stdout=io.StringIO())
+        self.assertEqual(LoanDailyStats.objects.get(status="APR").count, 2)
+
+
+class LoanSummaryAPITest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+        self.url = reverse("admin-loans-summary")
+
+        analyst = User.objects.create_user(username="stats_analyst", password="pass1234")
+        analyst.groups.add(Group.objects.get(name="Analyst"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(analyst)}")
+
+        # The summary only reads the stats table
+        LoanDailyStats.objects.bulk_create([
+            LoanDailyStats(day=date(2025, 1, 1), status="APR", count=3, amount=Decimal("300.00")),
+            LoanDailyStats(day=date(2025, 1, 1), status="REJ", count=1, amount=Decimal("50.50")),
+            LoanDailyStats(day=date(2025, 1, 2), status="PEN", count=2, amount=Decimal("20.00")),
+            LoanDailyStats(day=date(2025, 1, 2), status="REJ", count=0, amount=Decimal("0.00")),
+        ])
+
+    def test_summary_totals(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            "count": 6,
+            "amount": "370.50",
+            "by_status": {
+                "PEN": {"count": 2, "amount": "20.00"},
+                "APR": {"count": 3, "amount": "300.00"},
+                "REJ": {"count": 1, "amount": "50.50"},
+            },
+            "approval_rate": 0.75,
+            "daily": [
+                {"day": "2025-01-01", "PEN": 0, "APR": 3, "REJ": 1},
+                {"day": "2025-01-02", "PEN": 2, "APR": 0, "REJ": 0},
+            ],
+        })
+
+    def test_summary_date_range(self):
+        response = self.client.get(self.url, {"date_from": "2025-01-02", "date_to": "2025-01-31"})
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertIsNone(response.data["approval_rate"])
+        self.assertEqual([row["day"] for row in response.data["daily"]], ["2025-01-02"])
+
+    def test_summary_rejects_bad_dates(self):
+        response = self.client.get(self.url, {"date_from": "2025-02-01", "date_to": "2025-01-01"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.url, {"date_from": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_summary_requires_authentication(self):
+        self.client.credentials()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 401)
@@ -1,6 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LoanRequestAPIView, AdminLoanRequestAPIView
+from .views import (
+    LoanRequestAPIView,
+    AsyncLoanRequestAPIView,
+    AdminLoanRequestAPIView,
+    LoanEventStreamAPIView,
+    LoanEventTokenAPIView,
+    ValidatorStatsAPIView,
+)
 
 
 admin_router = DefaultRouter()
@@ -9,7 +16,12 @@ admin_router.register(r'loans', AdminLoanRequestAPIView, basename='admin-loans')
 
 urlpatterns = [
     path('loan-requests/', LoanRequestAPIView.as_view(), name='loan-requests'),
+    path('loan-requests/async/', AsyncLoanRequestAPIView.as_view(), name='loan-requests-async'),
 
     # Admin endpoints
+    path("admin/validator/stats/", ValidatorStatsAPIView.as_view(), name="admin-validator-stats"),
+    # Before the router, whose detail route would take "events" for a loan id
+    path("admin/loans/events/", LoanEventStreamAPIView.as_view(), name="admin-loans-events"),
+    path("admin/loans/events/token/", LoanEventTokenAPIView.as_view(), name="admin-loans-events-token"),
     path("admin/", include(admin_router.urls) ) 
 ]
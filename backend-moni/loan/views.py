@@ -1,31 +1,109 @@
+import hashlib
+import io
+
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 
 
+from asgiref.sync import sync_to_async
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from main.permissions import IsAnalystOrAdmin
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from main.authentication import EventStreamToken, TimedJWTAuthentication
+from main.permissions import IsAdmin, IsAnalyst, IsAnalystOrAdmin
+from user.roles import user_in_group
 
-from .models import LoanRequest
-from .serializers import LoanRequestSerializer
+from . import events, stats
+from .cache import get_eligibility_cache
+from .circuit import CircuitOpenError, get_circuit_breaker
+from .clients import pool_stats
+from .export import CHUNK_SIZE, CONTENT_TYPES, EXPORT_FIELDS, async_chunks, csv_chunks, ndjson_chunks
+from .filters import LoanSearchFilter
+from .idempotency import MAX_KEY_LENGTH, IdempotencyKeyReused, run_once
+from .imports import IMPORT_FORMATS, detect_format, import_loans, read_rows
+from .models import LoanRequest, LoanValidationTask
+from .pagination import LoanCursorPagination, LoanPageNumberPagination
+from .queue import decide_all_pending, save_decided_loan, save_pending_loan
+from .retry import get_retry_policy
+from .serializers import (
+    BulkLoanDecisionSerializer,
+    LoanRequestSerializer,
+    LoanSummaryQuerySerializer,
+    ValuesRepresentation,
+)
 from .services import LoanValidationService
+from .singleflight import get_single_flight
 
 
 class LoanRequestAPIView(APIView):
-    """API for creating a loan requests."""
+    """API for creating a loan requests.
+
+    Send an `Idempotency-Key` header to make retries safe: the first response
+    is stored and replayed for LOAN_IDEMPOTENCY_TTL seconds.
+    """
 
     def post(self, request, *args, **kwargs):
-        serializer = LoanRequestSerializer(data=request.data)
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return self.create_loan(request.data)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            status_code, data, replayed = run_once(key, request.data, lambda: self.create_loan(request.data))
+        except IdempotencyKeyReused:
+            return Response(
+                {"detail": "Idempotency-Key was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        response = Response(data, status=status_code)
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+
+        return response
+
+    def create_loan(self, data):
+        serializer = LoanRequestSerializer(data=data)
         if serializer.is_valid():
+            if settings.LOAN_VALIDATION_MODE == "deferred":
+                loan_request = save_pending_loan(serializer)
+
+                return Response(LoanRequestSerializer(loan_request).data, status=status.HTTP_202_ACCEPTED)
+
             user_id_number = serializer.validated_data["id_number"]
 
-            is_approved = LoanValidationService.check_loan_eligibility(
-                user_id_number
-            )
+            try:
+                is_approved = LoanValidationService.check_loan_eligibility(
+                    user_id_number
+                )
+
+            except CircuitOpenError:
+                # Validator is down; queue the loan for re-validation instead of rejecting it
+                loan_request = save_pending_loan(serializer)
+
+                return Response(LoanRequestSerializer(loan_request).data, status=status.HTTP_201_CREATED)
 
             status_choice = (
                 LoanRequest.StatusChoices.APPROVED
@@ -33,40 +111,447 @@ class LoanRequestAPIView(APIView):
                 LoanRequest.StatusChoices.REJECTED
             )
 
-            loan_request = serializer.save(status=status_choice)
+            loan_request = save_decided_loan(serializer, status_choice)
 
             return Response(LoanRequestSerializer(loan_request).data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncLoanRequestAPIView(View):
+    """Async API for creating a loan requests, served through ASGI."""
+
+    http_method_names = ["post"]
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            # The first configured parser is the JSON one, stdlib or orjson
+            data = api_settings.DEFAULT_PARSER_CLASSES[0]().parse(io.BytesIO(request.body or b"{}"))
+        except ParseError:
+            return self.render({"detail": "JSON parse error."}, status.HTTP_400_BAD_REQUEST)
+
+        serializer = LoanRequestSerializer(data=data)
+        if serializer.is_valid():
+            if settings.LOAN_VALIDATION_MODE == "deferred":
+                loan_request = await sync_to_async(save_pending_loan)(serializer)
+
+                return self.render(LoanRequestSerializer(loan_request).data, status.HTTP_202_ACCEPTED)
+
+            user_id_number = serializer.validated_data["id_number"]
+
+            try:
+                is_approved = await LoanValidationService.acheck_loan_eligibility(
+                    user_id_number
+                )
+
+            except CircuitOpenError:
+                # Validator is down; queue the loan for re-validation instead of rejecting it
+                loan_request = await sync_to_async(save_pending_loan)(serializer)
+
+                return self.render(LoanRequestSerializer(loan_request).data, status.HTTP_201_CREATED)
+
+            status_choice = (
+                LoanRequest.StatusChoices.APPROVED
+                if is_approved else
+                LoanRequest.StatusChoices.REJECTED
+            )
+
+            loan_request = await sync_to_async(save_decided_loan)(serializer, status_choice)
+
+            return self.render(LoanRequestSerializer(loan_request).data, status.HTTP_201_CREATED)
+
+        return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    def render(self, data, status_code):
+        # The first configured renderer is the JSON one, stdlib or orjson
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+        return HttpResponse(
+            renderer.render(data),
+            status=status_code,
+            content_type="application/json"
+        )
+
+
+class LoanEventStreamAPIView(View):
+    """Server-sent events for loan creations and status changes, for Analysts and Admins.
+
+    Served through ASGI only. Authenticate with an `Authorization: Bearer`
+    header, or, from a browser's EventSource, with `?token=` from
+    LoanEventTokenAPIView; the stream ends when the access token expires.
+    Reconnecting clients send `Last-Event-ID` (or `?last_event_id=`) to get
+    the events they missed.
+    """
+
+    http_method_names = ["get"]
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return self.render(
+                {"detail": "The event stream is only served through ASGI."},
+                status.HTTP_501_NOT_IMPLEMENTED
+            )
+
+        status_code, until = await sync_to_async(self.authenticate)(request)
+        if until is None:
+            response = self.render(
+                {"detail": "Authentication credentials were not provided or are invalid."}
+                if status_code == status.HTTP_401_UNAUTHORIZED else
+                {"detail": "You do not have permission to perform this action."},
+                status_code
+            )
+            if status_code == status.HTTP_401_UNAUTHORIZED:
+                response["WWW-Authenticate"] = TimedJWTAuthentication().authenticate_header(request)
+            return response
+
+        position = events.parse_cursor(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id"))
+
+        response = StreamingHttpResponse(
+            events.stream(position, until=until),
+            content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Proxies such as nginx would otherwise buffer the stream
+        response["X-Accel-Buffering"] = "no"
+
+        return response
+
+    def authenticate(self, request):
+        """Returns (status code, expiry timestamp); the expiry only for Analysts and Admins."""
+        authentication = TimedJWTAuthentication()
+        try:
+            if "token" in request.GET:
+                token = EventStreamToken(request.GET["token"])
+                result = authentication.get_user(token), token
+                until = token["stream_until"]
+            else:
+                result = authentication.authenticate(Request(request))
+                until = result[1]["exp"] if result is not None else None
+        except (AuthenticationFailed, TokenError, KeyError):
+            result = None
+
+        if result is None:
+            return status.HTTP_401_UNAUTHORIZED, None
+
+        user, _ = result
+        if not user_in_group(user, "Analyst", "Admin"):
+            return status.HTTP_403_FORBIDDEN, None
+
+        return status.HTTP_200_OK, until
+
+    def render(self, data, status_code):
+        return HttpResponse(
+            api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data),
+            status=status_code,
+            content_type="application/json"
+        )
+
+
+class LoanEventTokenAPIView(APIView):
+    """Issues a short-lived token for opening the loan event stream with `?token=`."""
+
+    authentication_classes = [TimedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAnalyst]
+
+    def post(self, request, *args, **kwargs):
+        token = EventStreamToken.for_access_token(request.user, request.auth)
+
+        return Response({"token": str(token), "expires_in": settings.LOAN_EVENTS_TOKEN_LIFETIME})
+
+
+class ValidatorStatsAPIView(APIView):
+    """Admin API exposing this worker's validator pool, cache, circuit and retry statistics."""
+
+    authentication_classes = [TimedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "pool": pool_stats(),
+            "cache": get_eligibility_cache().stats(),
+            "circuit": get_circuit_breaker().stats(),
+            "single_flight": get_single_flight().stats(),
+            "retry": get_retry_policy().stats(),
+        })
+
+
 class AdminLoanRequestAPIView(viewsets.ModelViewSet):
     """Admin API for managing loan requests"""
 
     queryset = LoanRequest.objects.all().order_by("-id")
     serializer_class = LoanRequestSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TimedJWTAuthentication]
     permission_classes = [IsAuthenticated, IsAnalystOrAdmin]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, LoanSearchFilter]
     filterset_fields = ["status"]
+    # Substrings of the name or email, or the start of the id number; see the indexes on LoanRequest
+    search_fields = ["full_name", "email", "^id_number"]
+    pagination_class = LoanPageNumberPagination
+
+    # Actions that read a loan before changing it, so the stats see the old values
+    LOCKING_ACTIONS = ["approve_loan", "reject_loan", "update", "partial_update", "destroy"]
+
+    # Invalid rows listed in an import response; the import command reports them all
+    MAX_REPORTED_ERRORS = 1000
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.LOCKING_ACTIONS:
+            queryset = queryset.select_for_update()
+
+        return queryset
+
+    @property
+    def paginator(self):
+        """`?pagination=cursor` switches to keyset pagination; page numbers stay the default."""
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("pagination") == "cursor":
+                self._paginator = LoanCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+
+        return self._paginator
+
+    # Renders list pages like serializer_class, without building instances
+    list_representation = ValuesRepresentation(LoanRequestSerializer)
+
+    def list(self, request, *args, **kwargs):
+        """Lists loans from `values()` rows; the JSON is the same as the serializer's.
+
+        The ETag changes with every write to loans in the `status` filter (or to
+        any loan), so polling clients get a 304 without the loans being read.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.list_representation.field_names)
+        # The ETag covers every loan in the status filter, so it holds for any search within it
+        etag = self.make_etag(*stats.changes(request.query_params.get("status") or None))
+
+        def build():
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.list_representation.to_representation(page))
+
+            return Response(self.list_representation.to_representation(queryset))
+
+        return self.conditional_response(build, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Loan detail, with an ETag and Last-Modified taken from `updated_at`."""
+        instance = self.get_object()
+
+        return self.conditional_response(
+            lambda: Response(self.get_serializer(instance).data),
+            self.make_etag(instance.pk, instance.updated_at),
+            instance.updated_at
+        )
+
+    def make_etag(self, *parts) -> str:
+        """A weak ETag for `parts` rendered with the negotiated renderer."""
+        key = repr((self.request.accepted_renderer.format, *parts))
+
+        return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+    def conditional_response(self, build, etag: str, last_modified=None):
+        """Answers `If-None-Match` / `If-Modified-Since` with a 304, or returns `build()`."""
+        last_modified = last_modified and int(last_modified.timestamp())
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = build()
+
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        # Clients may keep the response, but must check it is current before using it
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
 
     def create(self, *args, **kwargs):
         return Response(
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        old = stats.loan_key(serializer.instance)
+        old_status = serializer.instance.status
+        loan = serializer.save()
+        stats.track(added=[stats.loan_key(loan)], removed=[old])
+        events.publish_status_changes([(loan.pk, old_status, loan.status)])
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        old = stats.loan_key(instance)
+        instance.delete()
+        stats.track(removed=[old])
+
     @action(detail=True, methods=["post"], url_path="approve")
     def approve_loan(self, request, pk=None):
-        loan = self.get_object()
-        loan.status = LoanRequest.StatusChoices.APPROVED
-        loan.save()
+        self.decide(LoanRequest.StatusChoices.APPROVED)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=["post"], url_path="reject")
     def reject_loan(self, request, pk=None):
-        loan = self.get_object()
-        loan.status = LoanRequest.StatusChoices.REJECTED
-        loan.save()
+        self.decide(LoanRequest.StatusChoices.REJECTED)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def decide(self, new_status: str):
+        with transaction.atomic():
+            loan = self.get_object()
+            old = stats.loan_key(loan)
+            old_status = loan.status
+
+            loan.status = new_status
+            loan.save(update_fields=["status", "updated_at"])
+            stats.track(added=[stats.loan_key(loan)], removed=[old])
+            events.publish_status_changes([(loan.pk, old_status, new_status)])
+
+    @action(detail=False, methods=["get"], url_path="summary")
+    def summary(self, request):
+        """Loan totals per status, approval rate and a daily series.
+
+        Read from LoanDailyStats instead of aggregating the loans table;
+        `?date_from=` and `?date_to=` (YYYY-MM-DD) bound the creation day.
+        """
+        serializer = LoanSummaryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(stats.summarize(**serializer.validated_data))
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Streams every loan matching the list filters as CSV or NDJSON.
+
+        `?export_format=csv|ndjson` picks the format; `?format=` is taken by DRF.
+        Rows come from a server-side cursor as tuples, so memory stays flat.
+        """
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in CONTENT_TYPES:
+            return Response(
+                {"export_format": [f"Must be one of: {', '.join(CONTENT_TYPES)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        chunks = (csv_chunks if export_format == "csv" else ndjson_chunks)(rows, CHUNK_SIZE)
+
+        if isinstance(request._request, ASGIRequest):
+            chunks = async_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[export_format])
+        response["Content-Disposition"] = f'attachment; filename="loans.{export_format}"'
+
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """Creates loans from an uploaded CSV or NDJSON `file`.
+
+        The format comes from `import_format` or the file extension. Rows are
+        read from the upload as a stream and imported in chunks of
+        LOAN_IMPORT_CHUNK_SIZE; the first MAX_REPORTED_ERRORS invalid rows are
+        reported with their line numbers.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        import_format = request.data.get("import_format") or detect_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            return Response(
+                {"import_format": [f"Must be one of: {', '.join(IMPORT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        errors = []
+
+        def report(line_number, detail):
+            if len(errors) < self.MAX_REPORTED_ERRORS:
+                errors.append({"line": line_number, "errors": detail})
+
+        totals = import_loans(read_rows(upload, import_format), on_error=report)
+
+        return Response(
+            {**totals, "errors": errors, "errors_truncated": totals["invalid"] > len(errors)},
+            status=status.HTTP_201_CREATED if totals["created"] else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_decide(self, request):
+        """Approves or rejects many pending loans with a single UPDATE.
+
+        Loans are chosen by `ids`, `status` or both. Only pending loans change.
+        With `ids`, every other id is reported as skipped with its current
+        status, or as not found; a `status` alone can match any number of
+        loans, so only the counts are returned.
+        """
+        serializer = BulkLoanDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        new_status = (
+            LoanRequest.StatusChoices.APPROVED
+            if serializer.validated_data["decision"] == "approve" else
+            LoanRequest.StatusChoices.REJECTED
+        )
+        ids = serializer.validated_data.get("ids")
+        selected_status = serializer.validated_data.get("status")
+
+        if ids is None:
+            if selected_status != LoanRequest.StatusChoices.PENDING:
+                skipped = LoanRequest.objects.filter(status=selected_status).count()
+                return Response({"updated": 0, "skipped": skipped})
+
+            return Response({"updated": decide_all_pending(new_status), "skipped": 0})
+
+        with transaction.atomic():
+            # Lock the matches so the outcomes reported are the ones applied
+            rows = list(
+                LoanRequest.objects.filter(pk__in=ids).select_for_update().order_by("pk")
+                .values_list("pk", "status", "created_at", "amount")
+            )
+            current = {pk: loan_status for pk, loan_status, _, _ in rows}
+            decided = [
+                (pk, created_at, amount) for pk, loan_status, created_at, amount in rows
+                if loan_status == LoanRequest.StatusChoices.PENDING
+                and selected_status in (None, LoanRequest.StatusChoices.PENDING)
+            ]
+            pending = [pk for pk, _, _ in decided]
+
+            updated = LoanRequest.objects.filter(
+                pk__in=pending,
+                status=LoanRequest.StatusChoices.PENDING
+            ).update(status=new_status, updated_at=timezone.now())
+
+            stats.track(
+                added=[(created_at, new_status, amount) for _, created_at, amount in decided],
+                removed=[(created_at, LoanRequest.StatusChoices.PENDING, amount) for _, created_at, amount in decided]
+            )
+            events.publish_status_changes([(pk, LoanRequest.StatusChoices.PENDING, new_status) for pk in pending])
+
+            # Decided loans no longer need the deferred validation worker
+            LoanValidationTask.objects.filter(loan_id__in=pending).delete()
+
+        pending = set(pending)
+        results = []
+        for pk in dict.fromkeys(ids):
+            if pk not in current:
+                results.append({"id": pk, "outcome": "not_found"})
+            elif pk in pending:
+                results.append({"id": pk, "outcome": "updated", "status": new_status})
+            else:
+                results.append({"id": pk, "outcome": "skipped", "status": current[pk]})
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response({"updated": updated, "results": results})
\ No newline at end of file
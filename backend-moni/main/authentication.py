@@ -0,0 +1,39 @@
+import time
+
+from datetime import timedelta
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import Token
+
+from .timing import record
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reports its time (token check and user lookup) to the request timings."""
+
+    def authenticate(self, request):
+        started = time.perf_counter()
+        try:
+            return super().authenticate(request)
+        finally:
+            record("auth", time.perf_counter() - started)
+
+
+class EventStreamToken(Token):
+    """Opens the loan event stream from a URL, for browsers' EventSource, which can't send headers.
+
+    It is only good for opening the stream, within LOAN_EVENTS_TOKEN_LIFETIME
+    seconds, since URLs end up in logs; the stream itself runs until the
+    access token it was issued for (`stream_until`) expires.
+    """
+
+    token_type = "event_stream"
+    lifetime = timedelta(seconds=settings.LOAN_EVENTS_TOKEN_LIFETIME)
+
+    @classmethod
+    def for_access_token(cls, user, access_token) -> "EventStreamToken":
+        token = cls.for_user(user)
+        token["stream_until"] = access_token["exp"]
+
+        return token
@@ -1,14 +1,30 @@
 from rest_framework.permissions import BasePermission
 
+from user.roles import user_in_group
+
 
 class IsAnalystOrAdmin(BasePermission):
-    """Allow Analysts to list and retrieve, but only Admins to update."""
+    """Allow Analysts to list, retrieve, export and summarize, but only Admins to update."""
 
     def has_permission(self, request, view):
-        if view.action in ["list", "retrieve"]:
-            return request.user.groups.filter(name="Analyst").exists() or request.user.groups.filter(name="Admin").exists()
+        if view.action in ["list", "retrieve", "export", "summary"]:
+            return user_in_group(request.user, "Analyst", "Admin")
 
-        if not view.action in ["list", "retrieve"]:
-            return request.user.groups.filter(name="Admin").exists()
+        if not view.action in ["list", "retrieve", "export", "summary"]:
+            return user_in_group(request.user, "Admin")
 
         return False
+
+
+class IsAdmin(BasePermission):
+    """Allow only Admins."""
+
+    def has_permission(self, request, view):
+        return user_in_group(request.user, "Admin")
+
+
+class IsAnalyst(BasePermission):
+    """Allow Analysts and Admins, whatever the action."""
+
+    def has_permission(self, request, view):
+        return user_in_group(request.user, "Analyst", "Admin")
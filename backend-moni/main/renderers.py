@@ -0,0 +1,43 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson, producing the same bytes as DRF's.
+
+    Values orjson would format differently from DRF's encoder (Decimal,
+    datetimes, dataclasses, lazy strings, sets) go through that encoder.
+    Falls back to JSONRenderer when orjson isn't installed, for indented
+    output (the browsable API) and for anything orjson can't encode, such as
+    integers beyond 64 bits. Two differences remain: floats below 1e-4 or from
+    1e16 up are written as 1e-5 rather than 1e-05, and NaN and Infinity render
+    as null instead of raising. The API's own floats are rounded rates.
+    """
+
+    OPTIONS = (
+        (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.OPTIONS)
+        except orjson.JSONEncodeError:
+            # Re-encodes with the stdlib, which either copes or raises DRF's usual error
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, so the output stays a strict JavaScript subset
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
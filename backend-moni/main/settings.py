@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 from datetime import timedelta
 
@@ -24,6 +25,81 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 
 LOAN_VALIDATION_API_KEY = os.getenv("LOAN_VALIDATION_API_KEY")
 LOAN_VALIDATION_API_URL = os.getenv("LOAN_VALIDATION_API_URL")
+# "sync" validates during the request, "deferred" queues it for `manage.py validate_loans`
+LOAN_VALIDATION_MODE = os.getenv("LOAN_VALIDATION_MODE", "sync")
+LOAN_VALIDATION_POOL_SIZE = int(os.getenv("LOAN_VALIDATION_POOL_SIZE", 10))
+LOAN_VALIDATION_POOL_PER_HOST = int(os.getenv("LOAN_VALIDATION_POOL_PER_HOST", 10))
+LOAN_VALIDATION_CONNECT_TIMEOUT = float(os.getenv("LOAN_VALIDATION_CONNECT_TIMEOUT", 2))
+LOAN_VALIDATION_READ_TIMEOUT = float(os.getenv("LOAN_VALIDATION_READ_TIMEOUT", 5))
+# Bulk checks: CUILs per request to the batch endpoint (if any), and calls in flight
+LOAN_VALIDATION_BATCH_API_URL = os.getenv("LOAN_VALIDATION_BATCH_API_URL", "")
+LOAN_VALIDATION_BATCH_SIZE = int(os.getenv("LOAN_VALIDATION_BATCH_SIZE", 100))
+LOAN_VALIDATION_BATCH_CONCURRENCY = int(os.getenv("LOAN_VALIDATION_BATCH_CONCURRENCY", 8))
+# Transient validator failures (connection errors, timeouts, 429/5xx) are retried with
+# exponential backoff and full jitter, within a total deadline per check
+LOAN_VALIDATION_RETRY_ATTEMPTS = int(os.getenv("LOAN_VALIDATION_RETRY_ATTEMPTS", 3))
+LOAN_VALIDATION_RETRY_BASE_DELAY = float(os.getenv("LOAN_VALIDATION_RETRY_BASE_DELAY", 0.1))
+LOAN_VALIDATION_RETRY_MAX_DELAY = float(os.getenv("LOAN_VALIDATION_RETRY_MAX_DELAY", 1))
+LOAN_VALIDATION_RETRY_DEADLINE = float(os.getenv("LOAN_VALIDATION_RETRY_DEADLINE", 8))
+# Hedging: send a second request when the first hasn't answered by this quantile of
+# recent latencies (needs LOAN_VALIDATION_HEDGE_MIN_SAMPLES calls first)
+LOAN_VALIDATION_HEDGE = os.getenv("LOAN_VALIDATION_HEDGE", "false").lower() == "true"
+LOAN_VALIDATION_HEDGE_QUANTILE = float(os.getenv("LOAN_VALIDATION_HEDGE_QUANTILE", 0.95))
+LOAN_VALIDATION_HEDGE_MIN_SAMPLES = int(os.getenv("LOAN_VALIDATION_HEDGE_MIN_SAMPLES", 20))
+# Concurrent checks of one CUIL share a validator call: "process" (threads of one worker only)
+# or "database" (across worker processes, with a Postgres advisory lock; about 4 more queries
+# per uncached check, so only worth it with several workers)
+LOAN_VALIDATION_SINGLE_FLIGHT = os.getenv("LOAN_VALIDATION_SINGLE_FLIGHT", "process")
+# Verdicts shared between processes only matter while a call is in flight; run
+# `manage.py purge_validation_flights` periodically to delete those older than this
+LOAN_VALIDATION_FLIGHT_TTL = int(os.getenv("LOAN_VALIDATION_FLIGHT_TTL", 3600))
+
+# Rows validated, checked and inserted per transaction by the bulk loan import
+LOAN_IMPORT_CHUNK_SIZE = int(os.getenv("LOAN_IMPORT_CHUNK_SIZE", 1000))
+
+# Responses to loan requests sent with an Idempotency-Key are replayed for this many seconds;
+# run `manage.py purge_idempotency_keys` periodically to delete older keys
+LOAN_IDEMPOTENCY_TTL = int(os.getenv("LOAN_IDEMPOTENCY_TTL", 86400))
+
+# Loan creations and status changes streamed to analysts at /api/admin/loans/events/ (ASGI only).
+# Events are kept LOAN_EVENTS_TTL seconds for clients resuming with Last-Event-ID; a client
+# further behind than LOAN_EVENTS_REPLAY_LIMIT events is told to reload instead. A client
+# LOAN_EVENTS_MAX_PENDING events behind the live stream is disconnected, and resumes on reconnect
+LOAN_EVENTS_ENABLED = os.getenv("LOAN_EVENTS_ENABLED", "true").lower() == "true"
+LOAN_EVENTS_TTL = int(os.getenv("LOAN_EVENTS_TTL", 86400))
+LOAN_EVENTS_REPLAY_LIMIT = int(os.getenv("LOAN_EVENTS_REPLAY_LIMIT", 1000))
+LOAN_EVENTS_MAX_PENDING = int(os.getenv("LOAN_EVENTS_MAX_PENDING", 1000))
+LOAN_EVENTS_HEARTBEAT = float(os.getenv("LOAN_EVENTS_HEARTBEAT", 15))
+# Seconds a stream token (for browsers' EventSource, passed as ?token=) can open the stream
+LOAN_EVENTS_TOKEN_LIFETIME = int(os.getenv("LOAN_EVENTS_TOKEN_LIFETIME", 30))
+
+# Per-request timings: Server-Timing header and the /api/metrics/ histograms
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "true").lower() == "true"
+# The header shows every client the time spent in the database and the validator
+REQUEST_TIMING_HEADER = os.getenv("REQUEST_TIMING_HEADER", "false").lower() == "true"
+
+# Group names and permissions per user, invalidated when memberships change.
+# Only cached in a cache shared by all processes (e.g. Redis): with the per-process
+# local-memory cache, a role removed in one worker would stay granted in the others,
+# so permission checks fall back to a single group-membership query.
+USER_ROLE_CACHE_ALIAS = os.getenv("USER_ROLE_CACHE_ALIAS", "default")
+USER_ROLE_CACHE_TTL = int(os.getenv("USER_ROLE_CACHE_TTL", 60))
+
+# Eligibility cache: "lru" (per process), "django" (CACHES alias) or "none"
+LOAN_VALIDATION_CACHE_BACKEND = os.getenv("LOAN_VALIDATION_CACHE_BACKEND", "lru")
+LOAN_VALIDATION_CACHE_ALIAS = os.getenv("LOAN_VALIDATION_CACHE_ALIAS", "default")
+LOAN_VALIDATION_CACHE_APPROVED_TTL = int(os.getenv("LOAN_VALIDATION_CACHE_APPROVED_TTL", 600))
+LOAN_VALIDATION_CACHE_REJECTED_TTL = int(os.getenv("LOAN_VALIDATION_CACHE_REJECTED_TTL", 300))
+LOAN_VALIDATION_CACHE_MAX_ENTRIES = int(os.getenv("LOAN_VALIDATION_CACHE_MAX_ENTRIES", 10000))
+
+# Circuit breaker: open after too many failed or slow calls, retry after the cool-down
+LOAN_VALIDATION_BREAKER_WINDOW = int(os.getenv("LOAN_VALIDATION_BREAKER_WINDOW", 20))
+LOAN_VALIDATION_BREAKER_MIN_CALLS = int(os.getenv("LOAN_VALIDATION_BREAKER_MIN_CALLS", 10))
+LOAN_VALIDATION_BREAKER_ERROR_RATE = float(os.getenv("LOAN_VALIDATION_BREAKER_ERROR_RATE", 0.5))
+LOAN_VALIDATION_BREAKER_SLOW_CALL = float(os.getenv("LOAN_VALIDATION_BREAKER_SLOW_CALL", 2))
+LOAN_VALIDATION_BREAKER_SLOW_RATE = float(os.getenv("LOAN_VALIDATION_BREAKER_SLOW_RATE", 0.5))
+LOAN_VALIDATION_BREAKER_COOLDOWN = float(os.getenv("LOAN_VALIDATION_BREAKER_COOLDOWN", 30))
+LOAN_VALIDATION_BREAKER_HALF_OPEN_CALLS = int(os.getenv("LOAN_VALIDATION_BREAKER_HALF_OPEN_CALLS", 1))
 ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,6 +112,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 ALLOWED_HOSTS = []
 
 
@@ -48,6 +125,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
 
@@ -61,6 +139,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.timing.RequestTimingMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -93,11 +172,26 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'main.authentication.TimedJWTAuthentication',
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
 }
 
+# "orjson" renders and parses API JSON with orjson (`poetry install -E fast-json`);
+# without the package installed it quietly keeps using the stdlib
+API_JSON_BACKEND = os.getenv("API_JSON_BACKEND", "stdlib")
+
+if API_JSON_BACKEND == "orjson":
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [
+        "main.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ]
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = [
+        "main.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ]
+
 ALLOWED_HOSTS = ["*"]
 
 WSGI_APPLICATION = 'main.wsgi.application'
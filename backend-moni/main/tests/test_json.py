@@ -0,0 +1,217 @@
+import io
+import math
+import uuid
+
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from unittest import skipIf
+from unittest.mock import patch
+
+from loan.models import LoanRequest
+from loan.serializers import LoanRequestSerializer
+from main.parsers import FastJSONParser
+from main.renderers import FastJSONRenderer, orjson
+from user.roles import get_cache
+
+PAYLOADS = [
+    {},
+    [],
+    {"count": 3, "next": None, "previous": "http://testserver/api/admin/loans/?page=2", "ok": True},
+    {"full_name": "José \"Pepe\" Ñandú \\ 日本 🚀", "controls": "\t\n\x00\x1f", "separators": "a b c"},
+    {"amount": Decimal("15000.50"), "tiny": Decimal("0.01"), "whole": Decimal("10")},
+    {"utc": datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)},
+    {"utc_zoneinfo": datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=ZoneInfo("UTC"))},
+    {"buenos_aires": datetime(2025, 1, 2, 3, 4, 5, 500, tzinfo=ZoneInfo("America/Argentina/Buenos_Aires"))},
+    {"naive": datetime(2025, 1, 2, 3, 4, 5), "day": date(2025, 1, 2), "at": time(3, 4, 5, 6)},
+    {"elapsed": timedelta(seconds=90, microseconds=5), "id": uuid.UUID(int=42)},
+    {"lazy": gettext_lazy("This field is required."), "detail": ErrorDetail("Invalid.", code="invalid")},
+    {"statuses": {200: 10, 404: 1}, "flags": {True: 1, None: 2}},
+    {"floats": [0.1, 1.5, -2.25, 0.0001, 1e15, 0.0], "ints": [0, -1, 2 ** 63 - 1, -(2 ** 63)]},
+    {"big": 2 ** 64 + 1},
+    {"tuple": (1, 2), "set": {"APR"}, "nested": [[{"a": [{}]}]]},
+]
+
+
+class FastJSONRendererParityTest(TestCase):
+    """FastJSONRenderer must produce exactly JSONRenderer's bytes."""
+
+    def assertSameRendering(self, data, accepted_media_type=None, renderer_context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type, renderer_context),
+            JSONRenderer().render(data, accepted_media_type, renderer_context)
+        )
+
+    def test_payloads(self):
+        for data in PAYLOADS:
+            with self.subTest(data=data):
+                self.assertSameRendering(data)
+
+    def test_serializer_output(self):
+        LoanRequest.objects.create(
+            id_number="20123456789",
+            full_name="José Ñandú",
+            gender="O",
+            email="jose@example.com",
+            amount="1500.5",
+            status="APR"
+        )
+
+        self.assertSameRendering(LoanRequestSerializer(LoanRequest.objects.all(), many=True).data)
+        self.assertSameRendering(LoanRequestSerializer(LoanRequest.objects.get()).data)
+
+    def test_generators_and_querysets(self):
+        self.assertEqual(
+            FastJSONRenderer().render({"numbers": (n for n in range(3))}),
+            JSONRenderer().render({"numbers": (n for n in range(3))})
+        )
+        self.assertSameRendering({"users": User.objects.values_list("pk", flat=True)})
+
+    def test_float_exponents_differ_only_in_form(self):
+        data = {"floats": [1e-5, 1e16, 1.5e300, -2e-300]}
+
+        rendered = FastJSONRenderer().render(data)
+
+        # orjson writes 1e-5 where the stdlib writes 1e-05; both read back the same
+        self.assertEqual(JSONParser().parse(io.BytesIO(rendered)), data)
+
+    def test_none_renders_nothing(self):
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_indented_output(self):
+        self.assertSameRendering({"a": [1, 2]}, "application/json; indent=4")
+        self.assertSameRendering({"a": [1, 2]}, renderer_context={"indent": 2})
+
+    def test_unencodable_values_raise_like_the_stdlib(self):
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({"value": object()})
+
+        with self.assertRaises(ValueError):
+            FastJSONRenderer().render({"at": time(3, tzinfo=dt_timezone.utc)})
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_nan_renders_as_null(self):
+        # The stdlib raises instead; API responses never carry NaN
+        self.assertEqual(FastJSONRenderer().render({"rate": math.nan}), b'{"rate":null}')
+
+    @patch("main.renderers.orjson", None)
+    def test_falls_back_without_orjson(self):
+        for data in PAYLOADS:
+            self.assertSameRendering(data)
+
+
+class FastJSONParserParityTest(TestCase):
+    """FastJSONParser must return exactly what JSONParser returns."""
+
+    BODIES = [
+        b"{}",
+        b"[]",
+        b'{"id_number": "20123456789", "amount": 15000, "rate": 0.75, "ok": true, "next": null}',
+        '{"full_name": "José Ñandú 🚀", "escaped": "\\u00f1\\n\\ud83d\\ude80"}'.encode(),
+        b'{"amount": 1500.50, "negative": -1e-7, "exponent": 1E+2}',
+        b'{"big": 123456789012345678901234567890, "id_number": 20123456789}',
+        b'  {"duplicate": 1, "duplicate": 2}\n',
+    ]
+    INVALID_BODIES = [
+        b"",
+        b"{",
+        b'{"amount": NaN}',
+        b'{"amount": Infinity}',
+        b"\xef\xbb\xbf{}",
+        b'{"name": "\xff"}',
+        b"{'single': 1}",
+    ]
+
+    def parse(self, parser, body, parser_context=None):
+        return parser.parse(io.BytesIO(body), "application/json", parser_context)
+
+    def test_bodies(self):
+        for body in self.BODIES:
+            with self.subTest(body=body):
+                parsed = self.parse(FastJSONParser(), body)
+                expected = self.parse(JSONParser(), body)
+                self.assertEqual(parsed, expected)
+                self.assertEqual(repr(parsed), repr(expected))
+
+    def test_long_integers_stay_exact(self):
+        parsed = self.parse(FastJSONParser(), b'{"big": 123456789012345678901234567890}')
+
+        self.assertEqual(parsed["big"], 123456789012345678901234567890)
+
+    def test_invalid_bodies(self):
+        for body in self.INVALID_BODIES:
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError):
+                    self.parse(JSONParser(), body)
+                with self.assertRaises(ParseError) as raised:
+                    self.parse(FastJSONParser(), body)
+                self.assertTrue(str(raised.exception.detail).startswith("JSON parse error - "))
+
+    def test_other_charsets(self):
+        body = '{"full_name": "José"}'.encode("latin-1")
+
+        self.assertEqual(
+            self.parse(FastJSONParser(), body, {"encoding": "latin-1"}),
+            {"full_name": "José"}
+        )
+
+    @patch("main.parsers.orjson", None)
+    def test_falls_back_without_orjson(self):
+        for body in self.BODIES:
+            self.assertEqual(self.parse(FastJSONParser(), body), self.parse(JSONParser(), body))
+
+
+class FastJSONEndpointParityTest(TestCase):
+    """Real responses rendered by both renderers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        get_cache().clear()
+
+        admin_user = User.objects.create_user(username="test_admin", password="pass1234")
+        admin_user.groups.add(Group.objects.get(name="Admin"))
+        self.client.force_authenticate(user=admin_user)
+
+        LoanRequest.objects.bulk_create([
+            LoanRequest(
+                id_number=f"2012345{i:04d}",
+                full_name=f"Usuario Ñandú {i}",
+                gender="F",
+                email=f"test{i}@example.com",
+                amount=f"{1000 + i}.{i:02d}",
+                status="PEN" if i % 2 else "APR"
+            )
+            for i in range(15)
+        ])
+
+    def assertSameContent(self, response):
+        self.assertEqual(FastJSONRenderer().render(response.data), response.content)
+
+    def test_admin_endpoints(self):
+        for url, params in [
+            (reverse("admin-loans-list"), {}),
+            (reverse("admin-loans-list"), {"pagination": "cursor"}),
+            (reverse("admin-loans-detail", args=[LoanRequest.objects.first().pk]), {}),
+            (reverse("admin-loans-summary"), {}),
+            (reverse("admin-validator-stats"), {}),
+            (reverse("metrics"), {}),
+        ]:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertSameContent(response)
+
+    def test_validation_errors(self):
+        response = self.client.post(reverse("loan-requests"), {"amount": "lots"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertSameContent(response)
@@ -0,0 +1,165 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from unittest.mock import patch
+
+from loan.cache import get_eligibility_cache
+from loan.circuit import get_circuit_breaker
+from loan.models import LoanRequest
+from main.timing import Histogram, record_query, registry
+from user.roles import get_cache
+
+
+def parse_server_timing(header: str) -> dict:
+    metrics = {}
+    for part in header.split(", "):
+        name, *params = part.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+@override_settings(REQUEST_TIMING_HEADER=True)
+class RequestTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        registry.reset()
+        get_cache().clear()
+        get_eligibility_cache().clear()
+        get_circuit_breaker().reset()
+
+        self.admin_user = User.objects.create_user(username="test_admin", password="pass1234")
+        self.admin_user.groups.add(Group.objects.get(name="Admin"))
+
+        LoanRequest.objects.create(
+            id_number="20123456789",
+            full_name="Test User",
+            gender="M",
+            email="test@example.com",
+            amount=10000,
+            status="PEN"
+        )
+
+        self.loan_data = {
+            "id_number": "20123456780",
+            "full_name": "Juan Pérez",
+            "gender": "M",
+            "email": "juan@example.com",
+            "amount": 15000
+        }
+
+    def login(self):
+        token = self.client.post(
+            reverse("token_obtain_pair"), {"username": "test_admin", "password": "pass1234"}
+        ).data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        # Warm the role cache so later requests run a stable number of queries
+        self.client.get(reverse("admin-loans-list"))
+
+    @patch("user.roles.get_ttl", return_value=60)
+    def test_server_timing_reports_db_auth_and_render(self, _):
+        self.login()
+
+        response = self.client.get(reverse("admin-loans-list"))
+
+        metrics = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(metrics["db"]["desc"], '"4"')
+        self.assertIn("auth", metrics)
+        self.assertIn("render", metrics)
+        self.assertGreaterEqual(float(metrics["total"]["dur"]), float(metrics["db"]["dur"]))
+
+    @patch("loan.services.LoanValidationService.fetch_loan_eligibility", return_value=True)
+    def test_server_timing_reports_upstream_call(self, mock_fetch):
+        response = self.client.post(reverse("loan-requests"), self.loan_data, format="json")
+
+        metrics = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(metrics["upstream"]["desc"], '"1"')
+
+    @patch("loan.services.LoanValidationService.afetch_loan_eligibility", return_value=True)
+    async def test_async_intake_reports_upstream_call(self, mock_fetch):
+        response = await self.async_client.post(
+            reverse("loan-requests-async"), self.loan_data, content_type="application/json"
+        )
+
+        metrics = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(metrics["upstream"]["desc"], '"1"')
+        self.assertIn("db", metrics)
+
+    async def test_asgi_reports_render(self):
+        token = await sync_to_async(AccessToken.for_user)(self.admin_user)
+
+        response = await self.async_client.get(
+            reverse("admin-loans-list"), headers={"Authorization": f"Bearer {token}"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("render", parse_server_timing(response["Server-Timing"]))
+
+    def test_metrics_endpoint_aggregates_by_route(self):
+        self.login()
+        for _ in range(3):
+            self.client.get(reverse("admin-loans-list"))
+
+        response = self.client.get(reverse("metrics"))
+
+        route = response.data["routes"]["GET admin-loans-list"]
+        self.assertEqual(route["requests"], 4)
+        self.assertEqual(route["statuses"], {200: 4})
+        self.assertEqual(route["histograms"]["total"]["buckets"]["+Inf"], 4)
+        self.assertEqual(route["histograms"]["db"]["count"], 4)
+        self.assertIn("POST token_obtain_pair", response.data["routes"])
+
+    def test_metrics_endpoint_requires_admin(self):
+        analyst = User.objects.create_user(username="test_analyst", password="pass1234")
+        analyst.groups.add(Group.objects.get(name="Analyst"))
+        self.client.force_authenticate(user=analyst)
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(REQUEST_TIMING_HEADER=False)
+    def test_hidden_header_still_feeds_the_metrics(self):
+        response = self.client.get(reverse("loan-requests"))
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertIn("GET loan-requests", registry.snapshot())
+
+    def test_query_timer_keeps_wrappers_of_the_block_opening_the_connection(self):
+        connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(connection.close)
+
+        def wrapper(execute, *args):
+            return execute(*args)
+
+        with connection.execute_wrapper(wrapper):
+            connection.ensure_connection()
+
+        self.assertEqual(connection.execute_wrappers, [record_query])
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled_timing_adds_nothing(self):
+        response = self.client.get(reverse("admin-loans-list"))
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(registry.snapshot(), {})
+
+
+class HistogramTest(TestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram()
+        for value in (1, 7, 7, 30000):
+            histogram.observe(value)
+
+        data = histogram.as_dict()
+
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(data["buckets"]["5"], 1)
+        self.assertEqual(data["buckets"]["10"], 3)
+        self.assertEqual(data["buckets"]["10000"], 3)
+        self.assertEqual(data["buckets"]["+Inf"], 4)
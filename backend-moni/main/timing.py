@@ -0,0 +1,230 @@
+import threading
+import time
+
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Upper bounds in milliseconds, the last bucket is +Inf
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+SEGMENTS = ("db", "upstream", "auth", "render")
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Time spent per segment during one request. Segments may overlap (auth loads the user from db)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(SEGMENTS, 0.0)
+        self.counts = dict.fromkeys(SEGMENTS, 0)
+
+    def add(self, segment: str, duration: float):
+        self.durations[segment] += duration
+        self.counts[segment] += 1
+
+    def server_timing(self, total: float) -> str:
+        parts = [
+            f'{segment};dur={self.durations[segment] * 1000:.1f};desc="{self.counts[segment]}"'
+            for segment in SEGMENTS
+            if self.counts[segment]
+        ]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def record(segment: str, duration: float):
+    """Adds `duration` seconds to a segment of the current request, if it is being timed."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(segment, duration)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # Every thread has its own connection, so install the wrapper on each one
+    # instead of wrapping only the middleware's. It goes first: a connection
+    # opened inside `with connection.execute_wrapper(...)` pops the last
+    # wrapper on exit, which must still be the one that block added.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_query_timers():
+    """Covers connections opened before this module was imported."""
+    for connection in connections.all(initialized_only=True):
+        install_query_timer(None, connection)
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value_ms: float):
+        index = next((i for i, bound in enumerate(BUCKETS) if value_ms <= bound), len(BUCKETS))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value_ms
+
+    def as_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip([*map(str, BUCKETS), "+Inf"], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+
+        return {"count": self.count, "sum_ms": round(self.sum, 3), "buckets": buckets}
+
+
+class RouteMetrics:
+
+    def __init__(self):
+        self.histograms = {name: Histogram() for name in ("total", *SEGMENTS)}
+        self.queries = 0
+        self.upstream_calls = 0
+        self.statuses = {}
+
+    def observe(self, timings: RequestTimings, total: float, status_code: int):
+        self.histograms["total"].observe(total * 1000)
+        for segment in SEGMENTS:
+            self.histograms[segment].observe(timings.durations[segment] * 1000)
+
+        self.queries += timings.counts["db"]
+        self.upstream_calls += timings.counts["upstream"]
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def as_dict(self) -> dict:
+        requests = self.histograms["total"].count
+
+        return {
+            "requests": requests,
+            "statuses": self.statuses,
+            "queries_per_request": round(self.queries / requests, 2) if requests else 0,
+            "upstream_calls": self.upstream_calls,
+            "histograms": {name: histogram.as_dict() for name, histogram in self.histograms.items()},
+        }
+
+
+class MetricsRegistry:
+    """In-process aggregate of request timings per route. Each worker process has its own."""
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def observe(self, route: str, timings: RequestTimings, total: float, status_code: int):
+        with self.lock:
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics()
+
+            metrics.observe(timings, total, status_code)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {route: metrics.as_dict() for route, metrics in sorted(self.routes.items())}
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+class RequestTimingMiddleware:
+    """Times each request and its db, upstream, auth and render segments.
+
+    Adds a Server-Timing header and feeds the per-route histograms served by
+    MetricsAPIView. Keep it first in MIDDLEWARE so the total covers the rest.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        install_query_timers()
+
+        if self.is_async:
+            markcoroutinefunction(self)
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        if not settings.REQUEST_TIMING_ENABLED:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_TIMING_ENABLED:
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        # Runs right before DRF renders the response
+        timings = _current.get()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add("render", time.perf_counter() - started)
+            )
+
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        # __init__ points process_template_response at this method under ASGI
+        return RequestTimingMiddleware.process_template_response(self, request, response)
+
+    def finish(self, request, response, timings: RequestTimings):
+        total = time.perf_counter() - timings.started
+
+        if settings.REQUEST_TIMING_HEADER:
+            response["Server-Timing"] = timings.server_timing(total)
+
+        # URL names keep the keys short and bounded, unlike paths with ids in them
+        match = request.resolver_match
+        route = f"{request.method} {match.view_name if match else '<unmatched>'}"
+        registry.observe(route, timings, total, response.status_code)
+
+        return response
@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.urls import path, include
 
+from main.views import MetricsAPIView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -30,4 +31,7 @@ urlpatterns = [
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 
+    # Request timing histograms
+    path("api/metrics/", MetricsAPIView.as_view(), name="metrics"),
+
 ]
@@ -0,0 +1,21 @@
+import os
+
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .authentication import TimedJWTAuthentication
+from .permissions import IsAdmin
+from .timing import registry
+
+
+class MetricsAPIView(APIView):
+    """Request timing histograms by route, aggregated in this worker process"""
+    authentication_classes = [TimedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({
+            "pid": os.getpid(),
+            "routes": registry.snapshot(),
+        })
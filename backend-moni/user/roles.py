@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY = "user-roles:version"
+
+
+def get_cache():
+    return caches[settings.USER_ROLE_CACHE_ALIAS]
+
+
+def get_ttl() -> int:
+    """USER_ROLE_CACHE_TTL, or 0 (no caching) when the cache lives in each process.
+
+    Role changes only clear the cache of the process that made them, so a
+    per-process cache would let the other workers grant removed roles.
+    """
+    if isinstance(get_cache(), LocMemCache):
+        return 0
+
+    return settings.USER_ROLE_CACHE_TTL
+
+
+def cache_key(user_id) -> str:
+    # Bumping the version invalidates every cached user at once
+    version = get_cache().get_or_set(VERSION_KEY, 1, timeout=None)
+    return f"user-roles:{version}:{user_id}"
+
+
+def get_user_roles(user) -> dict:
+    """Returns the user's group names and permissions, cached until their roles change."""
+    if not user.is_authenticated:
+        return {"groups": [], "permissions": []}
+
+    ttl = get_ttl()
+    cache = get_cache()
+    key = cache_key(user.pk) if ttl > 0 else None
+    roles = cache.get(key) if key else None
+
+    if roles is None:
+        roles = {
+            "groups": sorted(user.groups.values_list("name", flat=True)),
+            "permissions": sorted(user.get_all_permissions()),
+        }
+        if key:
+            cache.set(key, roles, timeout=ttl)
+
+    return roles
+
+
+def user_in_group(user, *names) -> bool:
+    if not user.is_authenticated:
+        return False
+
+    if get_ttl() > 0:
+        groups = get_user_roles(user)["groups"]
+        return any(name in groups for name in names)
+
+    # Uncached, one membership check beats loading every group and permission
+    return user.groups.filter(name__in=names).exists()
+
+
+def invalidate_user_roles(user_ids):
+    get_cache().delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_all_user_roles():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
@@ -1,10 +1,12 @@
 import logging
 
 from django.contrib.auth.models import Group, Permission, User
-from django.db.models.signals import post_migrate
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.contrib.contenttypes.models import ContentType
 from django.dispatch import receiver
 
+from .roles import invalidate_all_user_roles, invalidate_user_roles
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,3 +66,37 @@ def create_default_users():
 def populate_users_and_roles(sender, **kwargs):
     create_default_groups()
     create_default_users()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_member_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        invalidate_user_roles([instance.pk])
+    elif pk_set:
+        invalidate_user_roles(pk_set)
+    else:
+        # group.user_set.clear() does not say which users were removed
+        invalidate_all_user_roles()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_roles(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_all_user_roles()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_deleted_roles(sender, **kwargs):
+    invalidate_all_user_roles()
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user_roles(sender, instance, created, **kwargs):
+    # is_superuser and is_active change what get_all_permissions returns
+    if not created:
+        invalidate_user_roles([instance.pk])
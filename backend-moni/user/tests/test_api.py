@@ -2,6 +2,10 @@ from django.contrib.auth.models import User, Group
 from rest_framework.test import APITestCase
 from rest_framework.reverse import reverse
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.test import override_settings
+from unittest.mock import patch
+
+from user.roles import get_cache, get_ttl, user_in_group
 
 
 class MeEndpointTest(APITestCase):
@@ -27,3 +31,87 @@ class MeEndpointTest(APITestCase):
     def test_unauthenticated_user_gets_401(self):
         response = self.client.get(reverse("me"))
         self.assertEqual(response.status_code, 401)
+
+
+class MeEndpointRoleCacheTest(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        # As with a shared cache; the test cache is per process
+        patcher = patch("user.roles.get_ttl", return_value=60)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username="test_analyst", password="pass1234")
+        self.analyst_group = Group.objects.get(name="Analyst")
+        self.user.groups.add(self.analyst_group)
+
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_cached_roles_need_only_the_user_query(self):
+        self.client.get(reverse("me"))
+
+        # Only JWTAuthentication loading the user hits the database
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("me"))
+
+        self.assertEqual(response.data["groups"], ["Analyst"])
+        self.assertIn("auth.view_loan", response.data["permissions"])
+
+    def test_adding_a_group_invalidates_cached_roles(self):
+        self.client.get(reverse("me"))
+
+        self.user.groups.add(Group.objects.get(name="Admin"))
+        response = self.client.get(reverse("me"))
+
+        self.assertEqual(response.data["groups"], ["Admin", "Analyst"])
+        self.assertIn("auth.update_loan", response.data["permissions"])
+
+    def test_removing_from_the_group_side_invalidates_cached_roles(self):
+        self.client.get(reverse("me"))
+
+        self.analyst_group.user_set.remove(self.user)
+        response = self.client.get(reverse("me"))
+
+        self.assertEqual(response.data["groups"], [])
+        self.assertEqual(response.data["permissions"], [])
+
+    def test_group_permission_change_invalidates_cached_roles(self):
+        self.client.get(reverse("me"))
+
+        self.analyst_group.permissions.clear()
+        response = self.client.get(reverse("me"))
+
+        self.assertEqual(response.data["permissions"], [])
+
+
+class RoleCacheBackendTest(APITestCase):
+
+    def test_per_process_cache_is_not_used_for_roles(self):
+        user = User.objects.create_user(username="test_analyst", password="pass1234")
+        user.groups.add(Group.objects.get(name="Analyst"))
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.client.get(reverse("me"))
+
+        # Loading the user, their groups and the user and group permissions
+        with self.assertNumQueries(4):
+            self.client.get(reverse("me"))
+
+        self.assertEqual(get_ttl(), 0)
+
+    def test_uncached_group_checks_are_one_query(self):
+        user = User.objects.create_user(username="test_analyst", password="pass1234")
+        user.groups.add(Group.objects.get(name="Analyst"))
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user_in_group(user, "Analyst", "Admin"))
+        with self.assertNumQueries(1):
+            self.assertFalse(user_in_group(user, "Admin"))
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+        USER_ROLE_CACHE_TTL=30
+    )
+    def test_shared_cache_uses_the_configured_ttl(self):
+        self.assertEqual(get_ttl(), 30)
@@ -1,20 +1,24 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from main.authentication import TimedJWTAuthentication
+
+from .roles import get_user_roles
 
 
 class MeAPIView(APIView):
     """Return authenticated user details"""
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TimedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
+        roles = get_user_roles(user)
         return Response({
             "username": user.username,
             "email": user.email,
             "is_staff": user.is_staff,
-            "groups": [group.name for group in user.groups.all()],
-            "permissions": list(user.get_all_permissions()),
+            "groups": roles["groups"],
+            "permissions": roles["permissions"],
         })